@@ -0,0 +1,49 @@
+"""
+patchkit - declarative patches for src/App.js and the rest of the tree.
+
+The fix_*.py / add_*.py scripts at the repo root each hard-code their anchors
+and replacement snippets. patchkit keeps the same edits as data (TOML specs in
+patches/), compiles them once into matchers and applies them in memory.
+
+    python -m patchkit apply              # run patches/*.toml and *.diff
+    python -m patchkit apply --dry-run    # report only
+    python -m patchkit apply --overlay ../try-a patches/0*.toml  # patched copy-on-write tree
+    python -m patchkit size               # bytes each patch adds (raw/gzip/brotli)
+    python -m patchkit graph              # live and dead modules under src/
+    python -m patchkit check              # do the live modules still parse?
+    python -m patchkit search 'handlePositions.forEach'  # every copy, with its block
+    python -m patchkit leaks              # listeners/intervals/globals never removed
+    python -m patchkit lint --new         # perf problems the patches introduce
+    python -m patchkit test               # only the section tests the last change affects
+    python -m patchkit compare            # diff competing script variants
+    python -m patchkit bench drag-resize  # injected snippets under jsdom
+    python -m patchkit traces exports/    # latency percentiles from perf-marks
+    python -m patchkit backfill-images posts.json  # responsive attrs in saved posts
+    python -m patchkit compact-posts posts.json    # extract data: images, minify
+"""
+
+# Bumped whenever the engine changes how a spec is applied, so anything
+# cached from an older engine is ignored.
+ENGINE_VERSION = "3"
+
+from .spec import Edit, PatchSpec, PostCondition, SpecError, load_specs  # noqa: E402
+from .engine import EditRecord, PatchResult, apply_patch, apply_patches  # noqa: E402
+from .imports import ImportGraph, build_graph  # noqa: E402
+from .runner import TargetReport, run  # noqa: E402
+
+__all__ = [
+    "ENGINE_VERSION",
+    "Edit",
+    "EditRecord",
+    "ImportGraph",
+    "PatchResult",
+    "PatchSpec",
+    "PostCondition",
+    "SpecError",
+    "TargetReport",
+    "apply_patch",
+    "apply_patches",
+    "build_graph",
+    "load_specs",
+    "run",
+]
@@ -0,0 +1,490 @@
+"""Command line entry point: python -m patchkit <command> ..."""
+
+from __future__ import annotations
+
+import argparse
+import json
+import re
+import subprocess
+import sys
+from dataclasses import asdict
+from fnmatch import fnmatch
+from pathlib import Path
+
+from . import spec as specmod
+from . import bench, bytecost, differential, impact, imports, leaks, overlay, perflint, postimages, poststore, search, traces, validate
+from .cache import DEFAULT_MAX_BYTES, OutputCache, default_cache_dir
+from .runner import DEFAULT_RETRIES, expand_targets, format_reports, group_by_target, run
+
+
+def _load(args):
+    paths = specmod.discover(args.specs or specmod.DEFAULT_SPECS, args.root)
+    cache_dir = None if args.no_spec_cache else f"{args.root}/{specmod.DEFAULT_CACHE_DIR}"
+    return specmod.load_specs(paths, cache_dir)
+
+
+def _output_cache(args) -> OutputCache:
+    return OutputCache(args.cache_dir or default_cache_dir(args.root), args.cache_size * 1024 * 1024)
+
+
+def _graph(args) -> imports.ImportGraph:
+    return imports.build_graph(args.root, args.entry, f"{args.root}/{specmod.DEFAULT_CACHE_DIR}")
+
+
+def cmd_apply(args) -> int:
+    specs = _load(args)
+    cache = _output_cache(args) if args.cache else None
+    try:
+        budget = None if args.no_budget else bytecost.load_budget(Path(args.root) / bytecost.BUDGET_FILE)
+    except bytecost.BudgetError as exc:
+        print(f"✗ {exc}", file=sys.stderr)
+        return 2
+    tree = None
+    if args.overlay and not args.dry_run:
+        try:
+            tree = overlay.Overlay(args.root, args.overlay, args.link)
+            stats = tree.sync()
+        except (OSError, overlay.OverlayError) as exc:
+            print(f"✗ {exc}", file=sys.stderr)
+            return 2
+    # An overlay keeps its own region state: its patch set is not the checkout's
+    state_root = args.overlay if tree is not None else args.root
+    state_dir = f"{state_root}/{specmod.DEFAULT_CACHE_DIR}" if args.incremental else None
+    only = _graph(args).reachable() if args.reachable_only else None
+    reports = run(specs, args.root, dry_run=args.dry_run, cache=cache, state_dir=state_dir,
+                  retries=args.retries, only=only, validate=not args.no_validate, budget=budget,
+                  output_dir=tree.path if tree is not None else None)
+    print(format_reports(reports))
+    if tree is not None:
+        patched = [r.target for r in reports if r.written]
+        tree.record(patched)
+        print(overlay.format_sync(tree, stats, patched))
+    return 0 if all(r.ok for r in reports) else 1
+
+
+def cmd_compile(args) -> int:
+    for spec in _load(args):
+        if spec.codemod:
+            kind = f"codemod {spec.codemod}"
+        elif spec.hunks:
+            kind = f"{len(spec.hunks)} hunk(s)"
+        else:
+            kind = f"{len(spec.edits)} edit(s)"
+        print(f"✓ {spec.id:32} {spec.target}  ({kind})")
+    return 0
+
+
+def cmd_size(args) -> int:
+    budget_path = Path(args.root) / bytecost.BUDGET_FILE
+    try:
+        budget = bytecost.load_budget(budget_path)
+    except bytecost.BudgetError as exc:
+        print(f"✗ {exc}", file=sys.stderr)
+        return 2
+    sizer = bytecost.Sizer(cache_dir=f"{args.root}/{specmod.DEFAULT_CACHE_DIR}")
+    costs = bytecost.by_patch(bytecost.account(group_by_target(expand_targets(_load(args), args.root)), args.root,
+                                               sizer))
+    if args.write_budget:
+        added = bytecost.write_budget(budget_path, costs, args.headroom / 100)
+        budget = bytecost.load_budget(budget_path)
+        print(f"✓ {budget_path}: {len(added)} patch(es) added")
+    over = bytecost.check(costs, budget) if budget is not None else []
+    if args.json:
+        print(json.dumps({"patches": [asdict(c) for c in costs], "over": [m for _, m in over]}, indent=2))
+    else:
+        print(bytecost.format_costs(costs, budget))
+        for _, message in over:
+            print(f"✗ {message}")
+    return 1 if over else 0
+
+
+def cmd_graph(args) -> int:
+    graph = _graph(args)
+    dead = graph.dead(args.root, args.source_dir)
+    stray = imports.stray_files(args.root, args.source_dir)
+
+    def size(module):
+        return (Path(args.root) / module).stat().st_size
+
+    if args.json:
+        print(json.dumps({
+            "entry": graph.entry,
+            "edges": graph.edges,
+            "unresolved": graph.unresolved,
+            "dead": dead,
+            "stray": stray,
+        }, indent=2))
+        return 0
+
+    live = sorted(graph.reachable())
+    print(f"{graph.entry}: {len(live)} reachable module(s), {sum(map(size, live))} bytes")
+    if args.verbose:
+        for module in live:
+            print(f"  {size(module):>9}  {module}")
+    for module, specifiers in sorted(graph.unresolved.items()):
+        for specifier in specifiers:
+            print(f"  ✗ {module}: cannot resolve '{specifier}'")
+    print(f"Dead modules: {len(dead)}, {sum(map(size, dead))} bytes")
+    for module in sorted(dead, key=size, reverse=True):
+        print(f"  {size(module):>9}  {module}")
+    if stray:
+        print(f"Stray files: {len(stray)}")
+        for path in stray:
+            print(f"  {size(path):>9}  {path}")
+    return 1 if graph.unresolved else 0
+
+
+def cmd_check(args) -> int:
+    root = Path(args.root)
+    if args.files:
+        paths = sorted({p.relative_to(root).as_posix() for pattern in args.files for p in root.glob(pattern)
+                        if p.is_file()})
+    else:
+        paths = sorted(_graph(args).reachable())
+    files = [(path, (root / path).read_text(encoding="utf-8")) for path in paths]
+    with validate.Validator(root) as validator:
+        checks = validator.check(files)
+    broken = [c for c in checks.values() if not c.ok]
+    skipped = [c for c in checks.values() if c.skipped]
+    for check in broken:
+        for issue in check.issues:
+            print(f"✗ {issue}")
+    parser = next((c.parser for c in checks.values()), "none")
+    print(f"{len(checks)} file(s) checked with {parser}: {len(broken)} broken, {len(skipped)} not parsed")
+    if skipped and args.verbose:
+        for check in skipped:
+            print(f"  - {check.path}: {check.skipped}")
+    return 1 if broken else 0
+
+
+def _source_files(args, suffixes: tuple[str, ...]) -> list[str]:
+    """Files named by args.files (paths or globs), else the reachable modules."""
+    root = Path(args.root)
+    if args.files:
+        paths = {p.relative_to(root).as_posix() for pattern in args.files for p in root.glob(pattern)
+                 if p.is_file()}
+    else:
+        paths = _graph(args).reachable()
+    return sorted(p for p in paths if p.endswith(suffixes))
+
+
+def cmd_leaks(args) -> int:
+    findings = []
+    for path in _source_files(args, leaks.SUFFIXES):
+        findings.extend(leaks.analyze(path, (Path(args.root) / path).read_text(encoding="utf-8")))
+    if args.json:
+        print(json.dumps([asdict(f) for f in findings if args.verbose or f.status != leaks.PAIRED], indent=2))
+    else:
+        print(leaks.format_findings(findings, verbose=args.verbose))
+    return 1 if any(f.error for f in findings) else 0
+
+
+def cmd_lint(args) -> int:
+    specs = [] if args.no_patches else _load(args)
+    paths = _source_files(args, perflint.SUFFIXES)
+    if not args.files:
+        root = Path(args.root)
+        targets = {s.target for s in expand_targets(specs, root) if s.target.endswith(perflint.SUFFIXES)}
+        paths = sorted(set(paths) | {t for t in targets if (root / t).is_file()})
+    findings = perflint.lint_tree(paths, expand_targets(specs, args.root), args.root,
+                                  set(args.rule) if args.rule else None)
+    if args.new:
+        findings = [f for f in findings if f.patch]
+    if args.json:
+        print(json.dumps([asdict(f) for f in findings], indent=2))
+    else:
+        print(perflint.format_findings(findings))
+    return 1 if findings else 0
+
+
+def cmd_test(args) -> int:
+    outputs: dict[str, str] = {}
+    if args.pending:
+        changes = impact.pending_changes(expand_targets(_load(args), args.root), args.root, outputs)
+    else:
+        try:
+            changes = impact.git_changes(args.root, args.rev)
+        except (OSError, subprocess.CalledProcessError) as exc:
+            print(f"✗ git diff {args.rev} failed: {getattr(exc, 'stderr', None) or exc}".rstrip(), file=sys.stderr)
+            return 2
+    graph = _graph(args)
+    result = impact.impact_of(changes, impact.find_sections(args.root, graph, outputs), graph)
+    tests = impact.discover_tests(args.root)
+    selected = impact.select_tests(tests, result)
+    if args.list:
+        if args.json:
+            print(json.dumps({"sections": sorted(result.sections), "reasons": result.reasons,
+                              "tests": [asdict(t) | {"sections": sorted(t.sections), "modules": sorted(t.modules)}
+                                        for t in selected]}, indent=2))
+        else:
+            print(impact.format_selection(changes, result, tests, selected))
+            for test in selected:
+                print(f"  {' '.join(test.command)}")
+        return 0
+    runs = impact.run_tests(selected, args.root, jobs=args.jobs, timeout=args.timeout)
+    if args.json:
+        print(json.dumps([asdict(r) for r in runs], indent=2))
+    else:
+        print(impact.format_selection(changes, result, tests, selected))
+        if runs:
+            print(impact.format_runs(runs, verbose=args.verbose))
+    return 0 if all(r.status == impact.PASSED for r in runs) else 1
+
+
+def cmd_search(args) -> int:
+    try:
+        index = search.open_index(args.root, f"{args.root}/{specmod.DEFAULT_CACHE_DIR}")
+        hits = index.search(args.pattern, regex=args.regex, ignore_case=args.ignore_case)
+    except re.error as exc:
+        print(f"✗ bad pattern: {exc}", file=sys.stderr)
+        return 2
+    if args.files:
+        hits = [hit for hit in hits if any(fnmatch(hit.path, pattern) for pattern in args.files)]
+    if args.json:
+        print(json.dumps([asdict(hit) for hit in hits], indent=2))
+    else:
+        print(search.format_hits(hits))
+    return 0 if hits else 1
+
+
+def cmd_compare(args) -> int:
+    if args.variants:
+        groups = {"variants": args.variants}
+    else:
+        groups = {name: differential.DEFAULT_GROUPS[name]
+                  for name in (args.group or differential.DEFAULT_GROUPS)}
+    corpus = args.corpus or differential.DEFAULT_CORPUS
+    agree = True
+    for name, variants in groups.items():
+        reports = differential.compare(variants, corpus, args.root, repeat=args.repeat, jobs=args.jobs)
+        print(differential.format_comparison(name, variants, reports))
+        agree = agree and all(r.agree for r in reports)
+    return 0 if agree else 1
+
+
+def cmd_bench(args) -> int:
+    unknown = [name for name in args.fixtures if name not in bench.FIXTURES]
+    if unknown:
+        print(f"✗ unknown fixture(s): {', '.join(unknown)} (have {', '.join(bench.FIXTURES)})", file=sys.stderr)
+        return 2
+    versions = args.version or bench.default_versions(args.root)
+    results, dom = bench.run_benchmarks(args.fixtures or list(bench.FIXTURES), versions, args.root,
+                                        base=args.base, duration=args.duration)
+    if args.json:
+        print(json.dumps({"dom": dom, "results": [asdict(r) for r in results]}, indent=2))
+    else:
+        print(bench.format_results(results, dom))
+    return 1 if any(r.status == bench.ERROR for r in results) else 0
+
+
+def cmd_traces(args) -> int:
+    stats, errors = traces.aggregate(args.files)
+    for message in errors:
+        print(message, file=sys.stderr)
+    if args.json:
+        print(json.dumps([vars(s) for s in stats], indent=2))
+    elif stats:
+        print(traces.format_stats(stats))
+    else:
+        print("No perf: measures found")
+    return 1 if errors else 0
+
+
+def cmd_backfill_images(args) -> int:
+    if args.output and len(args.files) > 1:
+        print("✗ --output needs a single input file", file=sys.stderr)
+        return 2
+    for path in args.files:
+        count = postimages.backfill_file(path, args.output, dry_run=args.dry_run)
+        print(f"{'✓' if count else '-'} {path}: {count} image(s) backfilled")
+    return 0
+
+
+def cmd_compact_posts(args) -> int:
+    source = Path(args.store)
+    output = Path(args.output or source.with_name(source.stem + ".compact" + source.suffix))
+    assets = Path(args.assets or output.with_name(output.stem + ".assets"))
+    try:
+        report = poststore.compact_store(source, output, assets, args.base_url)
+    except (OSError, ValueError) as exc:
+        print(f"✗ {exc}", file=sys.stderr)
+        return 1
+    if args.json:
+        print(json.dumps(asdict(report), indent=2))
+    else:
+        print(poststore.format_report(report))
+        print(f"✓ {output}" + (f", images in {assets}/" if report.unique_images else ""))
+    return 0
+
+
+def cmd_cache(args) -> int:
+    cache = _output_cache(args)
+    if args.action == "clear":
+        cache.clear()
+        print(f"✓ Cleared {cache.directory}")
+    elif args.action == "prune":
+        freed = cache.evict()
+        print(f"✓ Freed {freed} bytes")
+    count, size = cache.stats()
+    print(f"{cache.directory}: {count} entries, {size} bytes (cap {cache.max_bytes})")
+    return 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m patchkit")
+    parser.add_argument("--root", default=".", help="repository root (default: .)")
+    parser.add_argument("--no-spec-cache", action="store_true", help="always re-parse spec files")
+
+    cache_opts = argparse.ArgumentParser(add_help=False)
+    cache_opts.add_argument("--cache-dir", help="output cache directory (default: $PATCHKIT_CACHE_DIR or .patchkit/outputs)")
+    cache_opts.add_argument("--cache-size", type=int, default=DEFAULT_MAX_BYTES // (1024 * 1024),
+                            help="output cache size cap in MB")
+
+    graph_opts = argparse.ArgumentParser(add_help=False)
+    graph_opts.add_argument("--entry", default=imports.DEFAULT_ENTRY,
+                            help=f"app entry point (default: {imports.DEFAULT_ENTRY})")
+
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("apply", parents=[cache_opts, graph_opts], help="apply patch specs to their targets")
+    p.add_argument("specs", nargs="*",
+                   help="spec files, diffs or globs (default: the .toml/.diff/.patch files in patches/)")
+    p.add_argument("--dry-run", action="store_true", help="report without writing")
+    p.add_argument("--cache", action="store_true", help="reuse outputs from the output cache")
+    p.add_argument("--incremental", action="store_true",
+                   help="replay patches whose matched regions are unchanged since the last run")
+    p.add_argument("--retries", type=int, default=DEFAULT_RETRIES,
+                   help="optimistic write attempts before locking for the whole run (default: 3)")
+    p.add_argument("--reachable-only", action="store_true",
+                   help="skip targets the entry point does not import (directly or not)")
+    p.add_argument("--no-validate", action="store_true", help="write outputs without checking that they parse")
+    p.add_argument("--no-budget", action="store_true", help=f"ignore {bytecost.BUDGET_FILE}")
+    p.add_argument("--overlay", metavar="DIR",
+                   help="write a complete patched tree to DIR, linking unchanged files, instead of patching in place")
+    p.add_argument("--link", choices=overlay.METHODS, default="auto",
+                   help="how --overlay places unchanged files (default: auto = reflink, else hard link, else copy)")
+    p.set_defaults(func=cmd_apply)
+
+    p = sub.add_parser("compile", help="compile specs into the on-disk cache and list them")
+    p.add_argument("specs", nargs="*",
+                   help="spec files, diffs or globs (default: the .toml/.diff/.patch files in patches/)")
+    p.set_defaults(func=cmd_compile)
+
+    p = sub.add_parser("size", help="raw/gzip/brotli bytes each patch adds, against the budget")
+    p.add_argument("specs", nargs="*",
+                   help="spec files, diffs or globs (default: the .toml/.diff/.patch files in patches/)")
+    p.add_argument("--write-budget", action="store_true",
+                   help=f"add {bytecost.BUDGET_FILE} entries for patches that have none")
+    p.add_argument("--headroom", type=float, default=bytecost.DEFAULT_HEADROOM * 100,
+                   help="percent added to current costs by --write-budget (default: 10)")
+    p.add_argument("--json", action="store_true", help="print the costs as JSON")
+    p.set_defaults(func=cmd_size)
+
+    p = sub.add_parser("graph", parents=[graph_opts], help="report reachable and dead modules")
+    p.add_argument("--source-dir", default=imports.DEFAULT_SOURCE_DIR,
+                   help=f"tree searched for dead modules (default: {imports.DEFAULT_SOURCE_DIR})")
+    p.add_argument("-v", "--verbose", action="store_true", help="list reachable modules too")
+    p.add_argument("--json", action="store_true", help="print the graph as JSON")
+    p.set_defaults(func=cmd_graph)
+
+    p = sub.add_parser("check", parents=[graph_opts], help="check that files parse (one warm parser for all)")
+    p.add_argument("files", nargs="*", help="files or globs (default: modules reachable from the entry point)")
+    p.add_argument("-v", "--verbose", action="store_true", help="list files the parser could not read")
+    p.set_defaults(func=cmd_check)
+
+    p = sub.add_parser("leaks", parents=[graph_opts],
+                       help="pair listeners, intervals and window globals with their removal")
+    p.add_argument("files", nargs="*", help="files or globs (default: modules reachable from the entry point)")
+    p.add_argument("-v", "--verbose", action="store_true", help="list paired registrations too")
+    p.add_argument("--json", action="store_true", help="print the findings as JSON")
+    p.set_defaults(func=cmd_leaks)
+
+    p = sub.add_parser("lint", parents=[graph_opts], help="find layout thrash, storage polling and similar in patched output")
+    p.add_argument("files", nargs="*",
+                   help="files or globs (default: reachable modules and every spec target)")
+    p.add_argument("--specs", action="append",
+                   help="spec files, diffs or globs to apply first (default: the files in patches/)")
+    p.add_argument("--no-patches", action="store_true", help="lint the files as they are on disk")
+    p.add_argument("--new", action="store_true", help="only report findings in lines a patch wrote")
+    p.add_argument("--rule", action="append", choices=perflint.RULES, help="only run this rule (repeatable)")
+    p.add_argument("--json", action="store_true", help="print the findings as JSON")
+    p.set_defaults(func=cmd_lint)
+
+    p = sub.add_parser("test", parents=[graph_opts], help="run only the section tests a change can affect")
+    p.add_argument("specs", nargs="*",
+                   help="with --pending: spec files, diffs or globs (default: the files in patches/)")
+    p.add_argument("--rev", default="HEAD", help="git revision the working tree is compared to (default: HEAD)")
+    p.add_argument("--pending", action="store_true",
+                   help="take the changes from applying the specs in memory instead of from git")
+    p.add_argument("--list", action="store_true", help="show the affected sections and tests without running them")
+    p.add_argument("--jobs", type=int, help="tests run at once (default: all selected)")
+    p.add_argument("--timeout", type=float, default=impact.DEFAULT_TIMEOUT,
+                   help=f"seconds before a test is killed (default: {impact.DEFAULT_TIMEOUT})")
+    p.add_argument("-v", "--verbose", action="store_true", help="show the output of passing tests too")
+    p.add_argument("--json", action="store_true", help="print the selection or the results as JSON")
+    p.set_defaults(func=cmd_test)
+
+    p = sub.add_parser("search", help="find every copy of an anchor in src/, backups and root snippets")
+    p.add_argument("pattern", help="text to find (a regex with --regex)")
+    p.add_argument("files", nargs="*", help="only report files matching these globs")
+    p.add_argument("-e", "--regex", action="store_true", help="treat the pattern as a regular expression")
+    p.add_argument("-i", "--ignore-case", action="store_true", help="match case-insensitively")
+    p.add_argument("--json", action="store_true", help="print the matches as JSON")
+    p.set_defaults(func=cmd_search)
+
+    p = sub.add_parser("compare", help="run competing variants over saved App.js revisions and diff them")
+    p.add_argument("variants", nargs="*", help="scripts or spec files to compare (the first is the reference)")
+    p.add_argument("--group", action="append", choices=sorted(differential.DEFAULT_GROUPS),
+                   help="built-in variant group (default: all)")
+    p.add_argument("--corpus", action="append",
+                   help="revision to run on: a file or REV:PATH (default: the App.js copies in src/)")
+    p.add_argument("--repeat", type=int, default=3, help="timed runs per variant and revision (default: 3)")
+    p.add_argument("--jobs", type=int, help="worker processes (default: CPU count)")
+    p.set_defaults(func=cmd_compare)
+
+    p = sub.add_parser("bench", help="ops/sec and allocations of injected snippets under jsdom")
+    p.add_argument("fixtures", nargs="*", help=f"fixtures to run (default: all of {', '.join(bench.FIXTURES)})")
+    p.add_argument("--version", action="append",
+                   help="App.js version: a file, REV:PATH, or a variant script/spec applied to --base "
+                        "(default: the App.js copies in src/)")
+    p.add_argument("--base", default=differential.TARGET,
+                   help=f"revision variant scripts are applied to (default: {differential.TARGET})")
+    p.add_argument("--duration", type=float, default=bench.DEFAULT_DURATION,
+                   help="seconds of timed runs per fixture and version (default: 1)")
+    p.add_argument("--json", action="store_true", help="print the results as JSON")
+    p.set_defaults(func=cmd_bench)
+
+    p = sub.add_parser("traces", help="p50/p95/p99 per path from exported perf-marks sessions")
+    p.add_argument("files", nargs="+", help="exported JSON files or directories of them")
+    p.add_argument("--json", action="store_true", help="print the stats as JSON")
+    p.set_defaults(func=cmd_traces)
+
+    p = sub.add_parser("backfill-images", help="add lazy loading and a Cloudinary srcset to saved post images")
+    p.add_argument("files", nargs="+", help="exported post stores (e.g. localStorage.socialHubPosts as JSON)")
+    p.add_argument("-o", "--output", help="write here instead of in place")
+    p.add_argument("--dry-run", action="store_true", help="report without writing")
+    p.set_defaults(func=cmd_backfill_images)
+
+    p = sub.add_parser("compact-posts", help="extract data: images from an exported post store and minify it")
+    p.add_argument("store", help="exported localStorage.socialHubPosts (JSON)")
+    p.add_argument("-o", "--output", help="compacted store (default: <store>.compact.json)")
+    p.add_argument("--assets", help="directory for extracted images (default: <output>.assets)")
+    p.add_argument("--base-url", default="/post-images/",
+                   help="URL prefix the images will be served from (default: /post-images/)")
+    p.add_argument("--json", action="store_true", help="print the report as JSON")
+    p.set_defaults(func=cmd_compact_posts)
+
+    p = sub.add_parser("cache", parents=[cache_opts], help="inspect or trim the output cache")
+    p.add_argument("action", nargs="?", choices=("stats", "prune", "clear"), default="stats")
+    p.set_defaults(func=cmd_cache)
+
+    args = parser.parse_args(argv)
+    try:
+        return args.func(args)
+    except specmod.SpecError as exc:
+        print(f"✗ {exc}", file=sys.stderr)
+        return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,405 @@
+"""
+Micro-benchmarks of the injected snippets under a headless DOM.
+
+Timing the patch engine says nothing about the code the patches inject. This
+cuts the injected functions out of a version of App.js - the drag-resize
+handlers and the selectImage overlay builder, the delegated image click
+effect, the widget's loadPosts poller - and runs each as a fixture under
+jsdom in node (bench_worker.js), driven by scripted events:
+
+    select-image   selectImage(1): tear down and rebuild the toolbar/handles
+    drag-resize    one drag of the south-east handle: mousedown, 10
+                   mousemoves and a mouseup
+    image-click    a click on an editor image, through the delegated listener
+    widget-poll    one tick of the widget's refresh interval, reading 30
+                   posts back from localStorage
+
+A version is a saved App.js (a path, or REV:PATH for a git revision) or a
+variant script/spec (add_drag_resize_v2.py, patches/040-add-drag-resize.toml)
+applied to the base revision, so two injections can be compared before one
+goes in. A fixture whose functions a version does not contain is reported
+as missing.
+
+React state setters (setX) and refs (xRef) the functions use are stubbed;
+helpers they call that are declared in an enclosing scope (`const
+getImageOverlay = () => ...` beside selectImage, or at module level) are
+extracted with them, transitively. The rest of a fixture's context is listed
+with it; anything else bound in App.js (state, props, imports) is an
+"unresolved identifier" error rather than a ReferenceError in the worker. Results are ops/sec and the
+heap allocated and retained per op. jsdom does no layout, so the numbers
+cover script and DOM work, not layout or paint - `lint` is what catches
+layout thrash.
+"""
+
+from __future__ import annotations
+
+import json
+import shutil
+import subprocess
+from bisect import bisect_right
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from .differential import DEFAULT_CORPUS, TARGET, load_revision, run_variant
+from .impact import import_bindings
+from .jsscopes import DECLARATORS, Function, Scopes, expression_end
+from .jstokens import IDENT, match_brackets, tokenize
+
+WORKER = Path(__file__).with_name("bench_worker.js")
+DEFAULT_DURATION = 1.0
+
+OK = "ok"
+MISSING = "missing"
+ERROR = "error"
+
+# A 1x1 gif, so images have a src without touching the network
+_PIXEL = "data:image/gif;base64,R0lGODlhAQABAAAAACH5BAEKAAEALAAAAAABAAEAAAICTAEAOw=="
+
+EDITOR_HTML = (
+    '<div id="editor" contenteditable="true"><p>Before the image.</p>'
+    f'<img id="img-1" src="{_PIXEL}" style="width: 400px"><p>After the image.</p></div>'
+)
+
+# Identifiers a snippet may use without declaring that are not stubbed
+_GLOBALS = {"setTimeout", "setInterval", "setImmediate"}
+_KEYWORDS = {
+    "async", "await", "break", "case", "catch", "class", "const", "continue", "default", "delete", "do", "else",
+    "false", "finally", "for", "function", "if", "in", "instanceof", "let", "new", "null", "of", "return",
+    "switch", "this", "throw", "true", "try", "typeof", "undefined", "var", "void", "while", "yield",
+}
+
+
+@dataclass
+class Locate:
+    """Where a fixture's function is in App.js, and the name it is bound to."""
+    bind: str
+    # The function of that name, or the innermost function around the anchor
+    name: str | None = None
+    anchor: str | None = None
+    # With an anchor: the innermost useEffect callback around it
+    effect: bool = False
+
+
+@dataclass
+class Fixture:
+    name: str
+    description: str
+    functions: list[Locate]
+    op: str
+    setup: str = ""
+    teardown: str = "noop"
+    html: str = EDITOR_HTML
+    stubs: dict[str, str] = field(default_factory=dict)
+    # Text the extracted source must contain, else the version is "missing"
+    requires: str | None = None
+
+
+_SEED_POSTS = (
+    "localStorage.setItem('socialHubPosts', JSON.stringify(Array.from({ length: 30 }, (_, i) => ({"
+    " id: i, title: `Post ${i}`, content: `<p>${'Lorem ipsum dolor sit amet. '.repeat(40)}</p>`,"
+    " date: `2024-01-${String(i % 28 + 1).padStart(2, '0')}`, isFeatured: i % 7 === 0 }))));"
+)
+
+FIXTURES = {
+    "select-image": Fixture(
+        "select-image", "rebuild the selection toolbar and handles",
+        [Locate("selectImage", name="selectImage")],
+        op="() => selectImage(1)",
+    ),
+    "drag-resize": Fixture(
+        "drag-resize", "drag the south-east handle 20px",
+        [Locate("selectImage", name="selectImage")],
+        setup="selectImage(1);",
+        op="""() => {
+          const handle = document.querySelector('.handle-se');
+          const at = (x) => ({ bubbles: true, clientX: x, clientY: 100 });
+          handle.dispatchEvent(new MouseEvent('mousedown', at(100)));
+          for (let x = 102; x <= 120; x += 2) window.dispatchEvent(new MouseEvent('mousemove', at(x)));
+          window.dispatchEvent(new MouseEvent('mouseup', at(120)));
+        }""",
+        requires="'mousedown'",
+    ),
+    "image-click": Fixture(
+        "image-click", "click an editor image (delegated listener)",
+        [Locate("selectImage", name="selectImage"), Locate("imageEffect", anchor="handleImageClick", effect=True)],
+        setup="const cleanup = imageEffect(); const img = document.getElementById('img-1');",
+        op="() => img.dispatchEvent(new MouseEvent('click', { bubbles: true }))",
+        teardown="() => cleanup && cleanup()",
+    ),
+    "widget-poll": Fixture(
+        "widget-poll", "one refresh tick of the widget poller",
+        [Locate("pollEffect", anchor="setInterval(loadPosts", effect=True)],
+        setup=_SEED_POSTS + " const cleanup = pollEffect();",
+        op="() => timers[0]()",
+        teardown="() => cleanup && cleanup()",
+        html="<div id=\"root\"></div>",
+        stubs={
+            # The interval is ticked by the benchmark, not by the clock
+            "setInterval": "(fn) => timers.push(fn)",
+            "clearInterval": "noop",
+            "getPublishedPosts": "async () => { throw new Error('offline'); }",
+            "settings": "{ postCount: 3 }",
+        },
+    ),
+}
+
+
+@dataclass
+class BenchResult:
+    fixture: str
+    version: str
+    status: str
+    ops_per_sec: float | None = None
+    # Heap bytes per op: allocated during the op, still live after a full GC
+    alloc: float | None = None
+    retained: float | None = None
+    message: str = ""
+
+
+def _function_at(scopes: Scopes, tokens, text: str, locate: Locate) -> Function | None:
+    if locate.name is not None:
+        return next((f for f in scopes.functions
+                     if f.name and f.name.rpartition(".")[2] == locate.name and not f.name.startswith("window.")),
+                    None)
+    offset = text.find(locate.anchor)
+    if offset < 0:
+        return None
+    index = bisect_right([t.start for t in tokens], offset) - 1
+    chain = scopes.chain(index)
+    if locate.effect:
+        return next((f for f in chain if f.effect), None)
+    return chain[0] if chain else None
+
+
+@dataclass
+class _Binding:
+    name: str
+    # Innermost function it is declared in; None at module level
+    owner: Function | None
+    # Token range of its value: a const's initializer or a whole function
+    # declaration. None for bindings that cannot be extracted on their own
+    # (destructuring, parameters, `let x;`)
+    value: tuple[int, int] | None = None
+
+
+def _bindings(tokens, pairs: dict[int, int], scopes: Scopes) -> list[_Binding]:
+    out = []
+    for i, tok in enumerate(tokens[:-2]):
+        following = tokens[i + 1]
+        if tok.kind != IDENT or i and tokens[i - 1].value in (".", "?."):
+            continue
+        if tok.value == "function" and following.kind == IDENT and tokens[i + 2].value == "(" and i + 2 in pairs:
+            body = pairs[i + 2] + 1
+            if body in pairs:
+                out.append(_Binding(following.value, scopes.owner(i), (i, pairs[body])))
+        elif tok.value in DECLARATORS:
+            if following.value in "[{" and i + 1 in pairs:
+                out.extend(_Binding(t.value, scopes.owner(i)) for t in tokens[i + 2:pairs[i + 1]] if t.kind == IDENT)
+            elif following.kind == IDENT and tokens[i + 2].value == "=":
+                out.append(_Binding(following.value, scopes.owner(i),
+                                    (i + 3, expression_end(tokens, pairs, i + 3))))
+            elif following.kind == IDENT:
+                out.append(_Binding(following.value, scopes.owner(i)))
+    for function in scopes.functions:
+        # Parameters, without their default values
+        j = function.start
+        while j < function.body:
+            if tokens[j].value == "=":
+                j = expression_end(tokens, pairs, j + 1)
+            elif tokens[j].kind == IDENT and tokens[j].value not in _KEYWORDS:
+                out.append(_Binding(tokens[j].value, function))
+            j += 1
+    return out
+
+
+def _free_names(source: str) -> list[str]:
+    """Identifiers a snippet uses without binding them itself."""
+    tokens = tokenize(source)
+    pairs = match_brackets(tokens)
+    local = {b.name for b in _bindings(tokens, pairs, Scopes(tokens, pairs))}
+    names = []
+    for i, tok in enumerate(tokens):
+        if tok.kind != IDENT or tok.value in local or tok.value in names or tok.value in _KEYWORDS:
+            continue
+        if i and tokens[i - 1].value in (".", "?."):
+            continue
+        # { key: value }
+        if i and tokens[i - 1].value in ("{", ",") and i + 1 < len(tokens) and tokens[i + 1].value == ":":
+            continue
+        names.append(tok.value)
+    return names
+
+
+def _stub(name: str) -> str | None:
+    """no-op setters for setX(...) and { current: editor } for xRef."""
+    if name.startswith("set") and name[3:4].isupper():
+        return "noop"
+    if name.endswith("Ref") and len(name) > 3:
+        return "{ current: document.getElementById('editor') }"
+    return None
+
+
+def extract(text: str, locates: list[Locate], provided: set[str] = frozenset()) -> dict[str, str] | None:
+    """Source of each located function, by bound name; None if any is missing.
+
+    The helpers they use from enclosing scopes come first. Raises ValueError
+    naming what they use from App.js that is neither extractable, stubbed
+    nor in provided.
+    """
+    tokens = tokenize(text)
+    pairs = match_brackets(tokens)
+    scopes = Scopes(tokens, pairs)
+    found = {}
+    queue = []
+    for locate in locates:
+        function = _function_at(scopes, tokens, text, locate)
+        if function is None:
+            return None
+        found[locate.bind] = text[tokens[function.start].start:tokens[function.end].end]
+        queue.append((locate.bind, function.start, function.end))
+
+    bindings = _bindings(tokens, pairs, scopes)
+    imported = import_bindings(text)
+    helpers: dict[str, tuple[int, int]] = {}
+    unresolved: dict[str, str] = {}
+    while queue:
+        user, first, last = queue.pop(0)
+        chain = scopes.chain(first)
+        for name in _free_names(text[tokens[first].start:tokens[last].end]):
+            if name in found or name in helpers or name in provided or name in _GLOBALS or _stub(name):
+                continue
+            # The innermost binding in scope: a function around the snippet,
+            # then module level
+            visible = sorted((b for b in bindings if b.name == name and (b.owner is None or b.owner in chain)),
+                             key=lambda b: chain.index(b.owner) if b.owner in chain else len(chain))
+            if visible and visible[0].value is not None and visible[0].value[0] != first:
+                helpers[name] = visible[0].value
+                queue.append((name, *visible[0].value))
+            elif visible or name in imported:
+                unresolved.setdefault(name, user)
+    if unresolved:
+        raise ValueError("unresolved identifier(s): " + ", ".join(f"{name} (in {user})"
+                                                                  for name, user in unresolved.items()))
+    ordered = {name: text[tokens[first].start:tokens[last].end]
+               for name, (first, last) in sorted(helpers.items(), key=lambda item: item[1])}
+    return ordered | found
+
+
+def _auto_stubs(sources: list[str], taken: set[str]) -> dict[str, str]:
+    stubs = {}
+    for source in sources:
+        for name in _free_names(source):
+            if name not in taken and name not in _GLOBALS and name not in stubs and _stub(name):
+                stubs[name] = _stub(name)
+    return stubs
+
+
+def fixture_code(fixture: Fixture, functions: dict[str, str]) -> str:
+    """JS that sets the fixture up and evaluates to { op, teardown }."""
+    stubs = dict(fixture.stubs)
+    stubs.update(_auto_stubs(list(functions.values()), set(functions) | set(stubs)))
+    out = ["(() => {", "const noop = () => {};", "const timers = [];"]
+    out.extend(f"const {name} = {value};" for name, value in stubs.items())
+    out.extend(f"const {name} = {source};" for name, source in functions.items())
+    out.append(fixture.setup)
+    out.append(f"return {{ op: {fixture.op}, teardown: {fixture.teardown} }};")
+    out.append("})()")
+    return "\n".join(out)
+
+
+def load_version(root: str | Path, version: str, base: str = TARGET) -> str:
+    """App.js text for a version: a revision, or a variant applied to base."""
+    if version.endswith((".py", ".toml")):
+        run = run_variant(str(root), version, base, load_revision(root, base), 1)
+        if run.exit_code:
+            raise ValueError(f"{version} failed on {base}: {run.stdout.strip().splitlines()[-1:]}")
+        return run.output
+    return load_revision(root, version)
+
+
+def default_versions(root: str | Path = ".") -> list[str]:
+    return [item for item in DEFAULT_CORPUS if (Path(root) / item).is_file()]
+
+
+def run_benchmarks(fixtures: list[str], versions: list[str], root: str | Path = ".", base: str = TARGET,
+                   duration: float = DEFAULT_DURATION, node: str | None = None) -> tuple[list[BenchResult], str]:
+    """Benchmark every (fixture, version) pair. Returns the results and the DOM used."""
+    results: dict[tuple[str, str], BenchResult] = {}
+    cases = []
+    for version in versions:
+        try:
+            text = load_version(root, version, base)
+        except (OSError, ValueError, subprocess.CalledProcessError) as exc:
+            for name in fixtures:
+                results[name, version] = BenchResult(name, version, ERROR, message=str(exc))
+            continue
+        for name in fixtures:
+            fixture = FIXTURES[name]
+            try:
+                functions = extract(text, fixture.functions, set(fixture.stubs))
+            except ValueError as exc:
+                results[name, version] = BenchResult(name, version, ERROR, message=str(exc))
+                continue
+            if functions is None or fixture.requires and not any(fixture.requires in s for s in functions.values()):
+                results[name, version] = BenchResult(name, version, MISSING, message="snippet not in this version")
+                continue
+            cases.append({"fixture": name, "version": version, "html": fixture.html,
+                          "code": fixture_code(fixture, functions)})
+
+    dom = "none"
+    if cases:
+        node = node or shutil.which("node")
+        answer = {"error": "node is not on the PATH"} if node is None else _ask_worker(node, root, cases, duration)
+        dom = answer.get("dom", dom)
+        for case in cases:
+            results[case["fixture"], case["version"]] = BenchResult(
+                case["fixture"], case["version"], ERROR, message=answer.get("error", "no result"))
+        for item in answer.get("results", []):
+            key = item["fixture"], item["version"]
+            if item.get("error"):
+                results[key] = BenchResult(*key, ERROR, message=item["error"])
+            else:
+                results[key] = BenchResult(*key, OK, item["ops"] / item["seconds"], item["alloc"], item["retained"])
+    ordered = [results[name, version] for name in fixtures for version in versions]
+    return ordered, dom
+
+
+def _ask_worker(node: str, root: str | Path, cases: list[dict], duration: float) -> dict:
+    request = json.dumps({"duration": duration, "cases": cases})
+    try:
+        proc = subprocess.run(
+            [node, "--no-warnings", "--expose-gc", "--max-semi-space-size=64", str(WORKER),
+             str(Path(root).resolve())],
+            input=request, capture_output=True, text=True, encoding="utf-8",
+        )
+        return json.loads(proc.stdout)
+    except (OSError, ValueError) as exc:
+        return {"error": f"benchmark worker failed: {exc}"}
+
+
+def _bytes(value: float | None) -> str:
+    if value is None:
+        return "-"
+    return f"{value / 1024:.1f}K" if value >= 1024 else f"{value:.0f}"
+
+
+def format_results(results: list[BenchResult], dom: str) -> str:
+    out = [f"DOM: {dom}"]
+    current = None
+    reference = None
+    for result in results:
+        if result.fixture != current:
+            current, reference = result.fixture, None
+            out.append(f"{current}: {FIXTURES[current].description}")
+            out.append(f"  {'version':<44} {'ops/sec':>10} {'alloc/op':>9} {'kept/op':>8}")
+        if result.status != OK:
+            out.append(f"  {result.version:<44} {result.status}: {result.message}")
+            continue
+        relative = ""
+        if reference is None:
+            reference = result.ops_per_sec
+        elif reference:
+            relative = f"  {result.ops_per_sec / reference:.2f}x"
+        out.append(f"  {result.version:<44} {result.ops_per_sec:>10.0f} {_bytes(result.alloc):>9} "
+                   f"{_bytes(result.retained):>8}{relative}")
+    return "\n".join(out)
@@ -0,0 +1,123 @@
+// Micro-benchmark worker for patchkit (see bench.py).
+//
+// Run once per benchmark as
+//
+//   node --expose-gc --max-semi-space-size=64 bench_worker.js <repo root>
+//
+// Reads one JSON request on stdin:
+//
+//   {"duration": 1.0, "cases": [{"fixture": "drag-resize", "version": "src/App.js",
+//    "html": "<div ...>", "code": "(() => { ...; return { op, teardown }; })()"}]}
+//
+// and writes one JSON answer on stdout:
+//
+//   {"dom": "jsdom 24.0.0", "results": [{"fixture": ..., "version": ...,
+//    "ops": 51234, "seconds": 1.0, "alloc": 1840.2, "retained": 0.4}]}
+//
+// Every case gets a fresh jsdom window; its code is evaluated in that window
+// and must return { op, teardown }. op may return a promise. Timing runs op
+// in a loop for `duration` seconds after a warm-up. Allocation is measured
+// in a separate run: the heap growth per op between forced collections, with
+// a young generation large enough that nothing is collected in between
+// (alloc), and what is still live after a full collection (retained).
+//
+// jsdom is loaded from the repo's node_modules (react-scripts depends on it);
+// without it the answer is {"error": "..."} and nothing runs.
+
+'use strict';
+
+const root = process.argv[2] || process.cwd();
+
+const WARMUP_OPS = 50;
+const ALLOC_OPS = 200;
+// Stop the allocation run before the young generation (64 MB) fills up
+const ALLOC_LIMIT = 32 * 1024 * 1024;
+
+const load = (name) => {
+  try {
+    return require(require.resolve(name, { paths: [root, __dirname] }));
+  } catch (err) {
+    return null;
+  }
+};
+
+const version = (name) => {
+  const pkg = load(`${name}/package.json`);
+  return pkg ? `${name} ${pkg.version}` : name;
+};
+
+const run = async (op) => {
+  const result = op();
+  if (result && typeof result.then === 'function') await result;
+};
+
+const heap = () => process.memoryUsage().heapUsed;
+
+const bench = async (jsdom, request, item) => {
+  const dom = new jsdom.JSDOM(item.html, {
+    url: 'http://localhost/',
+    pretendToBeVisual: true,
+    runScripts: 'outside-only',
+    // Discard the snippets' console output
+    virtualConsole: new jsdom.VirtualConsole(),
+  });
+  const out = { fixture: item.fixture, version: item.version };
+  try {
+    const fixture = dom.window.eval(item.code);
+    for (let i = 0; i < WARMUP_OPS; i++) await run(fixture.op);
+
+    let ops = 0;
+    const start = process.hrtime.bigint();
+    const limit = BigInt(Math.round(request.duration * 1e9));
+    let elapsed = 0n;
+    let batch = 1;
+    while (elapsed < limit) {
+      for (let i = 0; i < batch; i++) await run(fixture.op);
+      ops += batch;
+      elapsed = process.hrtime.bigint() - start;
+      batch = Math.min(batch * 2, 1024);
+    }
+    out.ops = ops;
+    out.seconds = Number(elapsed) / 1e9;
+
+    global.gc();
+    const before = heap();
+    let count = 0;
+    while (count < ALLOC_OPS && heap() - before < ALLOC_LIMIT) {
+      await run(fixture.op);
+      count++;
+    }
+    const grown = heap() - before;
+    global.gc();
+    out.alloc = Math.max(grown, 0) / count;
+    out.retained = Math.max(heap() - before, 0) / count;
+    if (fixture.teardown) fixture.teardown();
+  } catch (err) {
+    out.error = `${err && err.name}: ${err && err.message}`;
+  } finally {
+    dom.window.close();
+  }
+  return out;
+};
+
+const main = async () => {
+  let input = '';
+  for await (const chunk of process.stdin) input += chunk;
+  const request = JSON.parse(input);
+  const jsdom = load('jsdom');
+  if (!jsdom) {
+    process.stdout.write(JSON.stringify({ error: 'jsdom not found in node_modules (react-scripts brings it in: npm install)' }));
+    return;
+  }
+  if (typeof global.gc !== 'function') {
+    process.stdout.write(JSON.stringify({ error: 'node was started without --expose-gc' }));
+    return;
+  }
+  const results = [];
+  for (const item of request.cases) results.push(await bench(jsdom, request, item));
+  process.stdout.write(JSON.stringify({ dom: version('jsdom'), results }));
+};
+
+main().catch((err) => {
+  process.stdout.write(JSON.stringify({ error: String(err && err.stack || err) }));
+});
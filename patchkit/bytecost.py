@@ -0,0 +1,330 @@
+"""
+What each patch adds to the shipped bundle, and a budget for it.
+
+Every patch grows its target - add_drag_resize*.py by ~90 lines,
+fix_useeffect_cleanup.py by ~110 - and nothing tracked it. Here each target's
+specs are applied in order and the file is measured before and after every
+one that applied: raw bytes, gzip (level 9) and brotli (quality 11). A
+patch's cost is the sum over its targets. Compressed deltas are of the whole
+file, so a patch that repeats code already in the file costs little.
+
+`apply` measures the text after each patch as the run produces it, so a
+budget check costs one gzip per applied patch and nothing is re-applied;
+cached outputs keep their costs. Brotli comes from the `brotli` package if it
+is installed, else, only when asked for (`size`, or a budget with a brotli
+limit), from node's zlib: one node process per batch of texts not measured
+before, with sizes cached by content hash in .patchkit/brotli.json. Without
+either, brotli is not reported and brotli budgets are not checked.
+
+The budget lives in patch-budget.toml at the repo root:
+
+    [total]                         # all patches together
+    gzip = 20000
+
+    [patch."fix-useeffect-cleanup"] # one patch, over all its targets
+    raw = 5000
+    gzip = 1400
+
+`apply` checks it before writing and writes nothing for a patch (or, for the
+total, at all) that goes over. `size --write-budget` adds an entry for every
+patch that has none, at its current cost plus headroom; a patch that shrinks
+its target gets the headroom floor, so it may not grow past its current size
+by more than that.
+"""
+
+from __future__ import annotations
+
+import base64
+import gzip
+import hashlib
+import json
+import math
+import os
+import shutil
+import subprocess
+import tomllib
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from .engine import APPLIED, apply_patch
+from .spec import PatchSpec
+
+BUDGET_FILE = "patch-budget.toml"
+METRICS = ("raw", "gzip", "brotli")
+DEFAULT_HEADROOM = 0.10
+# Smallest limit --write-budget gives a patch, in bytes
+MIN_LIMIT = 64
+
+try:
+    import brotli as _brotli
+except ImportError:
+    _brotli = None
+
+_NODE_BROTLI = (
+    "const z=require('zlib');let d='';process.stdin.on('data',c=>d+=c).on('end',()=>"
+    "process.stdout.write(JSON.stringify(JSON.parse(d).map(s=>"
+    "z.brotliCompressSync(Buffer.from(s,'base64')).length))))"
+)
+
+
+class BudgetError(Exception):
+    pass
+
+
+@dataclass
+class Cost:
+    patch: str
+    target: str
+    raw: int
+    gzip: int
+    brotli: int | None = None
+
+
+@dataclass
+class PatchCost:
+    """One patch's cost summed over its targets."""
+    patch: str
+    targets: list[str] = field(default_factory=list)
+    raw: int = 0
+    gzip: int = 0
+    brotli: int | None = 0
+
+    def get(self, metric: str) -> int | None:
+        return getattr(self, metric)
+
+
+@dataclass
+class Budget:
+    path: str
+    total: dict[str, int] = field(default_factory=dict)
+    patches: dict[str, dict[str, int]] = field(default_factory=dict)
+
+    def wants_brotli(self) -> bool:
+        return any("brotli" in limits for limits in [self.total, *self.patches.values()])
+
+
+def _node_brotli(blobs: list[bytes]) -> list[int | None]:
+    node = shutil.which("node")
+    if node is None or not blobs:
+        return [None] * len(blobs)
+    payload = json.dumps([base64.b64encode(blob).decode("ascii") for blob in blobs])
+    try:
+        proc = subprocess.run([node, "-e", _NODE_BROTLI], input=payload, capture_output=True, text=True,
+                              check=True, timeout=120)
+        return json.loads(proc.stdout)
+    except (OSError, subprocess.SubprocessError, ValueError):
+        return [None] * len(blobs)
+
+
+class Sizer:
+    """Measures texts: raw and gzip always, brotli when it is cheap or asked for.
+
+    Brotli sizes from node are cached by content hash in cache_dir/brotli.json.
+    """
+
+    def __init__(self, brotli: bool = True, cache_dir: str | Path | None = None):
+        self.brotli = brotli
+        self.path = Path(cache_dir) / "brotli.json" if cache_dir is not None else None
+        self.known: dict[str, int] = {}
+        self.dirty = False
+        if self.path is None:
+            return
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                self.known = json.load(f)
+        except (OSError, ValueError):
+            pass
+
+    def measure(self, blobs: list[bytes]) -> list[tuple[int, int, int | None]]:
+        """(raw, gzip, brotli) sizes of each blob; brotli may be None."""
+        if _brotli is not None:
+            brotli_sizes = [len(_brotli.compress(blob)) for blob in blobs]
+        elif self.brotli:
+            digests = [hashlib.sha256(blob).hexdigest() for blob in blobs]
+            # One node process for every blob not measured before
+            missing = {d: blob for d, blob in zip(digests, blobs) if d not in self.known}
+            for digest, size in zip(missing, _node_brotli(list(missing.values())) if missing else []):
+                if size is not None:
+                    self.known[digest] = size
+                    self.dirty = True
+            brotli_sizes = [self.known.get(d) for d in digests]
+        else:
+            brotli_sizes = [None] * len(blobs)
+        return [(len(blob), len(gzip.compress(blob, 9, mtime=0)), b) for blob, b in zip(blobs, brotli_sizes)]
+
+    def costs(self, runs: list[tuple[str, bytes, list[tuple[str, bytes]]]]) -> list[Cost]:
+        """Cost of each step of each (target, text before, [(spec id, text after it)]) run."""
+        # One measurement batch for every version of every target
+        sizes = iter(self.measure([blob for _, before, steps in runs for blob in [before, *(b for _, b in steps)]]))
+        costs = []
+        for target, _, steps in runs:
+            old = next(sizes)
+            for spec_id, _ in steps:
+                new = next(sizes)
+                brotli = new[2] - old[2] if new[2] is not None and old[2] is not None else None
+                costs.append(Cost(spec_id, target, new[0] - old[0], new[1] - old[1], brotli))
+                old = new
+        return costs
+
+    def save(self) -> None:
+        if self.path is None or not self.dirty:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.known, f)
+        os.replace(tmp, self.path)
+        self.dirty = False
+
+
+def _steps(group: list[PatchSpec], text: str) -> list[tuple[str, bytes]]:
+    """(id, text after it) for each spec that changed the text."""
+    steps = []
+    for spec in group:
+        output, result = apply_patch(spec, text)
+        if result.status == APPLIED and output != text:
+            steps.append((spec.id, output.encode("utf-8")))
+            text = output
+    return steps
+
+
+def account(groups: dict[str, list[PatchSpec]], root: str | Path = ".", sizer: Sizer | None = None) -> list[Cost]:
+    """Per (patch, target) byte deltas, for targets grouped as the runner does."""
+    root = Path(root)
+    sizer = sizer or Sizer()
+    runs = []
+    for target, group in groups.items():
+        try:
+            text = (root / target).read_text(encoding="utf-8")
+        except OSError:
+            continue
+        steps = _steps(group, text)
+        if steps:
+            runs.append((target, text.encode("utf-8"), steps))
+    costs = sizer.costs(runs)
+    sizer.save()
+    return costs
+
+
+def by_patch(costs: list[Cost]) -> list[PatchCost]:
+    totals: dict[str, PatchCost] = {}
+    for cost in costs:
+        entry = totals.setdefault(cost.patch, PatchCost(cost.patch))
+        entry.targets.append(cost.target)
+        entry.raw += cost.raw
+        entry.gzip += cost.gzip
+        entry.brotli = None if entry.brotli is None or cost.brotli is None else entry.brotli + cost.brotli
+    return list(totals.values())
+
+
+def _limits(table, where: str) -> dict[str, int]:
+    if not isinstance(table, dict):
+        raise BudgetError(f"{where}: expected a table")
+    for key, value in table.items():
+        if key not in METRICS:
+            raise BudgetError(f"{where}: unknown key {key!r} (expected {', '.join(METRICS)})")
+        if not isinstance(value, int) or isinstance(value, bool):
+            raise BudgetError(f"{where}.{key}: expected a whole number of bytes")
+    return dict(table)
+
+
+def load_budget(path: str | Path) -> Budget | None:
+    """The budget file, or None if there is none."""
+    try:
+        raw = Path(path).read_bytes()
+    except FileNotFoundError:
+        return None
+    try:
+        data = tomllib.loads(raw.decode("utf-8"))
+    except tomllib.TOMLDecodeError as exc:
+        raise BudgetError(f"{path}: {exc}") from None
+    unknown = set(data) - {"total", "patch"}
+    if unknown:
+        raise BudgetError(f"{path}: unknown table(s) {', '.join(sorted(unknown))}")
+    patches = data.get("patch", {})
+    if not isinstance(patches, dict):
+        raise BudgetError(f"{path}: [patch] must hold one table per patch id")
+    return Budget(
+        str(path),
+        _limits(data.get("total", {}), "total"),
+        {patch_id: _limits(limits, f"patch.{patch_id}") for patch_id, limits in patches.items()},
+    )
+
+
+def check(costs: list[PatchCost], budget: Budget) -> list[tuple[str | None, str]]:
+    """(patch id or None for the total, message) for every limit exceeded."""
+    over = []
+    for cost in costs:
+        for metric, limit in budget.patches.get(cost.patch, {}).items():
+            value = cost.get(metric)
+            if value is not None and value > limit:
+                over.append((cost.patch, f"{cost.patch} adds {value} {metric} bytes, budget {limit}"))
+    for metric, limit in budget.total.items():
+        values = [c.get(metric) for c in costs]
+        if None in values:
+            continue
+        if sum(values) > limit:
+            over.append((None, f"all patches add {sum(values)} {metric} bytes, budget {limit}"))
+    return over
+
+
+def write_budget(path: str | Path, costs: list[PatchCost], headroom: float = DEFAULT_HEADROOM) -> list[str]:
+    """Add limits for patches without an entry (cost plus headroom). Returns their ids.
+
+    A limit is never below MIN_LIMIT; a patch that shrinks its target counts
+    as adding nothing, so its limit is that floor. The total, if there is
+    none, is what the patches add together plus headroom. The file's header comment
+    is kept.
+    """
+    path = Path(path)
+    budget = load_budget(path) or Budget(str(path))
+    added = []
+    for cost in costs:
+        if cost.patch in budget.patches:
+            continue
+        budget.patches[cost.patch] = {
+            metric: _limit(cost.get(metric), headroom) for metric in METRICS if cost.get(metric) is not None
+        }
+        added.append(cost.patch)
+    if not budget.total:
+        budget.total = {metric: _limit(sum(max(c.get(metric), 0) for c in costs), headroom)
+                        for metric in ("raw", "gzip")}
+    # Keep the file's own header comment, if it has one
+    header = []
+    if path.is_file():
+        for line in path.read_text(encoding="utf-8").splitlines():
+            if not line.startswith("#"):
+                break
+            header.append(line)
+    out = (header or [
+        "# Bytes each patch may add to its target(s); see patchkit/bytecost.py.",
+        "# `python -m patchkit apply` writes nothing that goes over.",
+    ]) + ["", "[total]"]
+    out.extend(f"{metric} = {value}" for metric, value in budget.total.items())
+    for patch_id, limits in budget.patches.items():
+        out.extend(["", f"[patch.{json.dumps(patch_id)}]"])
+        out.extend(f"{metric} = {value}" for metric, value in limits.items())
+    path.write_text("\n".join(out) + "\n", encoding="utf-8")
+    return added
+
+
+def _limit(cost: int, headroom: float) -> int:
+    return max(math.ceil(max(cost, 0) * (1 + headroom)), MIN_LIMIT)
+
+
+def _signed(value: int | None) -> str:
+    return "n/a" if value is None else f"{value:+d}"
+
+
+def format_costs(costs: list[PatchCost], budget: Budget | None = None) -> str:
+    out = [f"{'patch':<40} {'raw':>9} {'gzip':>9} {'brotli':>9}"]
+    for cost in costs:
+        limits = budget.patches.get(cost.patch, {}) if budget else {}
+        marks = [_signed(cost.get(m)) + ("!" if cost.get(m) is not None and m in limits
+                                          and cost.get(m) > limits[m] else "") for m in METRICS]
+        out.append(f"{cost.patch:<40} {marks[0]:>9} {marks[1]:>9} {marks[2]:>9}")
+    totals = [None if any(c.get(m) is None for c in costs) else sum(c.get(m) for c in costs) for m in METRICS]
+    out.append(f"{'total':<40} {_signed(totals[0]):>9} {_signed(totals[1]):>9} {_signed(totals[2]):>9}")
+    if costs and totals[2] is None:
+        out.append("- brotli: install the brotli package or put node on the PATH")
+    return "\n".join(out)
@@ -0,0 +1,119 @@
+"""
+Content-addressed cache of patch outputs.
+
+An entry is keyed by (input file hash, hashes of the specs applied to it, in
+order, ENGINE_VERSION) and holds the patched output plus the JSON report.
+Entries are immutable and published with a single directory rename, so one
+cache directory can be shared between machines (e.g. on a network mount or
+restored by CI) without locking.
+
+Eviction is LRU by entry mtime, which is bumped on every hit, and keeps the
+cache under a size cap.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+import uuid
+from pathlib import Path
+
+from . import ENGINE_VERSION
+from .spec import PatchSpec
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+CACHE_ENV = "PATCHKIT_CACHE_DIR"
+
+
+def cache_key(input_bytes: bytes, specs: list[PatchSpec]) -> str:
+    h = hashlib.sha256()
+    h.update(f"engine {ENGINE_VERSION}\n".encode())
+    h.update(hashlib.sha256(input_bytes).digest())
+    for spec in specs:
+        h.update(f"\n{spec.id}\0{spec.digest}".encode())
+    return h.hexdigest()
+
+
+def default_cache_dir(root: str | Path = ".") -> Path:
+    return Path(os.environ.get(CACHE_ENV) or Path(root) / ".patchkit" / "outputs")
+
+
+class OutputCache:
+    def __init__(self, directory: str | Path, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+
+    def _entry(self, key: str) -> Path:
+        return self.directory / key[:2] / key
+
+    def get(self, key: str) -> tuple[Path, dict] | None:
+        """Return (path of cached output, report) or None on a miss."""
+        entry = self._entry(key)
+        try:
+            with open(entry / "report.json", encoding="utf-8") as f:
+                report = json.load(f)
+        except (OSError, ValueError):
+            return None
+        try:
+            os.utime(entry)
+        except OSError:
+            pass
+        return entry / "output", report
+
+    def put(self, key: str, output: bytes, report: dict) -> None:
+        entry = self._entry(key)
+        if entry.exists():
+            return
+        entry.parent.mkdir(parents=True, exist_ok=True)
+        tmp = entry.parent / f".{key}.{uuid.uuid4().hex}.tmp"
+        tmp.mkdir()
+        (tmp / "output").write_bytes(output)
+        (tmp / "report.json").write_text(json.dumps(report), encoding="utf-8")
+        try:
+            os.rename(tmp, entry)
+        except OSError:
+            # Another writer published the same key first
+            shutil.rmtree(tmp, ignore_errors=True)
+            return
+        self.evict()
+
+    def entries(self) -> list[tuple[float, int, Path]]:
+        """(mtime, size, path) for every published entry."""
+        found = []
+        if not self.directory.is_dir():
+            return found
+        for shard in self.directory.iterdir():
+            if not shard.is_dir():
+                continue
+            for entry in shard.iterdir():
+                if entry.name.startswith("."):
+                    continue
+                try:
+                    size = sum(f.stat().st_size for f in entry.iterdir())
+                    found.append((entry.stat().st_mtime, size, entry))
+                except OSError:
+                    continue
+        return found
+
+    def evict(self, max_bytes: int | None = None) -> int:
+        """Drop least recently used entries until under the cap. Returns bytes freed."""
+        cap = self.max_bytes if max_bytes is None else max_bytes
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+        freed = 0
+        for _, size, entry in entries:
+            if total <= cap:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+            freed += size
+        return freed
+
+    def stats(self) -> tuple[int, int]:
+        entries = self.entries()
+        return len(entries), sum(size for _, size, _ in entries)
+
+    def clear(self) -> None:
+        shutil.rmtree(self.directory, ignore_errors=True)
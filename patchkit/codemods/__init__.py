@@ -0,0 +1,96 @@
+"""
+Token-aware codemods that a spec can run instead of a list of [[edit]]s.
+
+Some rewrites cannot be written as anchored line edits: wrapping every call
+of a function, or every definition of a name, wherever it appears. A spec
+names one of these instead:
+
+    id = "perf-marks"
+    target = "src/App.js"
+    codemod = "perf-marks"
+
+    [params]
+    functions = ["selectImage"]
+
+A codemod is a function (text, params) -> (output, messages) registered under
+its name. It raises CodemodError when it cannot apply, and must leave text
+that it has already transformed unchanged, so runs stay idempotent. Its
+version is folded into the spec digest, so bumping it invalidates cached
+outputs and replay state.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Callable
+
+from ..jstokens import IDENT, PUNCT, STRING
+
+
+class CodemodError(Exception):
+    """Raised by a codemod that cannot be applied to its input."""
+
+
+@dataclass(frozen=True)
+class Codemod:
+    name: str
+    func: Callable[[str, dict], tuple[str, list[str]]]
+    version: str
+    params: frozenset[str]
+
+
+CODEMODS: dict[str, Codemod] = {}
+
+
+def splice(text: str, edits: list[tuple[int, int, str]]) -> str:
+    """Replace text[start:end] with each snippet; edits must not overlap."""
+    parts = []
+    pos = 0
+    for start, end, snippet in sorted(edits, key=lambda e: (e[0], e[1])):
+        parts.append(text[pos:start])
+        parts.append(snippet)
+        pos = end
+    parts.append(text[pos:])
+    return "".join(parts)
+
+
+def line_indent(text: str, offset: int) -> str:
+    """Leading whitespace of the line containing offset."""
+    start = text.rfind("\n", 0, offset) + 1
+    line = text[start:offset]
+    return line[: len(line) - len(line.lstrip())]
+
+
+def after_imports(tokens) -> int:
+    """Offset just past the last top-level import statement (0 if none)."""
+    end = 0
+    depth = 0
+    for i, tok in enumerate(tokens):
+        if tok.kind == PUNCT and tok.value in "{([":
+            depth += 1
+        elif tok.kind == PUNCT and tok.value in "})]":
+            depth -= 1
+        elif depth == 0 and tok.kind == IDENT and tok.value == "import" and (
+            i + 1 < len(tokens) and tokens[i + 1].value not in ("(", ".")
+        ):
+            # The statement ends at its module specifier (and optional ';')
+            j = i + 1
+            while j < len(tokens) and tokens[j].kind != STRING:
+                j += 1
+            if j == len(tokens):
+                break
+            end = tokens[j].end
+            if j + 1 < len(tokens) and tokens[j + 1].value == ";":
+                end = tokens[j + 1].end
+    return end
+
+
+def codemod(name: str, version: str = "1", params: tuple[str, ...] = ()):
+    """Register the decorated function as codemod `name`."""
+    def register(func):
+        CODEMODS[name] = Codemod(name, func, version, frozenset(params))
+        return func
+    return register
+
+
+from . import downscale, inlinestyles, lazysections, perfmarks, responsiveimages  # noqa: E402,F401  (register their codemods)
@@ -0,0 +1,84 @@
+"""
+downscale-uploads: shrink images in the browser before they are uploaded.
+
+Every awaited call of an upload function in `calls` gets its file argument
+passed through downscaleImage (src/utils/imageDownscale.js) first:
+
+    const result = await uploadImageToCloudinary(file);
+    const result = await uploadImageToCloudinary(await downscaleImage(file, { maxWidth: 1920, quality: 0.82 }));
+
+The image is resized to `max_width` and re-encoded as WebP (JPEG where the
+browser has no WebP encoder) at `quality`, in a worker where OffscreenCanvas
+is available. Upload results carry the new dimensions, so the inserted image
+is the downscaled one too. Calls that are not awaited are left alone, since
+the argument cannot be awaited there.
+"""
+
+from __future__ import annotations
+
+from ..jstokens import IDENT, match_brackets, tokenize
+from . import CodemodError, after_imports, codemod, splice
+
+HELPER = "downscaleImage"
+
+
+def _first_argument(tokens, pairs, open_paren: int) -> tuple[int, int] | None:
+    """Token range [start, end) of the first argument of a call."""
+    close = pairs.get(open_paren)
+    if close is None or close == open_paren + 1:
+        return None
+    j = open_paren + 1
+    while j < close and tokens[j].value != ",":
+        if tokens[j].value in "([{" and j in pairs:
+            j = pairs[j]
+        j += 1
+    return open_paren + 1, j
+
+
+@codemod("downscale-uploads", params=("calls", "max_width", "quality", "module"))
+def downscale_uploads(text: str, params: dict) -> tuple[str, list[str]]:
+    calls = params.get("calls", ["uploadImageToCloudinary"])
+    if not isinstance(calls, list) or not all(isinstance(n, str) for n in calls):
+        raise CodemodError("'calls' must be a list of function names")
+    max_width = params.get("max_width", 1920)
+    quality = params.get("quality", 0.82)
+    if not isinstance(max_width, int) or max_width <= 0:
+        raise CodemodError("'max_width' must be a positive integer")
+    if not isinstance(quality, (int, float)) or not 0 < quality <= 1:
+        raise CodemodError("'quality' must be between 0 and 1")
+    module = params.get("module", "./utils/imageDownscale")
+
+    tokens = tokenize(text)
+    pairs = match_brackets(tokens)
+    edits: list[tuple[int, int, str]] = []
+    messages = []
+    options = f"{{ maxWidth: {max_width}, quality: {quality} }}"
+
+    for name in calls:
+        count = skipped = 0
+        for i, tok in enumerate(tokens[:-1]):
+            if tok.kind != IDENT or tok.value != name or tokens[i + 1].value != "(":
+                continue
+            if i and tokens[i - 1].value in (".", "function", "const", "let", "var", "import", ","):
+                continue
+            if not i or tokens[i - 1].value != "await":
+                skipped += 1
+                continue
+            arg = _first_argument(tokens, pairs, i + 1)
+            if arg is None:
+                continue
+            start, end = arg
+            if tokens[start].value == "await" and tokens[start + 1].value == HELPER:
+                continue
+            source = text[tokens[start].start:tokens[end - 1].end]
+            edits.append((tokens[start].start, tokens[end - 1].end, f"await {HELPER}({source}, {options})"))
+            count += 1
+        note = f", {skipped} not awaited" if skipped else ""
+        messages.append(f"{'✓' if count else '-'} {name}(): {count} upload(s) downscaled{note}")
+
+    imported = f"from '{module}'" in text
+    if edits and not imported:
+        offset = after_imports(tokens)
+        edits.append((offset, offset, f"\nimport {{ {HELPER} }} from '{module}';"))
+
+    return splice(text, edits), messages
@@ -0,0 +1,294 @@
+"""
+inline-styles: replace inline style writes with class toggles.
+
+Each rule names a class and the exact CSS declarations it stands for:
+
+    [[params.rule]]
+    class = "position-left"
+    declarations = "float: left; margin: 0 15px 15px 0; display: inline-block; clear: left;"
+    group = "position"
+
+Three kinds of style writes are matched against the rules, by their exact set
+of (property, value) pairs:
+
+* `el.style.cssText = `...`` - the static declarations become
+  `el.classList.add('cls')`; declarations that use ${...} stay inline.
+* runs of `el.style.prop = '...'` statements on one element (`el` may be a
+  member expression such as `overlay.img`) - the run becomes one class
+  toggle. A rule with a `group` also removes the group's other classes; a
+  rule with `reset = true` (the un-styling that undoes a state) removes its
+  class instead of adding it. A run that matches no rule but only resets
+  properties (to none, transparent, '' ...) that exactly one class sets
+  removes that class, so an add is never left without its remove.
+* `style="..."` attributes inside HTML string/template literals - they become
+  `class="cls"`.
+
+The classes themselves live in the stylesheet (src/index.css); this codemod
+only rewrites the JavaScript. Writes that match no rule are left alone.
+"""
+
+from __future__ import annotations
+
+import re
+
+from ..jstokens import IDENT, STRING, TEMPLATE, tokenize
+from . import CodemodError, codemod, line_indent, splice
+
+_STYLE_ATTR_RE = re.compile(r"""\sstyle=(["'])([^"'<>]*)\1""")
+_CLASS_RE = re.compile(r"^-?[A-Za-z_][\w-]*$")
+# Values that undo a declaration rather than set one
+_RESET_VALUE_RE = re.compile(r"^(|none|initial|unset|inherit|transparent|.*\stransparent)$")
+
+
+def _camel_to_kebab(name: str) -> str:
+    if name == "cssFloat":
+        return "float"
+    return re.sub(r"[A-Z]", lambda m: "-" + m.group().lower(), name)
+
+
+def _norm_value(value: str) -> str:
+    value = re.sub(r"\s+", " ", value.strip())
+    return re.sub(r"\s*,\s*", ",", value)
+
+
+def parse_declarations(css: str) -> list[tuple[str, str]]:
+    """(property, value) pairs of a declaration list, in order, normalized."""
+    pairs = []
+    depth = 0
+    current = []
+    # Split on ';' outside ${...} and parentheses
+    for c in css:
+        if c in "{(":
+            depth += 1
+        elif c in "})":
+            depth -= 1
+        if c == ";" and depth <= 0:
+            pairs.append("".join(current))
+            current = []
+        else:
+            current.append(c)
+    pairs.append("".join(current))
+
+    out = []
+    for decl in pairs:
+        if not decl.strip():
+            continue
+        prop, sep, value = decl.partition(":")
+        if not sep:
+            raise ValueError(f"not a declaration: {decl.strip()!r}")
+        out.append((prop.strip().lower(), _norm_value(value)))
+    return out
+
+
+class _Rule:
+    def __init__(self, data: dict, index: int):
+        if not isinstance(data, dict):
+            raise CodemodError(f"rule {index}: must be a table")
+        unknown = set(data) - {"class", "declarations", "group", "reset"}
+        if unknown:
+            raise CodemodError(f"rule {index}: unknown key(s) {', '.join(sorted(unknown))}")
+        self.cls = data.get("class")
+        if not isinstance(self.cls, str) or not _CLASS_RE.match(self.cls):
+            raise CodemodError(f"rule {index}: 'class' must be a CSS class name")
+        try:
+            self.key = frozenset(parse_declarations(data.get("declarations", "")))
+        except ValueError as exc:
+            raise CodemodError(f"rule {index}: {exc}") from None
+        if not self.key:
+            raise CodemodError(f"rule {index}: 'declarations' is empty")
+        self.group = data.get("group")
+        self.reset = bool(data.get("reset", False))
+        self.hits = 0
+
+
+def _rules(params: dict) -> list[_Rule]:
+    rules = [_Rule(data, i + 1) for i, data in enumerate(params.get("rule", []))]
+    if not rules:
+        raise CodemodError("no [[params.rule]] given")
+    return rules
+
+
+def _lookup(rules: list[_Rule], pairs, reset: bool | None = None) -> _Rule | None:
+    key = frozenset(pairs)
+    for rule in rules:
+        if rule.key == key and (reset is None or rule.reset == reset):
+            return rule
+    return None
+
+
+def _reset_rule(rules: list[_Rule], pairs) -> _Rule | None:
+    """The one class whose declarations a run of reset values undoes, if any."""
+    if not all(_RESET_VALUE_RE.match(value) for _, value in pairs):
+        return None
+    found = []
+    for rule in rules:
+        declared = dict(rule.key)
+        if not rule.reset and all(prop in declared and declared[prop] != value for prop, value in pairs):
+            found.append(rule)
+    return found[0] if len({rule.cls for rule in found}) == 1 else None
+
+
+def _statement_end(tokens, j: int) -> int:
+    """Index of the last token of a statement whose value ends at token j."""
+    return j + 1 if j + 1 < len(tokens) and tokens[j + 1].value == ";" else j
+
+
+def _style_target(tokens, i: int):
+    """For `V . style . X =` starting at i, return (V, X, index of '=').
+
+    V is an identifier or a member expression (`overlay.img`), as written.
+    """
+    if i + 5 >= len(tokens) or tokens[i].kind != IDENT:
+        return None
+    if i and tokens[i - 1].value in (".", "?."):
+        return None
+    j = i
+    while j + 2 < len(tokens) and tokens[j + 1].value == "." and tokens[j + 2].kind == IDENT \
+            and tokens[j + 2].value != "style":
+        j += 2
+    if j + 5 >= len(tokens):
+        return None
+    if [t.value for t in tokens[j + 1:j + 3]] != [".", "style"] or tokens[j + 3].value != ".":
+        return None
+    if tokens[j + 4].kind != IDENT or tokens[j + 5].value != "=":
+        return None
+    return "".join(t.value for t in tokens[i:j + 1]), tokens[j + 4].value, j + 5
+
+
+def _has_class_already(tokens, i: int, var: str, cls: str) -> bool:
+    """Whether `var.className = '... cls ...'` precedes token i since var was declared."""
+    word = re.compile(rf"(^|\s){re.escape(cls)}(\s|$)")
+    for j in range(i - 1, 2, -1):
+        tok = tokens[j]
+        if tok.kind == IDENT and tok.value == var and tokens[j - 1].value in ("const", "let", "var"):
+            return False
+        if (tok.kind == IDENT and tok.value == var and tokens[j + 1].value == "."
+                and tokens[j + 2].value == "className" and tokens[j + 3].value == "="
+                and tokens[j + 4].kind in (STRING, TEMPLATE)):
+            if word.search(tokens[j + 4].value.strip("'\"`")):
+                return True
+    return False
+
+
+def _toggle(rule: _Rule, rules: list[_Rule], var: str) -> list[str]:
+    if rule.reset:
+        return [f"{var}.classList.remove('{rule.cls}');"]
+    statements = []
+    if rule.group:
+        others = [r.cls for r in rules if r.group == rule.group and r.cls != rule.cls and not r.reset]
+        others = list(dict.fromkeys(others))
+        if others:
+            statements.append(f"{var}.classList.remove({', '.join(repr(c) for c in others)});")
+    statements.append(f"{var}.classList.add('{rule.cls}');")
+    return statements
+
+
+def _css_text(tokens, text, rules, edits) -> None:
+    for i in range(len(tokens)):
+        target = _style_target(tokens, i)
+        if target is None or target[1] != "cssText":
+            continue
+        var, _, eq = target
+        value = tokens[eq + 1] if eq + 1 < len(tokens) else None
+        if value is None or value.kind not in (STRING, TEMPLATE):
+            continue
+        body = value.value[1:-1]
+        try:
+            pairs = parse_declarations(body)
+        except ValueError:
+            continue
+        static = [p for p in pairs if "${" not in p[1]]
+        dynamic = [p for p in pairs if "${" in p[1]]
+        rule = _lookup(rules, static, reset=False)
+        if rule is None:
+            continue
+
+        end = _statement_end(tokens, eq + 1)
+        indent = line_indent(text, tokens[i].start)
+        lines = []
+        if not _has_class_already(tokens, i, var, rule.cls):
+            lines.append(f"{var}.classList.add('{rule.cls}');")
+        if dynamic:
+            inline = " ".join(f"{prop}: {val};" for prop, val in dynamic)
+            lines.append(f"{var}.style.cssText = `{inline}`;")
+        edits.append((tokens[i].start, tokens[end].end, f"\n{indent}".join(lines)))
+        rule.hits += 1
+
+
+def _property_runs(tokens, text, rules, edits) -> None:
+    i = 0
+    while i < len(tokens):
+        run = []
+        j = i
+        while True:
+            target = _style_target(tokens, j)
+            if target is None or target[1] == "cssText" or (run and target[0] != run[0][0]):
+                break
+            value = tokens[target[2] + 1] if target[2] + 1 < len(tokens) else None
+            if value is None or value.kind not in (STRING, TEMPLATE) or "${" in value.value:
+                break
+            end = _statement_end(tokens, target[2] + 1)
+            run.append((target[0], _camel_to_kebab(target[1]), _norm_value(value.value[1:-1]), j, end))
+            j = end + 1
+        if not run:
+            i += 1
+            continue
+        pairs = [(prop, val) for _, prop, val, _, _ in run]
+        var = run[0][0]
+        rule = _lookup(rules, pairs)
+        statements = _toggle(rule, rules, var) if rule is not None else []
+        if rule is None:
+            rule = _reset_rule(rules, pairs)
+            if rule is not None:
+                statements = [f"{var}.classList.remove('{rule.cls}');"]
+        if rule is not None:
+            indent = line_indent(text, tokens[run[0][3]].start)
+            edits.append((tokens[run[0][3]].start, tokens[run[-1][4]].end, f"\n{indent}".join(statements)))
+            rule.hits += 1
+        i = j
+
+
+def _style_attributes(tokens, rules, edits) -> None:
+    taken = [(start, end) for start, end, _ in edits]
+    for tok in tokens:
+        if tok.kind not in (STRING, TEMPLATE) or "style=" not in tok.value:
+            continue
+        if any(start < tok.end and tok.start < end for start, end in taken):
+            continue
+        body = tok.value
+
+        def replace(m):
+            try:
+                pairs = parse_declarations(m.group(2))
+            except ValueError:
+                return m.group()
+            rule = _lookup(rules, pairs, reset=False)
+            if rule is None:
+                return m.group()
+            # Leave tags that already carry a class attribute alone
+            tag_start = body.rfind("<", 0, m.start())
+            if re.search(r"\sclass=", body[tag_start:m.start()]) or re.match(r"[^>]*\sclass=", body[m.end():]):
+                return m.group()
+            rule.hits += 1
+            return f' class="{rule.cls}"'
+
+        new = _STYLE_ATTR_RE.sub(replace, body)
+        if new != body:
+            edits.append((tok.start, tok.end, new))
+
+
+@codemod("inline-styles", version="2", params=("rule",))
+def inline_styles(text: str, params: dict) -> tuple[str, list[str]]:
+    rules = _rules(params)
+    tokens = tokenize(text)
+    edits: list[tuple[int, int, str]] = []
+
+    _css_text(tokens, text, rules, edits)
+    _property_runs(tokens, text, rules, edits)
+    _style_attributes(tokens, rules, edits)
+
+    messages = [
+        f"{'✓' if rule.hits else '-'} {rule.cls}{' (reset)' if rule.reset else ''}: {rule.hits} site(s)"
+        for rule in rules
+    ]
+    return splice(text, edits), messages
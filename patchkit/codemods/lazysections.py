@@ -0,0 +1,345 @@
+"""
+lazy-sections: split the sections behind a `switch (activeSection)` into
+their own chunks.
+
+App.js renders one section at a time from a switch on a state variable:
+
+    const renderContent = () => {
+      switch (activeSection) {
+        case 'blog':
+          return <BlogSection />;
+        ...
+
+Every component imported as `import Name from './path';` that is only ever
+rendered by those cases (directly, or by a local component a case renders)
+becomes a React.lazy import:
+
+    const sectionLoaders = {
+      BlogSection: () => import('./components/BlogSection'),
+    };
+    const BlogSection = lazy(sectionLoaders.BlogSection);
+
+Components rendered anywhere else (routes, modals) are left static, since
+they would suspend outside the boundary. `components` restricts the split to
+the given names; by default every eligible import is split.
+
+Calls of the function holding the switch are wrapped in one Suspense
+boundary keyed on the state variable, so switching sections shows the
+fallback instead of the previous section:
+
+    <Suspense key={activeSection} fallback={<SectionFallback />}>{renderContent()}</Suspense>
+
+With `prefetch` (the default), every `onClick={() => setActiveSection(x)}`
+also gets onMouseEnter/onFocus handlers that start loading that section's
+chunks, so most clicks find them already loaded.
+"""
+
+from __future__ import annotations
+
+import re
+
+from ..jstokens import IDENT, STRING, match_brackets, string_value, tokenize
+from . import CodemodError, after_imports, codemod, line_indent, splice
+
+HELPER_MARKER = "const sectionLoaders = {"
+
+_IDENT_RE = re.compile(r"^[A-Za-z_$][\w$]*$")
+
+
+def _state_setter(tokens, state: str) -> str | None:
+    """SETTER of `const [state, SETTER] = useState(...)`."""
+    for i in range(len(tokens) - 5):
+        if (tokens[i].value == "[" and tokens[i + 1].value == state and tokens[i + 2].value == ","
+                and tokens[i + 3].kind == IDENT and tokens[i + 4].value == "]"):
+            return tokens[i + 3].value
+    return None
+
+
+def _find_switch(tokens, pairs, state: str):
+    """(index of '{', index of '}') of the body of `switch (state) {`."""
+    for i in range(len(tokens) - 4):
+        if (tokens[i].value == "switch" and tokens[i + 1].value == "(" and tokens[i + 2].value == state
+                and tokens[i + 3].value == ")" and tokens[i + 4].value == "{" and i + 4 in pairs):
+            return i + 4, pairs[i + 4]
+    return None
+
+
+def _definitions(tokens, pairs) -> dict[str, tuple[int, int]]:
+    """Token spans of `const Name = (...) => ...` and `function Name(...) {...}`."""
+    spans = {}
+    for i, tok in enumerate(tokens[:-3]):
+        if tok.kind != IDENT:
+            continue
+        prev = tokens[i - 1].value if i else ""
+        if prev == "function" and tokens[i + 1].value == "(" and i + 1 in pairs:
+            body = pairs[i + 1] + 1
+            if body < len(tokens) and tokens[body].value == "{" and body in pairs:
+                spans[tok.value] = (i, pairs[body])
+        elif prev in ("const", "let") and tokens[i + 1].value == "=":
+            j = i + 2
+            if tokens[j].value == "async":
+                j += 1
+            if tokens[j].value == "(" and j in pairs:
+                j = pairs[j] + 1
+            elif tokens[j].kind == IDENT:
+                j += 1
+            else:
+                continue
+            if j + 1 < len(tokens) and tokens[j].value == "=>" and tokens[j + 1].value in "({" \
+                    and j + 1 in pairs:
+                spans[tok.value] = (i, pairs[j + 1])
+    return spans
+
+
+def _jsx_tags(tokens, start: int, end: int) -> set[str]:
+    """Component names used as JSX tags between two token indexes."""
+    tags = set()
+    for i in range(start, min(end, len(tokens) - 1)):
+        if tokens[i].value == "<" and tokens[i + 1].kind == IDENT and tokens[i + 1].value[:1].isupper():
+            prev = tokens[i - 1] if i else None
+            # `a < B` is a comparison, not a tag
+            if prev is None or prev.kind != IDENT or prev.value in ("return", "case"):
+                tags.add(tokens[i + 1].value)
+    return tags
+
+
+def _rendered_by(tokens, spans, start: int, end: int, seen: set[str]) -> tuple[set[str], list]:
+    """Tags rendered from a token range, following local components, plus their spans."""
+    tags = set()
+    ranges = [(start, end)]
+    for tag in _jsx_tags(tokens, start, end):
+        tags.add(tag)
+        if tag in spans and tag not in seen:
+            seen.add(tag)
+            more, more_ranges = _rendered_by(tokens, spans, *spans[tag], seen)
+            tags |= more
+            ranges += more_ranges
+    return tags, ranges
+
+
+def _cases(tokens, body: tuple[int, int]) -> list[tuple[str, int, int]]:
+    """(case value, first token, last token) of each string case in a switch body."""
+    heads = []
+    depth = 0
+    for i in range(body[0] + 1, body[1]):
+        value = tokens[i].value
+        if value in "{([":
+            depth += 1
+        elif value in "})]":
+            depth -= 1
+        elif depth == 0 and value in ("case", "default"):
+            label = string_value(tokens[i + 1]) if value == "case" and tokens[i + 1].kind == STRING else None
+            heads.append((label, i))
+    cases = []
+    for n, (label, i) in enumerate(heads):
+        end = heads[n + 1][1] if n + 1 < len(heads) else body[1]
+        if label is not None:
+            cases.append((label, i, end))
+    return cases
+
+
+def _default_imports(tokens) -> dict[str, tuple[int, str]]:
+    """Name -> (index of `import`, module) for top-level `import Name from './x';`."""
+    found = {}
+    depth = 0
+    for i, tok in enumerate(tokens[:-3]):
+        if tok.value in "{([":
+            depth += 1
+        elif tok.value in "})]":
+            depth -= 1
+        elif (depth == 0 and tok.value == "import" and tokens[i + 1].kind == IDENT
+              and tokens[i + 2].value == "from" and tokens[i + 3].kind == STRING):
+            module = string_value(tokens[i + 3])
+            if module.startswith("."):
+                found[tokens[i + 1].value] = (i, module)
+    return found
+
+
+def _line_span(text: str, start: int, end: int) -> tuple[int, int]:
+    """Widen [start, end) to whole lines, including the trailing newline."""
+    line_start = text.rfind("\n", 0, start) + 1
+    line_end = text.find("\n", end)
+    return line_start, len(text) if line_end == -1 else line_end + 1
+
+
+def _react_import(tokens) -> tuple[int, int, str] | None:
+    """Edit adding lazy and Suspense to the `from 'react'` import (None if present)."""
+    for i, tok in enumerate(tokens):
+        if tok.value != "import":
+            continue
+        j = i + 1
+        while j < len(tokens) and tokens[j].value != "from" and tokens[j].value != ";":
+            j += 1
+        if j + 1 >= len(tokens) or tokens[j].value != "from" or tokens[j + 1].kind != STRING \
+                or string_value(tokens[j + 1]) != "react":
+            continue
+        names = {t.value for t in tokens[i + 1:j] if t.kind == IDENT}
+        missing = [n for n in ("lazy", "Suspense") if n not in names]
+        if not missing:
+            return None
+        brace = next((k for k in range(i + 1, j) if tokens[k].value == "}"), None)
+        if brace is not None:
+            before = tokens[brace - 1]
+            sep = " " if before.value == "," else ", "
+            return tokens[brace - 1].end, tokens[brace].start, f"{sep}{', '.join(missing)} "
+        return tokens[j - 1].end, tokens[j - 1].end, f", {{ {', '.join(missing)} }}"
+    raise CodemodError("no `import ... from 'react'` to add lazy and Suspense to")
+
+
+def _helpers(split: dict[str, str], prefetch: dict[str, list[str]]) -> str:
+    lines = [
+        "// Sections load on demand (added by patchkit lazy-sections)",
+        "const sectionLoaders = {",
+    ]
+    lines += [f"  {name}: () => import('{module}')," for name, module in split.items()]
+    lines.append("};")
+    lines += [f"const {name} = lazy(sectionLoaders.{name});" for name in split]
+    if prefetch:
+        lines.append("const sectionChunks = {")
+        for section, names in prefetch.items():
+            key = section if _IDENT_RE.match(section) else repr(section)
+            lines.append(f"  {key}: [{', '.join(repr(n) for n in names)}],")
+        lines += [
+            "};",
+            "// Start loading a section's chunks before it is clicked (e.g. on hover)",
+            "const prefetchSection = (section) => {",
+            "  (sectionChunks[section] || []).forEach((name) => sectionLoaders[name]().catch(() => {}));",
+            "};",
+        ]
+    lines += [
+        "const SectionFallback = () => (",
+        '  <div className="flex justify-center py-12 text-gray-500">Loading...</div>',
+        ");",
+    ]
+    return "\n".join(lines)
+
+
+def _render_function(tokens, spans, body: tuple[int, int]) -> str:
+    enclosing = [(name, span) for name, span in spans.items() if span[0] < body[0] and body[1] <= span[1]]
+    if not enclosing:
+        raise CodemodError("the section switch is not inside a named function")
+    return max(enclosing, key=lambda item: item[1][0])[0]
+
+
+def _wrap_render_calls(tokens, pairs, name: str, span: tuple[int, int], state: str, edits) -> int:
+    count = 0
+    for i, tok in enumerate(tokens[:-2]):
+        if tok.value != name or span[0] <= i <= span[1]:
+            continue
+        if tokens[i + 1].value != "(" or tokens[i + 2].value != ")":
+            continue
+        if i and tokens[i - 1].value in (".", "const", "let", "function"):
+            continue
+        # Already inside <Suspense ...>{name()}</Suspense>
+        if i >= 2 and tokens[i - 1].value == "{" and tokens[i - 2].value == ">" and any(
+                t.value == "Suspense" for t in tokens[max(0, i - 20):i]):
+            continue
+        edits.append((tok.start, tokens[i + 2].end,
+                      f"<Suspense key={{{state}}} fallback={{<SectionFallback />}}>{{{name}()}}</Suspense>"))
+        count += 1
+    return count
+
+
+def _add_prefetch(tokens, pairs, text: str, setter: str, edits) -> int:
+    """Add hover/focus prefetch next to every `onClick={() => setter(x)}`."""
+    count = 0
+    for i in range(len(tokens) - 8):
+        if [t.value for t in tokens[i:i + 7]] != ["onClick", "=", "{", "(", ")", "=>", setter]:
+            continue
+        call = i + 7
+        if tokens[call].value != "(" or call not in pairs or i + 2 not in pairs:
+            continue
+        close = pairs[i + 2]
+        if pairs[call] + 1 != close:
+            continue
+        after = tokens[close + 1] if close + 1 < len(tokens) else None
+        if after is not None and after.value == "onMouseEnter":
+            continue
+        arg = text[tokens[call].end:tokens[pairs[call]].start]
+        indent = line_indent(text, tokens[i].start)
+        edits.append((tokens[close].end, tokens[close].end,
+                      f"\n{indent}onMouseEnter={{() => prefetchSection({arg})}}"
+                      f"\n{indent}onFocus={{() => prefetchSection({arg})}}"))
+        count += 1
+    return count
+
+
+@codemod("lazy-sections", params=("components", "state", "prefetch"))
+def lazy_sections(text: str, params: dict) -> tuple[str, list[str]]:
+    state = params.get("state", "activeSection")
+    if not isinstance(state, str) or not _IDENT_RE.match(state):
+        raise CodemodError("'state' must be an identifier")
+    wanted = params.get("components")
+    if wanted is not None and (not isinstance(wanted, list) or not all(isinstance(n, str) for n in wanted)):
+        raise CodemodError("'components' must be a list of component names")
+    prefetch = params.get("prefetch", True)
+
+    tokens = tokenize(text)
+    pairs = match_brackets(tokens)
+    body = _find_switch(tokens, pairs, state)
+    if body is None:
+        raise CodemodError(f"no `switch ({state})` found")
+    spans = _definitions(tokens, pairs)
+    render = _render_function(tokens, spans, body)
+
+    rendered, ranges = _rendered_by(tokens, spans, *body, set())
+    imports = _default_imports(tokens)
+    messages = []
+    edits: list[tuple[int, int, str]] = []
+
+    split: dict[str, str] = {}
+    candidates = wanted if wanted is not None else sorted(n for n in imports if n in rendered)
+    for name in candidates:
+        if name not in imports:
+            messages.append(f"- {name}: no default import (already split?)")
+            continue
+        if name not in rendered:
+            messages.append(f"- {name}: not rendered by a section")
+            continue
+        outside = [
+            i for i, tok in enumerate(tokens)
+            if tok.value == name and i != imports[name][0] + 1
+            and not (i and tokens[i - 1].value in (".", "?."))
+            and not any(start <= i <= end for start, end in ranges)
+        ]
+        if outside:
+            messages.append(f"- {name}: also used outside the sections, left static")
+            continue
+        split[name] = imports[name][1]
+
+    if split and HELPER_MARKER in text:
+        raise CodemodError("already split; revert it before splitting more components")
+
+    removed = []
+    for name in split:
+        i = imports[name][0]
+        end = tokens[i + 4].end if i + 4 < len(tokens) and tokens[i + 4].value == ";" else tokens[i + 3].end
+        removed.append(_line_span(text, tokens[i].start, end))
+        edits.append((*removed[-1], ""))
+        messages.append(f"✓ {name}: lazy import('{split[name]}')")
+
+    if split:
+        react = _react_import(tokens)
+        if react is not None:
+            edits.append(react)
+        sections = {}
+        if prefetch:
+            for label, start, end in _cases(tokens, body):
+                names, _ = _rendered_by(tokens, spans, start, end, set())
+                chunks = sorted(n for n in names if n in split)
+                if chunks:
+                    sections[label] = chunks
+        offset = after_imports(tokens)
+        # The last import may be one of the removed lines
+        offset = next((start for start, end in removed if start <= offset < end), offset)
+        edits.append((offset, offset, "\n\n" + _helpers(split, sections)))
+
+    if split or HELPER_MARKER in text:
+        wrapped = _wrap_render_calls(tokens, pairs, render, spans[render], state, edits)
+        messages.append(f"{'✓' if wrapped else '-'} {render}(): {wrapped} call(s) in a Suspense boundary")
+        if prefetch:
+            setter = _state_setter(tokens, state)
+            hovered = _add_prefetch(tokens, pairs, text, setter, edits) if setter else 0
+            messages.append(f"{'✓' if hovered else '-'} {setter or state}: {hovered} nav item(s) prefetch on hover")
+
+    return splice(text, edits), messages
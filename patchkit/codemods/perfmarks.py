@@ -0,0 +1,204 @@
+"""
+perf-marks: wrap hot paths in performance.mark/measure pairs.
+
+Definitions of the names in `functions` are wrapped where they are defined:
+
+    const selectImage = (imageId) => {...};
+    const selectImage = __perfWrap('selectImage', (imageId) => {...});
+
+    function loadPosts() {...}
+    function loadPosts() {...}
+    loadPosts = __perfWrap('loadPosts', loadPosts);
+
+and every call of a name in `calls` is wrapped where it is made, which is
+what a state setter like setContent needs (the argument - usually an
+innerHTML read - is evaluated inside the measurement):
+
+    setContent(editor.innerHTML);
+    __perfCall('setContent', () => setContent(editor.innerHTML));
+
+The helpers are injected once, after the imports. They check the flag once
+at load time (localStorage[flag] === '1' or ?flag in the URL); with the flag
+off, __perfWrap returns the function itself and __perfCall only adds a
+closure call. Measures are named "perf:<name>" and async functions are
+measured until their promise settles. window.__perfMarks.export() downloads
+the session's measures as JSON for `python -m patchkit traces`.
+"""
+
+from __future__ import annotations
+
+import re
+
+from ..jstokens import IDENT, STRING, match_brackets, string_value, tokenize
+from . import CodemodError, after_imports, codemod, splice
+
+HELPER_MARKER = "const __perfWrap = "
+
+_HELPERS = """
+// Performance marks (added by patchkit perf-marks). Off unless
+// localStorage.{flag} === '1' or the URL has ?{flag}; then
+// window.__perfMarks.export() downloads this session's measures.
+const __perfOn = (() => {{
+  try {{
+    return typeof performance !== 'undefined' && typeof performance.measure === 'function' &&
+      (window.localStorage.getItem('{flag}') === '1' ||
+        new URLSearchParams(window.location.search).has('{flag}'));
+  }} catch (err) {{
+    return false;
+  }}
+}})();
+let __perfSeq = 0;
+const __perfMeasure = (name, fn, self, args) => {{
+  const mark = `perf:${{name}}:${{++__perfSeq}}`;
+  performance.mark(mark);
+  const done = () => {{
+    performance.measure(`perf:${{name}}`, mark);
+    performance.clearMarks(mark);
+  }};
+  let result;
+  try {{
+    result = fn.apply(self, args);
+  }} catch (err) {{
+    done();
+    throw err;
+  }}
+  if (result && typeof result.then === 'function') {{
+    return result.finally(done);
+  }}
+  done();
+  return result;
+}};
+const __perfWrap = (name, fn) =>
+  __perfOn ? function (...args) {{ return __perfMeasure(name, fn, this, args); }} : fn;
+const __perfCall = (name, fn) => (__perfOn ? __perfMeasure(name, fn, undefined, []) : fn());
+if (__perfOn) {{
+  const session = Date.now().toString(36) + Math.random().toString(36).slice(2, 8);
+  window.__perfMarks = {{
+    entries: () => performance.getEntriesByType('measure')
+      .filter((m) => m.name.startsWith('perf:'))
+      .map((m) => ({{ name: m.name.slice(5), start: m.startTime, duration: m.duration }})),
+    export() {{
+      const data = {{
+        session,
+        userAgent: navigator.userAgent,
+        url: window.location.href,
+        exported: new Date().toISOString(),
+        measures: this.entries(),
+      }};
+      const link = document.createElement('a');
+      link.href = URL.createObjectURL(new Blob([JSON.stringify(data)], {{ type: 'application/json' }}));
+      link.download = `perf-marks-${{session}}.json`;
+      link.click();
+      URL.revokeObjectURL(link.href);
+      return data;
+    }},
+  }};
+}}
+"""
+
+_FLAG_RE = re.compile(r"^[A-Za-z_$][\w$]*$")
+
+
+def _names(params: dict, key: str) -> list[str]:
+    names = params.get(key, [])
+    if not isinstance(names, list) or not all(isinstance(n, str) and _FLAG_RE.match(n) for n in names):
+        raise CodemodError(f"'{key}' must be a list of identifiers")
+    return names
+
+
+def _wrap_definitions(tokens, pairs, name: str, inserts: list) -> int:
+    count = 0
+    n = len(tokens)
+    for i, tok in enumerate(tokens):
+        if tok.kind != IDENT or tok.value != name or i + 2 >= n:
+            continue
+        prev = tokens[i - 1].value if i else ""
+
+        if prev == "function":
+            # function name(...) {...}  ->  append a reassignment
+            j = i + 1
+            if tokens[j].value != "(" or j not in pairs:
+                continue
+            body = pairs[j] + 1
+            if body >= n or tokens[body].value != "{" or body not in pairs:
+                continue
+            close = pairs[body]
+            after = tokens[close + 1:close + 4]
+            if [t.value for t in after[:3]] == [name, "=", "__perfWrap"]:
+                continue
+            inserts.append((tokens[close].end, f"\n{name} = __perfWrap('{name}', {name});"))
+            count += 1
+            continue
+
+        if prev not in ("const", "let", "var") or tokens[i + 1].value != "=":
+            continue
+        start = i + 2
+        if tokens[start].value == "__perfWrap":
+            continue
+        j = start + 1 if tokens[start].value == "async" else start
+        if j >= n:
+            continue
+        if tokens[j].value == "(" and j in pairs:
+            j = pairs[j] + 1
+        elif tokens[j].kind == IDENT:
+            j += 1
+        else:
+            continue
+        if j + 1 >= n or tokens[j].value != "=>" or tokens[j + 1].value != "{" or j + 1 not in pairs:
+            continue
+        close = pairs[j + 1]
+        inserts.append((tokens[start].start, f"__perfWrap('{name}', "))
+        inserts.append((tokens[close].end, ")"))
+        count += 1
+    return count
+
+
+def _wrap_calls(tokens, pairs, name: str, inserts: list) -> int:
+    count = 0
+    for i, tok in enumerate(tokens):
+        if tok.kind != IDENT or tok.value != name or i + 1 >= len(tokens):
+            continue
+        if tokens[i + 1].value != "(" or i + 1 not in pairs:
+            continue
+        prev = tokens[i - 1] if i else None
+        if prev is not None and prev.value in (".", "?.", "function"):
+            continue
+        # Already inside __perfCall('name', () => name(...))
+        if i >= 7 and tokens[i - 7].value == "__perfCall" and tokens[i - 5].kind == STRING \
+                and string_value(tokens[i - 5]) == name:
+            continue
+        inserts.append((tok.start, f"__perfCall('{name}', () => "))
+        inserts.append((tokens[pairs[i + 1]].end, ")"))
+        count += 1
+    return count
+
+
+@codemod("perf-marks", params=("functions", "calls", "flag"))
+def perf_marks(text: str, params: dict) -> tuple[str, list[str]]:
+    functions = _names(params, "functions")
+    calls = _names(params, "calls")
+    flag = params.get("flag", "perfMarks")
+    if not isinstance(flag, str) or not _FLAG_RE.match(flag):
+        raise CodemodError("'flag' must be an identifier")
+    if not functions and not calls:
+        raise CodemodError("nothing to instrument: set 'functions' and/or 'calls'")
+
+    tokens = tokenize(text)
+    pairs = match_brackets(tokens)
+    inserts: list[tuple[int, str]] = []
+    messages = []
+    found = 0
+
+    for name in functions:
+        count = _wrap_definitions(tokens, pairs, name, inserts)
+        found += count
+        messages.append(f"{'✓' if count else '-'} {name}: {count} definition(s) wrapped")
+    for name in calls:
+        count = _wrap_calls(tokens, pairs, name, inserts)
+        found += count
+        messages.append(f"{'✓' if count else '-'} {name}(): {count} call(s) wrapped")
+
+    if found and HELPER_MARKER not in text:
+        inserts.append((after_imports(tokens), "\n\n" + _HELPERS.format(flag=flag).strip("\n")))
+
+    return splice(text, [(offset, offset, snippet) for offset, snippet in inserts]), messages
@@ -0,0 +1,113 @@
+"""
+responsive-images: make images created by the editor lazy and responsive.
+
+In each function named in `functions`, every image element the function
+creates gets a makeImageResponsive() call right after its src is set:
+
+    const img = document.createElement('img');
+    img.src = image.src;
+    makeImageResponsive(img, image);
+
+makeImageResponsive (src/utils/responsiveImages.js) adds loading="lazy",
+decoding="async", width/height from the upload result (so the layout does
+not shift as the image arrives) and a Cloudinary srcset. When src is not set
+from `<object>.src` the object is not known and only the size-independent
+attributes are added. The helper is imported from `module` if needed.
+"""
+
+from __future__ import annotations
+
+from ..jstokens import IDENT, STRING, match_brackets, string_value, tokenize
+from . import CodemodError, after_imports, codemod, line_indent, splice
+
+HELPER = "makeImageResponsive"
+
+
+def _function_body(tokens, pairs, name: str) -> tuple[int, int] | None:
+    """Token span of the body of `const name = (...) => {...}` or `function name() {...}`."""
+    for i, tok in enumerate(tokens[:-3]):
+        if tok.kind != IDENT or tok.value != name:
+            continue
+        prev = tokens[i - 1].value if i else ""
+        if prev == "function":
+            j = i + 1
+        elif prev in ("const", "let", "var") and tokens[i + 1].value == "=":
+            j = i + 2
+            if tokens[j].value == "async":
+                j += 1
+        else:
+            continue
+        if tokens[j].value == "(" and j in pairs:
+            j = pairs[j] + 1
+        elif tokens[j].kind == IDENT:
+            j += 1
+        if j < len(tokens) and tokens[j].value == "=>":
+            j += 1
+        if j < len(tokens) and tokens[j].value == "{" and j in pairs:
+            return j, pairs[j]
+    return None
+
+
+def _created_images(tokens, start: int, end: int) -> list[str]:
+    """Variables assigned `document.createElement('img')` in a token range."""
+    names = []
+    for i in range(start, end - 6):
+        if (tokens[i].kind == IDENT and tokens[i + 1].value == "=" and tokens[i + 2].value == "document"
+                and tokens[i + 3].value == "." and tokens[i + 4].value == "createElement"
+                and tokens[i + 5].value == "(" and tokens[i + 6].kind == STRING
+                and string_value(tokens[i + 6]).lower() == "img"):
+            names.append(tokens[i].value)
+    return names
+
+
+def _instrument(tokens, text: str, start: int, end: int, var: str, inserts: list) -> int:
+    count = 0
+    for i in range(start, end - 5):
+        if not (tokens[i].value == var and tokens[i + 1].value == "." and tokens[i + 2].value == "src"
+                and tokens[i + 3].value == "=") or (i and tokens[i - 1].value == "."):
+            continue
+        j = i + 4
+        while j < end and tokens[j].value != ";":
+            j += 1
+        if j >= end:
+            continue
+        if [t.value for t in tokens[j + 1:j + 4]] == [HELPER, "(", var]:
+            continue
+        rhs = tokens[i + 4:j]
+        dims = ""
+        if len(rhs) == 3 and rhs[0].kind == IDENT and rhs[1].value == "." and rhs[2].value == "src":
+            dims = f", {rhs[0].value}"
+        indent = line_indent(text, tokens[i].start)
+        inserts.append((tokens[j].end, f"\n{indent}{HELPER}({var}{dims});"))
+        count += 1
+    return count
+
+
+@codemod("responsive-images", params=("functions", "module"))
+def responsive_images(text: str, params: dict) -> tuple[str, list[str]]:
+    functions = params.get("functions", ["insertImageIntoContent"])
+    if not isinstance(functions, list) or not all(isinstance(n, str) for n in functions):
+        raise CodemodError("'functions' must be a list of function names")
+    module = params.get("module", "./utils/responsiveImages")
+    if not isinstance(module, str):
+        raise CodemodError("'module' must be a module path")
+
+    tokens = tokenize(text)
+    pairs = match_brackets(tokens)
+    inserts: list[tuple[int, str]] = []
+    messages = []
+    for name in functions:
+        body = _function_body(tokens, pairs, name)
+        if body is None:
+            messages.append(f"- {name}: not defined")
+            continue
+        count = sum(_instrument(tokens, text, *body, var, inserts)
+                    for var in _created_images(tokens, *body))
+        messages.append(f"{'✓' if count else '-'} {name}: {count} image(s) made responsive")
+
+    imported = any(t.value == HELPER for t in tokens) and f"from '{module}'" in text
+    if inserts and not imported:
+        offset = after_imports(tokens)
+        inserts.append((offset, f"\nimport {{ {HELPER} }} from '{module}';"))
+
+    return splice(text, [(offset, offset, snippet) for offset, snippet in inserts]), messages
@@ -0,0 +1,254 @@
+"""
+Differential runs of competing patch variants.
+
+Several fixes exist twice (fix_image_click_handler.py / fix_image_click_v2.py,
+add_drag_resize.py / add_drag_resize_v2.py). This runs every variant of a group
+over a corpus of saved App.js revisions and compares what each one produces.
+
+A variant is a repo script (run as-is, in a scratch directory holding only
+src/App.js) or a spec file (applied by the engine). Each (variant, revision)
+pair runs in its own worker process; the time reported is the median of
+`repeat` runs of the script body alone, without interpreter start-up.
+
+Outputs are compared as normalized token streams (see jstokens.py), so
+variants that differ only in whitespace, comments or quote style count as
+equivalent. For real differences the first differing region is reported with
+its line range in each output. A revision every variant fails on (an
+exception or a non-zero exit) is reported as failed, not as agreement: the
+outputs are then all the unchanged input. One that only some variants fail on
+is a difference even when the outputs match.
+"""
+
+from __future__ import annotations
+
+import io
+import os
+import runpy
+import statistics
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from .engine import FAILED, apply_patch
+from .jstokens import LineIndex, normalized, tokenize
+from .spec import parse_spec_file
+
+TARGET = "src/App.js"
+
+DEFAULT_GROUPS = {
+    "image-click": ["fix_image_click_handler.py", "fix_image_click_v2.py"],
+    "drag-resize": ["add_drag_resize.py", "add_drag_resize_v2.py"],
+}
+
+# Saved copies of App.js that are in the tree
+DEFAULT_CORPUS = [
+    "src/App.js",
+    "src/App.js.backup",
+    "src/App_backup_pre_visitor.js",
+    "src/App_BROKEN.js",
+    "src/App_INTEGRATION.js",
+]
+
+OK = "ok"
+ERROR = "error"
+
+
+@dataclass
+class VariantRun:
+    variant: str
+    revision: str
+    status: str
+    output: str
+    seconds: float
+    changed: bool = False
+    exit_code: int = 0
+    stdout: str = ""
+
+    @property
+    def failed(self) -> bool:
+        return self.status == ERROR or self.exit_code != 0
+
+
+@dataclass
+class Difference:
+    reference: str
+    variant: str
+    # Line ranges (1-based, inclusive) of the first differing region
+    reference_lines: tuple[int, int]
+    variant_lines: tuple[int, int]
+    reference_snippet: str
+    variant_snippet: str
+
+
+@dataclass
+class RevisionReport:
+    revision: str
+    runs: list[VariantRun] = field(default_factory=list)
+    differences: list[Difference] = field(default_factory=list)
+
+    @property
+    def failed(self) -> bool:
+        """Every variant failed: identical outputs say nothing."""
+        return all(run.failed for run in self.runs)
+
+    @property
+    def failing(self) -> list[str]:
+        """Variants that failed where another did not."""
+        return [] if self.failed else [run.variant for run in self.runs if run.failed]
+
+    @property
+    def agree(self) -> bool:
+        return not self.failed and not self.failing and not self.differences
+
+
+def load_revision(root: str | Path, item: str) -> str:
+    """Text of a corpus item: a file path, or REV:PATH for a git revision."""
+    path = Path(root) / item
+    if path.is_file():
+        return path.read_text(encoding="utf-8")
+    if ":" in item:
+        return subprocess.run(
+            ["git", "show", item], cwd=root, check=True, capture_output=True, text=True
+        ).stdout
+    raise FileNotFoundError(f"corpus item not found: {item}")
+
+
+def _run_script(script: Path, text: str) -> tuple[str, int, str, float]:
+    with tempfile.TemporaryDirectory(prefix="patchkit-diff-") as tmp:
+        target = Path(tmp) / TARGET
+        target.parent.mkdir(parents=True)
+        target.write_text(text, encoding="utf-8")
+        out = io.StringIO()
+        cwd = os.getcwd()
+        os.chdir(tmp)
+        code = 0
+        start = time.perf_counter()
+        try:
+            with redirect_stdout(out):
+                runpy.run_path(str(script), run_name="__main__")
+        except SystemExit as exc:
+            code = exc.code if isinstance(exc.code, int) else 1
+        finally:
+            elapsed = time.perf_counter() - start
+            os.chdir(cwd)
+        return target.read_text(encoding="utf-8"), code, out.getvalue(), elapsed
+
+
+def run_variant(root: str, variant: str, revision: str, text: str, repeat: int) -> VariantRun:
+    """Run one variant on one revision `repeat` times (in this process)."""
+    path = Path(root) / variant
+    times = []
+    try:
+        if path.suffix == ".toml":
+            spec = parse_spec_file(path)
+            for _ in range(repeat):
+                start = time.perf_counter()
+                output, result = apply_patch(spec, text)
+                times.append(time.perf_counter() - start)
+            code = 1 if result.status == FAILED else 0
+            stdout = "\n".join(result.messages)
+        else:
+            for _ in range(repeat):
+                output, code, stdout, elapsed = _run_script(path.resolve(), text)
+                times.append(elapsed)
+    except Exception as exc:
+        return VariantRun(variant, revision, ERROR, text, 0.0, False, 1, f"{type(exc).__name__}: {exc}")
+    return VariantRun(variant, revision, OK, output, statistics.median(times), output != text, code, stdout)
+
+
+def first_difference(reference: VariantRun, other: VariantRun) -> Difference | None:
+    """None when both outputs are the same token stream."""
+    a_tokens, b_tokens = tokenize(reference.output), tokenize(other.output)
+    a, b = normalized(a_tokens), normalized(b_tokens)
+    if a == b:
+        return None
+    limit = min(len(a), len(b))
+    pre = 0
+    while pre < limit and a[pre] == b[pre]:
+        pre += 1
+    suf = 0
+    while suf < limit - pre and a[-1 - suf] == b[-1 - suf]:
+        suf += 1
+
+    def region(text, tokens, end_index):
+        index = LineIndex(text)
+        if not tokens:
+            return (1, 1), ""
+        first = tokens[min(pre, len(tokens) - 1)]
+        last = tokens[max(min(end_index, len(tokens) - 1), min(pre, len(tokens) - 1))]
+        lines = (index.line(first.start), index.line(last.end - 1))
+        snippet = text[first.start:last.end]
+        if len(snippet) > 200:
+            snippet = snippet[:200] + "..."
+        return lines, snippet
+
+    a_lines, a_snip = region(reference.output, a_tokens, len(a) - suf - 1)
+    b_lines, b_snip = region(other.output, b_tokens, len(b) - suf - 1)
+    return Difference(reference.variant, other.variant, a_lines, b_lines, a_snip, b_snip)
+
+
+def _pool_task(args):
+    return run_variant(*args)
+
+
+def compare(variants: list[str], corpus: list[str], root: str | Path = ".",
+            repeat: int = 3, jobs: int | None = None) -> list[RevisionReport]:
+    """Run every variant on every corpus revision and diff them against the first."""
+    root = str(root)
+    texts = {item: load_revision(root, item) for item in corpus}
+    tasks = [(root, variant, item, texts[item], repeat) for item in corpus for variant in variants]
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        runs = list(pool.map(_pool_task, tasks))
+
+    reports = []
+    for i, item in enumerate(corpus):
+        report = RevisionReport(item, runs[i * len(variants):(i + 1) * len(variants)])
+        reference = report.runs[0]
+        for other in report.runs[1:]:
+            diff = first_difference(reference, other)
+            if diff is not None:
+                report.differences.append(diff)
+        reports.append(report)
+    return reports
+
+
+def format_comparison(name: str, variants: list[str], reports: list[RevisionReport]) -> str:
+    out = [f"{name}: {' vs '.join(variants)}"]
+    for report in reports:
+        if report.failed:
+            verdict = "BOTH FAILED" if len(report.runs) == 2 else "ALL FAILED"
+        elif report.failing:
+            verdict = f"DIFFERENT (variant {', '.join(report.failing)} failed)"
+        else:
+            verdict = "equivalent" if report.agree else "DIFFERENT"
+        out.append(f"  {report.revision}: {verdict}")
+        for run in report.runs:
+            if run.status == ERROR:
+                state = f"✗ {run.stdout}"
+            else:
+                state = f"exit {run.exit_code}, " + ("changed" if run.changed else "unchanged")
+            out.append(f"    {run.seconds * 1000:8.2f} ms  {run.variant} ({state})")
+        for diff in report.differences:
+            out.append(f"    first difference: {diff.reference} lines {diff.reference_lines[0]}-{diff.reference_lines[1]}"
+                       f" vs {diff.variant} lines {diff.variant_lines[0]}-{diff.variant_lines[1]}")
+            out.append(f"      {diff.reference}: {diff.reference_snippet!r}")
+            out.append(f"      {diff.variant}: {diff.variant_snippet!r}")
+
+    # Revisions every variant failed on count neither way
+    compared = [r for r in reports if not r.failed]
+    out.append("  totals:" + (f" ({len(reports) - len(compared)} revision(s) failed by every variant)"
+                              if len(compared) < len(reports) else ""))
+    for index, variant in enumerate(variants):
+        total = sum(r.runs[index].seconds for r in reports)
+        if index == 0:
+            note = "reference"
+        else:
+            same = sum(1 for r in compared
+                       if r.runs[index].failed == r.runs[0].failed and all(d.variant != variant for d in r.differences))
+            note = f"matches on {same}/{len(compared)}"
+        out.append(f"    {total * 1000:8.2f} ms  {variant} ({note})")
+    return "\n".join(out)
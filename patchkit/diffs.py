@@ -0,0 +1,449 @@
+"""
+Unified diffs as patch specs.
+
+Two formats are read:
+
+* classic unified diffs (`--- a/x` / `+++ b/x` / `@@ -l,n +l,n @@ heading`),
+  as written by `diff -u`, `git diff` and the .rej files `patch` leaves;
+* the envelope format of the hand-written .diff files at the repo root
+  (`*** Begin Patch` / `*** Update File: x` / `@@ scope`), whose hunks carry
+  no line numbers and are located in order, each after the previous one.
+
+Each file a diff updates becomes one PatchSpec with a list of Hunks, applied
+by the engine like any other spec (see apply_hunks). Every hunk is located
+in the input first - near its line number, or after the previous hunk -
+inside the {...} block of its scope line or heading when it has one (see
+search.block_spans). When the exact lines are not found the match is
+loosened step by step, up to FUZZ: trailing whitespace, then all
+surrounding whitespace, then one, then two context lines dropped from each
+end. A hunk whose old lines are not found (even with whitespace loosened)
+but whose new lines are is already in the file and skipped, so re-running a
+diff is a no-op - unless its new lines are also part of its old lines, where
+finding them proves nothing. The located hunks are spliced in one pass; if
+any hunk cannot be placed, nothing is changed and the hunk is reported in
+the result, where `patch` would have written a .rej file.
+"""
+
+from __future__ import annotations
+
+import re
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass, field
+from itertools import accumulate
+from pathlib import Path
+
+# Most context lines dropped from each end of a hunk before it is rejected
+FUZZ = 2
+
+# .rej files left by `patch` are unified diffs of the hunks it could not apply
+DIFF_SUFFIXES = (".diff", ".patch", ".rej")
+
+_HUNK_RE = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@ ?(.*)$")
+_NORMALIZE = (lambda s: s, str.rstrip, str.strip)
+_NORMALIZE_NAMES = ("", "whitespace", "indentation")
+
+
+class DiffError(ValueError):
+    """Raised when a diff cannot be read."""
+
+
+@dataclass
+class Hunk:
+    # (" " | "-" | "+", line) pairs; lines keep their "\n"
+    lines: list[tuple[str, str]] = field(default_factory=list)
+    # 1-based old line number from a unified header; None in envelope diffs
+    old_start: int | None = None
+    # Envelope `@@ scope` line, or the heading after a unified `@@ ... @@`
+    scope: str = ""
+    # Envelope `*** End of File`: the hunk must end at the end of the file
+    at_eof: bool = False
+
+    @property
+    def old(self) -> list[str]:
+        return [text for op, text in self.lines if op != "+"]
+
+    @property
+    def new(self) -> list[str]:
+        return [text for op, text in self.lines if op != "-"]
+
+    @property
+    def expected(self) -> int | None:
+        """0-based line the hunk should start at; one with no old lines goes after old_start."""
+        if self.old_start is None:
+            return None
+        return self.old_start - 1 if self.old else self.old_start
+
+    @property
+    def changes(self) -> bool:
+        return any(op != " " for op, _ in self.lines)
+
+    def label(self) -> str:
+        where = f"@@ -{self.old_start} @@" if self.old_start is not None else "@@"
+        if self.scope:
+            where += f" {self.scope.strip()[:40]}"
+        first = next((t for op, t in self.lines if op != " " and t.strip()), "") or \
+            next((t for _, t in self.lines if t.strip()), "")
+        first = first.strip()
+        if len(first) > 50:
+            first = first[:47] + "..."
+        return f"{where}: {first!r}" if first else where
+
+
+@dataclass
+class FileDiff:
+    target: str
+    hunks: list[Hunk] = field(default_factory=list)
+
+
+def _strip_path(old: str, new: str) -> str:
+    """Target path of a ---/+++ pair, without git's a/ b/ prefixes or timestamps."""
+    old, new = old.split("\t")[0].strip(), new.split("\t")[0].strip()
+    if new == "/dev/null":
+        raise DiffError(f"deleting {old} is not supported")
+    if old == "/dev/null":
+        raise DiffError(f"creating {new} is not supported")
+    if old.startswith("a/") and new.startswith("b/"):
+        new = new[2:]
+    return new
+
+
+def _no_newline(hunk: Hunk) -> None:
+    """"\\ No newline at end of file" applies to the line before it."""
+    if hunk.lines:
+        op, text = hunk.lines[-1]
+        hunk.lines[-1] = (op, text.rstrip("\n"))
+
+
+def _unified(lines: list[str], where: str) -> list[FileDiff]:
+    files: list[FileDiff] = []
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        if line.startswith("--- ") and i + 1 < len(lines) and lines[i + 1].startswith("+++ "):
+            try:
+                target = _strip_path(line[4:], lines[i + 1][4:])
+            except DiffError as exc:
+                raise DiffError(f"{where}:{i + 1}: {exc}") from None
+            files.append(FileDiff(target))
+            i += 2
+            continue
+        match = _HUNK_RE.match(line.rstrip("\r\n"))
+        if not match:
+            # diff --git, index, mode lines and free text between files
+            i += 1
+            continue
+        if not files:
+            raise DiffError(f"{where}:{i + 1}: hunk before any ---/+++ header")
+        old_count = int(match.group(2) or 1)
+        new_count = int(match.group(4) or 1)
+        hunk = Hunk(old_start=int(match.group(1)), scope=match.group(5))
+        i += 1
+        while i < len(lines) and (old_count > 0 or new_count > 0):
+            line = lines[i]
+            if line.startswith("\\"):
+                _no_newline(hunk)
+                i += 1
+                continue
+            op, text = (line[0], line[1:]) if line[:1] in (" ", "-", "+") else (" ", line)
+            if line.startswith(("@@ ", "--- ", "diff ")) or (op == " " and line[:1] not in (" ", "\n", "\r")):
+                break
+            hunk.lines.append((op, text))
+            old_count -= op != "+"
+            new_count -= op != "-"
+            i += 1
+        if i < len(lines) and lines[i].startswith("\\"):
+            _no_newline(hunk)
+            i += 1
+        files[-1].hunks.append(hunk)
+    return files
+
+
+def _envelope(lines: list[str], where: str) -> list[FileDiff]:
+    files: list[FileDiff] = []
+    hunk: Hunk | None = None
+    for number, line in enumerate(lines, 1):
+        bare = line.rstrip("\r\n")
+        if bare in ("*** Begin Patch", "*** End Patch"):
+            hunk = None
+            continue
+        if bare.startswith("*** Update File:"):
+            files.append(FileDiff(bare.split(":", 1)[1].strip()))
+            hunk = None
+            continue
+        if bare.startswith(("*** Add File:", "*** Delete File:", "*** Move to:")):
+            raise DiffError(f"{where}:{number}: {bare.split(':')[0][4:].lower()} is not supported")
+        if bare == "*** End of File":
+            if hunk is not None:
+                hunk.at_eof = True
+            continue
+        if not files:
+            continue
+        if bare.startswith("@@"):
+            hunk = Hunk(scope=bare[2:].strip())
+            files[-1].hunks.append(hunk)
+            continue
+        if hunk is None:
+            hunk = Hunk()
+            files[-1].hunks.append(hunk)
+        if line[:1] in ("-", "+"):
+            hunk.lines.append((line[0], line[1:]))
+        elif line[:1] == " ":
+            hunk.lines.append((" ", line[1:]))
+        elif not bare:
+            hunk.lines.append((" ", line))
+        else:
+            raise DiffError(f"{where}:{number}: expected ' ', '-' or '+' at the start of the line")
+    for diff in files:
+        # A scope line followed straight by another @@ only moves the cursor
+        diff.hunks = [h for h in diff.hunks if h.lines or h.scope]
+    return files
+
+
+def parse_diff(text: str, where: str = "<diff>") -> list[FileDiff]:
+    """The files a diff updates, each with its hunks in order."""
+    lines = text.splitlines(keepends=True)
+    if lines and lines[-1] and not lines[-1].endswith("\n"):
+        lines[-1] += "\n"
+    envelope = any(line.startswith("*** Begin Patch") for line in lines[:5])
+    files = _envelope(lines, where) if envelope else _unified(lines, where)
+    if not files:
+        raise DiffError(f"{where}: no file headers found")
+    return files
+
+
+def parse_diff_file(path: str | Path) -> list[FileDiff]:
+    return parse_diff(Path(path).read_text(encoding="utf-8"), str(path))
+
+
+# --- locating and applying --------------------------------------------------
+
+@dataclass
+class Placement:
+    hunk: int
+    start: int
+    end: int
+    new: list[str]
+    fuzz: int = 0
+    normalize: int = 0
+    already: bool = False
+
+
+def _trimmed(hunk: Hunk, fuzz: int) -> tuple[int, int]:
+    """Context lines dropped from the start and end of the hunk at this fuzz."""
+    lead = 0
+    while lead < len(hunk.lines) and hunk.lines[lead][0] == " ":
+        lead += 1
+    trail = 0
+    while trail < len(hunk.lines) - lead and hunk.lines[-1 - trail][0] == " ":
+        trail += 1
+    if lead == len(hunk.lines):
+        # Context only: keep at least one line to find
+        return min(fuzz, max(0, lead - 1)), 0
+    return min(fuzz, lead), min(fuzz, trail)
+
+
+class _Lines:
+    """The input's lines with lazily built first-line lookups per normalization."""
+
+    def __init__(self, lines: list[str]):
+        self.lines = lines
+        self._tables: dict[int, list[str]] = {}
+        self._where: dict[int, dict[str, list[int]]] = {}
+
+    def normalized(self, level: int) -> list[str]:
+        table = self._tables.get(level)
+        if table is None:
+            table = self._tables[level] = [_NORMALIZE[level](line) for line in self.lines]
+        return table
+
+    def positions(self, level: int, line: str) -> list[int]:
+        where = self._where.get(level)
+        if where is None:
+            where = self._where[level] = {}
+            for i, text in enumerate(self.normalized(level)):
+                where.setdefault(text, []).append(i)
+        return where.get(_NORMALIZE[level](line), [])
+
+    def find(self, needle: list[str], level: int, lo: int, hi: int, near: int) -> int | None:
+        """Start of the occurrence of needle within [lo, hi) closest to `near`."""
+        table = self.normalized(level)
+        want = [_NORMALIZE[level](line) for line in needle]
+        best = None
+        for start in self.positions(level, needle[0]):
+            if start < lo or start + len(want) > hi:
+                continue
+            if table[start:start + len(want)] == want:
+                if best is None or abs(start - near) < abs(best - near):
+                    best = start
+        return best
+
+
+def _scope_line(index: _Lines, scope: str, lo: int, hi: int, backwards: bool = False) -> int | None:
+    needle = scope.strip()
+    order = range(hi - 1, lo - 1, -1) if backwards else range(lo, hi)
+    for i in order:
+        if needle in index.lines[i]:
+            return i
+    return None
+
+
+def _block_end(spans: list[int], starts: list[int], line: int) -> int | None:
+    """Exclusive end line of the first {...} block that opens on `line`."""
+    lo = starts[line]
+    hi = starts[line + 1] if line + 1 < len(starts) else None
+    opens = spans[0::2]
+    k = bisect_left(opens, lo)
+    if k < len(opens) and (hi is None or opens[k] < hi):
+        return bisect_right(starts, spans[2 * k + 1] - 1)
+    return None
+
+
+def _place(index: _Lines, hunk: Hunk, number: int, lo: int, hi: int, near: int,
+           fuzzes=range(FUZZ + 1), levels=range(len(_NORMALIZE))) -> Placement | None:
+    lines = index.lines
+    for fuzz in fuzzes:
+        lead, trail = _trimmed(hunk, fuzz)
+        ops = hunk.lines[lead:len(hunk.lines) - trail]
+        old = [text for op, text in ops if op != "+"]
+        if hunk.old and not old:
+            # Nothing left to find it by
+            continue
+        for level in levels:
+            if old:
+                start = index.find(old, level, lo, hi, near)
+                if start is None:
+                    continue
+            else:
+                start = min(max(near, lo), hi)
+            if hunk.at_eof and start + len(old) != len(lines):
+                continue
+            # Context comes from the file, so whitespace it differs in is kept
+            new, pos = [], start
+            for op, text in ops:
+                if op == " ":
+                    new.append(lines[pos])
+                    pos += 1
+                elif op == "-":
+                    pos += 1
+                else:
+                    new.append(text)
+            return Placement(number, start, start + len(old), new, fuzz, level)
+    return None
+
+
+def _contains(lines: list[str], part: list[str]) -> bool:
+    return any(lines[i:i + len(part)] == part for i in range(len(lines) - len(part) + 1))
+
+
+def _already_applied(index: _Lines, hunk: Hunk, number: int, lo: int, hi: int, near: int) -> Placement | None:
+    if not hunk.changes or hunk.new == hunk.old:
+        return None
+    for fuzz in range(FUZZ + 1):
+        lead, trail = _trimmed(hunk, fuzz)
+        ops = hunk.lines[lead:len(hunk.lines) - trail]
+        new = [text for op, text in ops if op != "-"]
+        # Without an added line left, the context alone proves nothing
+        if not new or (fuzz and not any(op == "+" for op, _ in ops)):
+            continue
+        old = [text for op, text in ops if op != "+"]
+        for level, normalize in enumerate(_NORMALIZE):
+            want, have = list(map(normalize, new)), list(map(normalize, old))
+            # A whitespace-only change cannot be told apart at this level, and
+            # new lines that are part of the old ones are there either way
+            if want == have or _contains(have, want):
+                continue
+            start = index.find(new, level, lo, hi, near)
+            if start is not None:
+                end = start + len(new)
+                return Placement(number, start, end, index.lines[start:end], fuzz, level, already=True)
+    return None
+
+
+def _place_hunk(index: _Lines, hunk: Hunk, number: int, lo: int, hi: int, near: int) -> Placement | None:
+    # All of the old lines first, whitespace loosened; then "is it in
+    # already?" before any fuzz, since the context of a pure addition still
+    # matches after the addition went in
+    return (_place(index, hunk, number, lo, hi, near, fuzzes=(0,))
+            or _already_applied(index, hunk, number, lo, hi, near)
+            or _place(index, hunk, number, lo, hi, near, fuzzes=range(1, FUZZ + 1)))
+
+
+def locate(hunks: list[Hunk], lines: list[str], blocks=None) -> tuple[list[Placement], list[tuple[int, str]]]:
+    """Place every hunk in `lines`; returns placements (in order) and (hunk, message) failures.
+
+    `blocks` is a callable returning the text's flattened {...} spans (see
+    search.block_spans); a hunk with a scope is kept inside its scope's block.
+    """
+    index = _Lines(lines)
+    starts = list(accumulate(map(len, lines), initial=0))[:-1]
+
+    def scope_block(line: int) -> int:
+        end = _block_end(blocks(), starts, line) if blocks is not None else None
+        return end or len(lines)
+
+    placements: list[Placement] = []
+    failures: list[tuple[int, str]] = []
+    cursor = 0
+    # Unified hunks are looked for around their line number, shifted by how
+    # far the previous hunk was from its own
+    offset = 0
+    for number, hunk in enumerate(hunks):
+        placed = None
+        if hunk.old_start is None:
+            lo, hi, near = cursor, len(lines), cursor
+            if hunk.scope:
+                line = _scope_line(index, hunk.scope, cursor, len(lines))
+                if line is None:
+                    failures.append((number, f"✗ hunk {number + 1}: scope line not found: "
+                                             f"{hunk.scope.strip()!r}"))
+                    continue
+                lo, hi, near = line, scope_block(line), line
+                if not hunk.lines:
+                    # A bare scope line only moves the search into its block
+                    cursor = line + 1
+                    continue
+            placed = _place_hunk(index, hunk, number, lo, hi, near)
+        else:
+            near = hunk.expected + offset
+            if hunk.scope and hunk.old:
+                # The heading names the enclosing function: try its block first
+                line = _scope_line(index, hunk.scope, cursor, min(max(near, cursor) + 1, len(lines)),
+                                   backwards=True)
+                if line is not None:
+                    placed = _place_hunk(index, hunk, number, line, scope_block(line), near)
+            if placed is None:
+                placed = _place_hunk(index, hunk, number, cursor, len(lines), near)
+            if placed is not None:
+                offset = placed.start - hunk.expected
+        if placed is None:
+            failures.append((number, f"✗ hunk {number + 1}: context not found: {hunk.label()}"))
+            continue
+        placements.append(placed)
+        cursor = placed.end
+    return placements, failures
+
+
+def describe(placement: Placement, hunk: Hunk) -> str:
+    notes = []
+    if hunk.expected is not None and placement.start != hunk.expected:
+        notes.append(f"offset {placement.start - hunk.expected:+d}")
+    if placement.fuzz:
+        notes.append(f"fuzz {placement.fuzz}")
+    if placement.normalize:
+        notes.append(f"ignoring {_NORMALIZE_NAMES[placement.normalize]}")
+    where = f"line {placement.start + 1}" + (f" ({', '.join(notes)})" if notes else "")
+    if placement.already:
+        return f"- hunk {placement.hunk + 1}: already applied at {where}"
+    return f"✓ hunk {placement.hunk + 1}: {where}"
+
+
+def splice_lines(lines: list[str], placements: list[Placement]) -> list[str]:
+    """Replace every placed span in one pass (placements sorted, non-overlapping)."""
+    out: list[str] = []
+    pos = 0
+    for placement in placements:
+        out.extend(lines[pos:placement.start])
+        out.extend(placement.new)
+        pos = placement.end
+    out.extend(lines[pos:])
+    return out
@@ -0,0 +1,329 @@
+"""
+In-memory patch engine.
+
+Every edit resolves to a span of whole lines in its input plus the lines that
+replace it, so all block kinds (including substring `anchor` edits) report the
+same EditRecord. A patch is applied all-or-nothing: if a required anchor is
+missing or a post-condition fails, the text is returned unchanged. Codemod
+and diff specs are recorded as edit 0 with one record per changed hunk (the
+line runs a codemod inserted or replaced, or each diff hunk), in the input's
+coordinates.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import textwrap
+from bisect import bisect_right
+from dataclasses import dataclass, field
+from difflib import SequenceMatcher
+from itertools import accumulate
+
+from .codemods import CODEMODS, CodemodError
+from .diffs import describe, locate, splice_lines
+from .search import block_spans
+from .spec import Edit, PatchSpec
+
+APPLIED = "applied"
+SKIPPED = "skipped"
+FAILED = "failed"
+
+
+@dataclass
+class EditRecord:
+    edit: int
+    start: int
+    end: int
+    new_lines: int
+    region_hash: str
+    lines: list[str] | None = None
+
+
+@dataclass
+class PatchResult:
+    id: str
+    status: str
+    messages: list[str] = field(default_factory=list)
+    records: list[EditRecord] = field(default_factory=list)
+    # Index of the required edit whose anchor was missing, if that is why it failed
+    missing_edit: int | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.status != FAILED
+
+    def to_dict(self, lines: bool = True) -> dict:
+        return {
+            "id": self.id,
+            "status": self.status,
+            "messages": list(self.messages),
+            "records": [
+                {**vars(r), "lines": r.lines if lines else None}
+                for r in self.records
+            ],
+            "missing_edit": self.missing_edit,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> PatchResult:
+        records = [EditRecord(**r) for r in data.get("records", [])]
+        return cls(data["id"], data["status"], list(data.get("messages", [])), records,
+                   data.get("missing_edit"))
+
+
+def split_lines(text: str) -> list[str]:
+    """Split on '\\n' only, keeping line endings (unlike str.splitlines)."""
+    parts = text.split("\n")
+    last = parts.pop()
+    lines = [part + "\n" for part in parts]
+    if last:
+        lines.append(last)
+    return lines
+
+
+def region_hash(lines: list[str]) -> str:
+    return hashlib.sha1("".join(lines).encode()).hexdigest()[:16]
+
+
+def _line_offsets(lines: list[str]) -> list[int]:
+    return list(accumulate(map(len, lines), initial=0))[:-1]
+
+
+def _matches(edit: Edit, text: str):
+    if edit.pattern is not None:
+        for m in edit.pattern.finditer(text):
+            if m.end() > m.start():
+                yield m.start(), m.end()
+        return
+    pos = text.find(edit.anchor)
+    while pos != -1:
+        yield pos, pos + len(edit.anchor)
+        pos = text.find(edit.anchor, pos + len(edit.anchor))
+
+
+def _block_end(edit: Edit, lines: list[str], first: int, last: int) -> int | None:
+    """Exclusive end line of the block starting at the anchor line."""
+    if edit.block in ("anchor", "line"):
+        return last + 1
+    if edit.block == "lines":
+        end = first + edit.count
+        return end if end <= len(lines) else None
+    if edit.block == "until":
+        for i in range(first, len(lines)):
+            if edit.until in lines[i]:
+                return i + 1
+        return None
+    # braces: same counting the scripts used, from the anchor line on
+    depth, opened = 0, False
+    for i in range(first, len(lines)):
+        depth += lines[i].count("{") - lines[i].count("}")
+        opened = opened or "{" in lines[i]
+        if opened and depth <= 0:
+            return i + 1
+    return None
+
+
+def _reindent(snippet: str, like: str) -> str:
+    indent = like[: len(like) - len(like.lstrip())]
+    body = textwrap.dedent(snippet)
+    return "".join(
+        indent + line if line.strip() else line
+        for line in body.splitlines(keepends=True)
+    )
+
+
+def _as_lines(snippet: str) -> list[str]:
+    if snippet and not snippet.endswith("\n"):
+        snippet += "\n"
+    return split_lines(snippet)
+
+
+def find_spans(edit: Edit, lines: list[str]) -> list[tuple[int, int, list[str]]]:
+    """Resolve an edit to (start, end, replacement lines) spans, in order."""
+    text = "".join(lines)
+    offsets: list[int] = []
+    spans: list[tuple[int, int, list[str]]] = []
+
+    for start_off, end_off in _matches(edit, text):
+        if not offsets:
+            offsets = _line_offsets(lines)
+        first = bisect_right(offsets, start_off) - 1
+        last = bisect_right(offsets, end_off - 1) - 1
+        if edit.min_line is not None and first + 1 < edit.min_line:
+            continue
+        if edit.max_line is not None and first + 1 > edit.max_line:
+            continue
+        if edit.next_line is not None and (
+            last + 1 >= len(lines) or edit.next_line not in lines[last + 1]
+        ):
+            continue
+        if spans and first < spans[-1][1]:
+            continue
+
+        end = _block_end(edit, lines, first, last)
+        if end is None:
+            continue
+
+        replace = _reindent(edit.replace, lines[first]) if edit.reindent else edit.replace
+        if edit.block == "anchor":
+            line_end = offsets[end - 1] + len(lines[end - 1])
+            new = split_lines(text[offsets[first]:start_off] + replace + text[end_off:line_end])
+        elif edit.mode == "replace":
+            new = _as_lines(replace)
+        elif edit.mode == "insert_before":
+            new = _as_lines(replace) + lines[first:end]
+        elif edit.mode == "insert_after":
+            new = lines[first:end] + _as_lines(replace)
+        else:
+            new = []
+
+        spans.append((first, end, new))
+        if edit.occurrence == "first":
+            break
+    return spans
+
+
+def check_post(spec: PatchSpec, output: str) -> list[str]:
+    """Messages for every post-condition the output violates."""
+    failures = []
+    for cond in spec.post:
+        if cond.contains is not None and cond.contains not in output:
+            failures.append(f"✗ post-condition: missing {cond.contains!r}")
+        if cond.absent is not None and cond.absent in output:
+            failures.append(f"✗ post-condition: still contains {cond.absent!r}")
+    return failures
+
+
+def _apply_codemod(spec: PatchSpec, text: str, keep_lines: bool) -> tuple[str, PatchResult]:
+    result = PatchResult(spec.id, APPLIED)
+    try:
+        output, result.messages = CODEMODS[spec.codemod].func(text, spec.params)
+    except CodemodError as exc:
+        result.status = FAILED
+        result.messages.append(f"✗ {spec.codemod}: {exc}")
+        return text, result
+
+    if output == text:
+        result.status = SKIPPED
+        return text, result
+    failures = check_post(spec, output)
+    if failures:
+        result.status = FAILED
+        result.messages.extend(failures)
+        return text, result
+
+    old, new = split_lines(text), split_lines(output)
+    for start, end, lines in changed_hunks(old, new):
+        result.records.append(EditRecord(
+            0, start, end, len(lines), region_hash(old[start:end]), lines if keep_lines else None,
+        ))
+    return output, result
+
+
+def changed_hunks(old: list[str], new: list[str]) -> list[tuple[int, int, list[str]]]:
+    """(start, end, replacement lines) for each run of old lines that new changes."""
+    limit = min(len(old), len(new))
+    pre = 0
+    while pre < limit and old[pre] == new[pre]:
+        pre += 1
+    suf = 0
+    while suf < limit - pre and old[-1 - suf] == new[-1 - suf]:
+        suf += 1
+    # Only the middle goes through SequenceMatcher
+    matcher = SequenceMatcher(None, old[pre:len(old) - suf], new[pre:len(new) - suf], autojunk=False)
+    return [(pre + i1, pre + i2, new[pre + j1:pre + j2])
+            for op, i1, i2, j1, j2 in matcher.get_opcodes() if op != "equal"]
+
+
+def _apply_hunks(spec: PatchSpec, text: str, keep_lines: bool) -> tuple[str, PatchResult]:
+    result = PatchResult(spec.id, APPLIED)
+    lines = split_lines(text)
+    spans = None
+
+    def blocks():
+        nonlocal spans
+        if spans is None:
+            spans = block_spans(spec.target, text)
+        return spans
+
+    placements, failures = locate(spec.hunks, lines, blocks)
+    outcomes = [(p.hunk, describe(p, spec.hunks[p.hunk])) for p in placements] + failures
+    result.messages = [message for _, message in sorted(outcomes)]
+    if failures:
+        result.status = FAILED
+        return text, result
+
+    changed = [p for p in placements if not p.already]
+    if not changed:
+        result.status = SKIPPED
+        return text, result
+    output = "".join(splice_lines(lines, changed))
+    failures = check_post(spec, output)
+    if failures:
+        result.status = FAILED
+        result.messages.extend(failures)
+        return text, result
+    for p in changed:
+        result.records.append(EditRecord(
+            0, p.start, p.end, len(p.new), region_hash(lines[p.start:p.end]),
+            list(p.new) if keep_lines else None,
+        ))
+    return output, result
+
+
+def apply_patch(spec: PatchSpec, text: str, keep_lines: bool = False) -> tuple[str, PatchResult]:
+    """Apply one spec to text. Returns the new text and what happened.
+
+    With keep_lines, each EditRecord also carries its replacement lines so
+    the edit can be replayed without matching (see incremental.py).
+    """
+    if spec.codemod is not None:
+        return _apply_codemod(spec, text, keep_lines)
+    if spec.hunks:
+        return _apply_hunks(spec, text, keep_lines)
+
+    result = PatchResult(spec.id, APPLIED)
+    lines = split_lines(text)
+    touched = False
+
+    for index, edit in enumerate(spec.edits):
+        spans = find_spans(edit, lines)
+        if not spans:
+            if edit.optional:
+                result.messages.append(f"✗ edit {index + 1}: anchor not found: {edit.label()}")
+                continue
+            result.status = FAILED
+            result.messages.append(f"✗ edit {index + 1}: anchor not found: {edit.label()}")
+            result.records.clear()
+            result.missing_edit = index
+            return text, result
+
+        for start, end, new in reversed(spans):
+            result.records.append(EditRecord(
+                index, start, end, len(new), region_hash(lines[start:end]),
+                list(new) if keep_lines else None,
+            ))
+            lines[start:end] = new
+        touched = True
+        result.messages.append(f"✓ edit {index + 1}: {len(spans)} region(s): {edit.label()}")
+
+    output = "".join(lines)
+    failures = check_post(spec, output)
+    if failures:
+        result.status = FAILED
+        result.messages.extend(failures)
+        result.records.clear()
+        return text, result
+
+    if not touched:
+        result.status = SKIPPED
+    return output, result
+
+
+def apply_patches(specs: list[PatchSpec], text: str) -> tuple[str, list[PatchResult]]:
+    """Apply specs in order; each sees the previous one's output."""
+    results = []
+    for spec in specs:
+        text, result = apply_patch(spec, text)
+        results.append(result)
+    return text, results
@@ -0,0 +1,519 @@
+"""
+Run only the tests a change can affect.
+
+After a patch run the whole test_sections.sh / test_all_sections.js sweep
+used to be re-run, even when only the image toolbar changed. This maps each
+changed span to the app sections it can reach and runs just their tests:
+
+* the section switch (`switch (activeSection)` in App.js) names the
+  component each section renders; a section reaches that component, the
+  local components it renders in turn (JSX tags in its body) and every module
+  they import, transitively (the import graph, imports.py);
+* a span in the section switch's file belongs to the outermost function
+  around it (jsscopes.py): a change inside a section's local component
+  affects that section, a change to import statements affects whatever uses
+  the names they bind, anything else there (the App shell: navigation,
+  routing, state) affects every section;
+* a change in another module the shell reaches (the rest of the switch's
+  file, the entry point) affects every section; a change in any other
+  module affects the sections that reach it;
+* deleting a module affects whatever imported it.
+
+Tests:
+
+    test_all_sections.js <section>  one per section the script has a block for
+    test_sections.sh                the shell (navigation labels)
+    test-*.js at the repo root      the modules they require, transitively
+
+A test "fails" if it exits non-zero or prints a ❌ line - the sweep scripts
+report failures that way and always exit 0. Selected tests run in parallel.
+
+Changes come from `git diff` against a revision (default HEAD: what the last
+patch run wrote), or, with pending=True, from the specs applied in memory;
+the sections are then mapped on those in-memory outputs, whose coordinates
+the changes are in.
+"""
+
+from __future__ import annotations
+
+import difflib
+import re
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from .engine import apply_patches, split_lines
+from .imports import MODULE_EXTENSIONS, ImportGraph, build_graph, candidates, find_specifiers, resolve
+from .jsscopes import Scopes
+from .jstokens import IDENT, STRING, match_brackets, string_value, tokenize
+from .runner import expand_targets, group_by_target
+from .spec import PatchSpec
+
+SECTION_SCRIPT = "test_all_sections.js"
+SHELL_SCRIPT = "test_sections.sh"
+ROOT_TEST_GLOB = "test-*.js"
+SHELL = "shell"
+DEFAULT_TIMEOUT = 300
+
+PASSED = "passed"
+FAILED = "failed"
+ERROR = "error"
+
+_SWITCH_RE = re.compile(r"switch\s*\(\s*activeSection\s*\)")
+_WANTED_RE = re.compile(r"wanted\('([\w-]+)'\)")
+_HUNK_RE = re.compile(r"^@@ -\d+(?:,\d+)? \+(\d+)(?:,(\d+))? @@", re.MULTILINE)
+_FAILURE_MARK = "❌"
+
+
+@dataclass
+class Change:
+    path: str
+    # 1-based, inclusive, in the changed file
+    start: int
+    end: int
+    # The file is gone; path is where it was
+    deleted: bool = False
+    # Lines the span replaced and the lines that replaced them, when known
+    old: list[str] | None = None
+    new: list[str] | None = None
+
+
+@dataclass
+class SectionMap:
+    """Sections of the app and what each one reaches."""
+    path: str | None = None
+    # section id -> components it renders
+    sections: dict[str, list[str]] = field(default_factory=dict)
+    # section id -> local components (in `path`) it reaches
+    local: dict[str, set[str]] = field(default_factory=dict)
+    # section id -> modules it reaches
+    modules: dict[str, set[str]] = field(default_factory=dict)
+    # Outermost local component functions of `path`: name -> (first, last line)
+    components: dict[str, tuple[int, int]] = field(default_factory=dict)
+    # Modules the app shell reaches: the entry point and everything in `path`
+    # outside the sections' components and the switch body
+    shell: set[str] = field(default_factory=set)
+    # Import statements of `path`: (first line, last line, names they bind)
+    imports: list[tuple[int, int, set[str]]] = field(default_factory=list)
+    # Section id (or SHELL) -> imported names it uses
+    names: dict[str, set[str]] = field(default_factory=dict)
+
+
+@dataclass
+class TestCase:
+    name: str
+    command: list[str]
+    # Sections it exercises; SHELL for the app shell
+    sections: set[str] = field(default_factory=set)
+    # Its own script and the modules it loads, transitively
+    modules: set[str] = field(default_factory=set)
+
+
+@dataclass
+class Impact:
+    sections: set[str] = field(default_factory=set)
+    modules: set[str] = field(default_factory=set)
+    # Why each section is affected: section -> first change that reached it
+    reasons: dict[str, str] = field(default_factory=dict)
+
+
+@dataclass
+class TestRun:
+    name: str
+    command: list[str]
+    status: str
+    seconds: float
+    output: str = ""
+
+
+# -- changes --------------------------------------------------------------
+
+def git_changes(root: str | Path = ".", rev: str = "HEAD") -> list[Change]:
+    """Changed line ranges of the working tree against rev."""
+    proc = subprocess.run(["git", "diff", "-U0", "--no-color", "--no-ext-diff", rev, "--"],
+                          cwd=root, capture_output=True, text=True, check=True)
+    changes = []
+    old = path = None
+    deleted = False
+    for line in proc.stdout.splitlines():
+        if line.startswith("--- "):
+            old = _diff_path(line[4:], "a/")
+        elif line.startswith("+++ "):
+            path = _diff_path(line[4:], "b/")
+            # A deleted file has no new side: report it where it was
+            deleted = path is None
+            if deleted:
+                path = old
+                if path is not None:
+                    changes.append(Change(path, 1, 1, deleted=True))
+        elif line.startswith("@@") and path is not None and not deleted:
+            match = _HUNK_RE.match(line)
+            if match:
+                start, count = int(match.group(1)), int(match.group(2) or 1)
+                # A pure deletion is reported at the line it followed
+                changes.append(Change(path, max(start, 1), max(start + count - 1, start, 1), old=[], new=[]))
+        elif line[:1] in ("-", "+") and changes and not deleted:
+            (changes[-1].old if line[0] == "-" else changes[-1].new).append(line[1:] + "\n")
+    return changes
+
+
+def _diff_path(name: str, prefix: str) -> str | None:
+    if name == "/dev/null":
+        return None
+    return name[len(prefix):] if name.startswith(prefix) else name
+
+
+def pending_changes(specs: list[PatchSpec], root: str | Path = ".",
+                    outputs: dict[str, str] | None = None) -> list[Change]:
+    """Changed line ranges the specs would make, in their outputs' coordinates.
+
+    Each changed target's output is stored in outputs, if given.
+    """
+    root = Path(root)
+    changes = []
+    for target, group in group_by_target(expand_targets(specs, root)).items():
+        try:
+            text = (root / target).read_text(encoding="utf-8")
+        except OSError:
+            continue
+        output, _ = apply_patches(group, text)
+        if output == text:
+            continue
+        if outputs is not None:
+            outputs[target] = output
+        before, after = split_lines(text), split_lines(output)
+        matcher = difflib.SequenceMatcher(None, before, after, autojunk=False)
+        for op, i1, i2, j1, j2 in matcher.get_opcodes():
+            if op != "equal":
+                changes.append(Change(target, j1 + 1, max(j2, j1 + 1), old=before[i1:i2], new=after[j1:j2]))
+    return changes
+
+
+# -- sections -------------------------------------------------------------
+
+def import_bindings(text: str) -> dict[str, str]:
+    """Local name -> specifier for every `import ... from 'x'` in a module."""
+    tokens = tokenize(text)
+    bindings = {}
+    i = 0
+    while i < len(tokens):
+        if tokens[i].value != "import" or tokens[i].kind != IDENT or i and tokens[i - 1].value == ".":
+            i += 1
+            continue
+        # import A, { b as B, c } from './x'  binds A, B and c
+        names, j = [], i + 1
+        while j < len(tokens) and tokens[j].value not in ("from", ";") and tokens[j].kind != STRING:
+            tok = tokens[j]
+            if tok.kind == IDENT and tok.value not in ("as", "type") \
+                    and not (j + 1 < len(tokens) and tokens[j + 1].value == "as"):
+                names.append(tok.value)
+            j += 1
+        if j + 1 < len(tokens) and tokens[j].value == "from" and tokens[j + 1].kind == STRING:
+            for name in names:
+                bindings[name] = string_value(tokens[j + 1])
+        i = j + 1
+    return bindings
+
+
+def _import_statements(tokens) -> list[tuple[int, int]]:
+    """Token ranges (first, last) of the import statements, up to their 'x'."""
+    spans = []
+    i = 0
+    while i < len(tokens):
+        if tokens[i].value == "import" and tokens[i].kind == IDENT and not (i and tokens[i - 1].value == ".") \
+                and not (i + 1 < len(tokens) and tokens[i + 1].value == "("):
+            j = i + 1
+            while j < len(tokens) and tokens[j].kind != STRING:
+                j += 1
+            if j < len(tokens) and j + 1 < len(tokens) and tokens[j + 1].value == ";":
+                j += 1
+            spans.append((i, min(j, len(tokens) - 1)))
+            i = j
+        i += 1
+    return spans
+
+
+def _jsx_tags(tokens, first: int, last: int) -> list[str]:
+    """Capitalized JSX element names used in tokens[first:last + 1]."""
+    tags = []
+    for i in range(first, min(last, len(tokens) - 1) + 1):
+        if tokens[i].value == "<" and i + 1 < len(tokens) and tokens[i + 1].kind == IDENT \
+                and tokens[i + 1].value[:1].isupper() and tokens[i + 1].value not in tags:
+            tags.append(tokens[i + 1].value)
+    return tags
+
+
+def find_sections(root: str | Path, graph: ImportGraph, texts: dict[str, str] | None = None) -> SectionMap:
+    """Locate the section switch among the reachable modules and map it out.
+
+    texts overrides what is on disk (pending outputs).
+    """
+    root = Path(root)
+    for module in sorted(graph.reachable()):
+        if not module.endswith(MODULE_EXTENSIONS):
+            continue
+        if texts and module in texts:
+            text = texts[module]
+        else:
+            text = (root / module).read_text(encoding="utf-8", errors="replace")
+        match = _SWITCH_RE.search(text)
+        if match:
+            return _map_sections(root, graph, module, text, match.end())
+    return SectionMap()
+
+
+def _map_sections(root: Path, graph: ImportGraph, path: str, text: str, switch_end: int) -> SectionMap:
+    tokens = tokenize(text)
+    pairs = match_brackets(tokens)
+    scopes = Scopes(tokens, pairs)
+    result = SectionMap(path)
+
+    # Local components: outermost functions with a capitalized name
+    local = {}
+    for function in scopes.functions:
+        if function.parent is None and function.name and function.name[:1].isupper():
+            local[function.name] = function
+            result.components[function.name] = (
+                text.count("\n", 0, tokens[function.start].start) + 1,
+                text.count("\n", 0, tokens[function.end].start) + 1,
+            )
+
+    # case 'blog': return <BlogSection />;
+    brace = next(i for i, t in enumerate(tokens) if t.start >= switch_end and t.value == "{")
+    labels: list[str] = []
+    i, close = brace + 1, pairs.get(brace, len(tokens) - 1)
+    while i < close:
+        tok = tokens[i]
+        if tok.value == "case" and i + 1 < close and tokens[i + 1].kind == STRING:
+            if labels and result.sections.get(labels[-1]):
+                labels = []
+            labels.append(string_value(tokens[i + 1]))
+            result.sections.setdefault(labels[-1], [])
+            i += 2
+            continue
+        if tok.value == "default":
+            labels = []
+        elif labels and tok.value == "<" and i + 1 < close and tokens[i + 1].kind == IDENT \
+                and tokens[i + 1].value[:1].isupper():
+            for label in labels:
+                if tokens[i + 1].value not in result.sections[label]:
+                    result.sections[label].append(tokens[i + 1].value)
+        i += 1
+
+    bindings = import_bindings(text)
+
+    def reach(names: list[str]) -> tuple[set[str], set[str], set[str]]:
+        """Local components, modules and imported names reached from names, transitively."""
+        seen_local, modules, used = set(), set(), set()
+        queue = list(names)
+        while queue:
+            name = queue.pop()
+            if name in bindings:
+                used.add(name)
+            if name in local:
+                if name in seen_local:
+                    continue
+                seen_local.add(name)
+                function = local[name]
+                queue.extend(_jsx_tags(tokens, function.body, function.end))
+                # Modules the component's body refers to by imported name
+                for tok in tokens[function.body:function.end + 1]:
+                    if tok.kind == IDENT and tok.value in bindings:
+                        queue.append(tok.value)
+            elif name in bindings:
+                target = resolve(root, path, bindings[name]) if bindings[name].startswith(".") else None
+                if target is not None:
+                    modules |= _closure(graph, target)
+        return seen_local, modules, used
+
+    for section, components in result.sections.items():
+        result.local[section], result.modules[section], result.names[section] = reach(components)
+
+    # The shell: every token outside the sections' components, the switch
+    # body and the import statements themselves
+    skip = set(range(brace, close + 1))
+    for name in set().union(*result.local.values()):
+        skip.update(range(local[name].start, local[name].end + 1))
+    for first, last in _import_statements(tokens):
+        skip.update(range(first, last + 1))
+        result.imports.append((
+            text.count("\n", 0, tokens[first].start) + 1, text.count("\n", 0, tokens[last].start) + 1,
+            {t.value for t in tokens[first + 1:last] if t.kind == IDENT and t.value in bindings},
+        ))
+    names = []
+    for i, tok in enumerate(tokens):
+        if i in skip:
+            continue
+        if tok.kind == IDENT and tok.value in bindings and not (i and tokens[i - 1].value == "."):
+            names.append(tok.value)
+        elif tok.value == "<" and i + 1 < len(tokens) and tokens[i + 1].value in local:
+            names.append(tokens[i + 1].value)
+    _, shell, result.names[SHELL] = reach(names)
+    result.shell = shell | _closure(graph, graph.entry, stop=path) - {path}
+    return result
+
+
+def _closure(graph: ImportGraph, module: str, stop: str | None = None) -> set[str]:
+    """module and everything it imports, transitively; stop is not expanded."""
+    seen, queue = set(), [module]
+    while queue:
+        current = queue.pop()
+        if current in seen:
+            continue
+        seen.add(current)
+        if current != stop:
+            queue.extend(graph.edges.get(current, []))
+    return seen
+
+
+def importers_of(graph: ImportGraph, module: str) -> list[str]:
+    """Modules importing module, including through specifiers that no longer resolve."""
+    found = [m for m, deps in graph.edges.items() if module in deps]
+    for importer, specifiers in graph.unresolved.items():
+        if importer not in found and any(module in candidates(importer, s) for s in specifiers):
+            found.append(importer)
+    return sorted(found)
+
+
+def impact_of(changes: list[Change], sections: SectionMap, graph: ImportGraph) -> Impact:
+    impact = Impact()
+    everything = set(sections.sections) | {SHELL}
+    reachable = graph.reachable()
+    for change in changes:
+        where = f"{change.path}:{change.start}" + (f"-{change.end}" if change.end != change.start else "")
+        impact.modules.add(change.path)
+        if change.deleted:
+            where = f"{change.path} (deleted)"
+            importers = importers_of(graph, change.path)
+            impact.modules.update(importers)
+            # The importers now fail wherever they are used
+            hit = set().union(*(_module_hit(m, sections, reachable, everything) for m in importers))
+        elif change.path == sections.path and (names := _import_names(change, sections)) is not None:
+            # Only what uses the names these imports bind
+            hit = {s for s, used in sections.names.items() if used & names}
+            if SHELL in hit:
+                hit = everything
+        elif change.path == sections.path:
+            owners = [name for name, (first, last) in sections.components.items()
+                      if first <= change.start and change.end <= last]
+            hit = {s for s, names in sections.local.items() if any(o in names for o in owners)}
+            if not hit or any(o not in set().union(*sections.local.values()) for o in owners):
+                hit = everything
+        else:
+            hit = _module_hit(change.path, sections, reachable, everything)
+        for section in hit:
+            impact.reasons.setdefault(section, where)
+        impact.sections |= hit
+    return impact
+
+
+def _import_names(change: Change, sections: SectionMap) -> set[str] | None:
+    """Names whose imports a change adds, drops or rebinds.
+
+    None if the change is not all imports, or touches one that binds nothing
+    (a side effect, like a stylesheet, could affect anything).
+    """
+    if change.old is None or change.new is None:
+        return None
+    new = set()
+    if change.new:
+        statements = [(first, last, names) for first, last, names in sections.imports
+                      if first <= change.end and change.start <= last]
+        lines = set().union(*(range(first, last + 1) for first, last, _ in statements))
+        if not statements or not lines.issuperset(range(change.start, change.end + 1)):
+            return None
+        if not all(names for _, _, names in statements):
+            return None
+        new = set().union(*(names for _, _, names in statements))
+    old = "".join(change.old)
+    tokens = tokenize(old)
+    spans = _import_statements(tokens)
+    if sum(last - first + 1 for first, last in spans) != len(tokens):
+        return None
+    if any(first < last and tokens[first + 1].kind == STRING for first, last in spans):
+        return None
+    return new ^ set(import_bindings(old))
+
+
+def _module_hit(module: str, sections: SectionMap, reachable: set[str], everything: set[str]) -> set[str]:
+    """Sections a whole module's change can affect."""
+    if module == sections.path or module in sections.shell:
+        return everything
+    if module in reachable:
+        return {s for s, modules in sections.modules.items() if module in modules} or everything
+    return set()
+
+
+# -- tests ----------------------------------------------------------------
+
+def discover_tests(root: str | Path = ".") -> list[TestCase]:
+    root = Path(root)
+    tests = []
+    script = root / SECTION_SCRIPT
+    if script.is_file():
+        for section in dict.fromkeys(_WANTED_RE.findall(script.read_text(encoding="utf-8"))):
+            tests.append(TestCase(f"{SECTION_SCRIPT} {section}", ["node", SECTION_SCRIPT, section], {section},
+                                  {SECTION_SCRIPT}))
+    if (root / SHELL_SCRIPT).is_file():
+        tests.append(TestCase(SHELL_SCRIPT, ["bash", SHELL_SCRIPT], {SHELL}, {SHELL_SCRIPT}))
+    for path in sorted(root.glob(ROOT_TEST_GLOB)):
+        text = path.read_text(encoding="utf-8", errors="replace")
+        modules = {path.name}
+        for specifier in find_specifiers(text):
+            target = resolve(root, path.name, specifier) if specifier.startswith(".") else None
+            if target is not None:
+                modules |= build_graph(root, target).reachable()
+        tests.append(TestCase(path.name, ["node", path.name], modules=modules))
+    return tests
+
+
+def select_tests(tests: list[TestCase], impact: Impact) -> list[TestCase]:
+    return [t for t in tests if t.sections & impact.sections or t.modules & impact.modules]
+
+
+def _run_one(test: TestCase, root: Path, timeout: float) -> TestRun:
+    start = time.perf_counter()
+    try:
+        proc = subprocess.run(test.command, cwd=root, capture_output=True, text=True, timeout=timeout)
+    except (OSError, subprocess.TimeoutExpired) as exc:
+        return TestRun(test.name, test.command, ERROR, time.perf_counter() - start, str(exc))
+    output = proc.stdout + proc.stderr
+    failed = proc.returncode != 0 or _FAILURE_MARK in output
+    return TestRun(test.name, test.command, FAILED if failed else PASSED, time.perf_counter() - start, output)
+
+
+def run_tests(tests: list[TestCase], root: str | Path = ".", jobs: int | None = None,
+              timeout: float = DEFAULT_TIMEOUT) -> list[TestRun]:
+    """Run tests in parallel; results in the order given."""
+    if not tests:
+        return []
+    with ThreadPoolExecutor(max_workers=jobs or len(tests)) as pool:
+        return list(pool.map(lambda t: _run_one(t, Path(root), timeout), tests))
+
+
+def format_selection(changes: list[Change], impact: Impact, tests: list[TestCase],
+                     selected: list[TestCase]) -> str:
+    files = sorted({c.path for c in changes})
+    out = [f"{len(changes)} changed span(s) in {len(files)} file(s)"]
+    for section in sorted(impact.sections):
+        out.append(f"  {section}: {impact.reasons[section]}")
+    if not impact.sections:
+        out.append("  no app section affected")
+    out.append(f"{len(selected)} of {len(tests)} test(s) selected")
+    return "\n".join(out)
+
+
+def format_runs(runs: list[TestRun], verbose: bool = False) -> str:
+    out = []
+    for run in runs:
+        mark = "✓" if run.status == PASSED else "✗"
+        out.append(f"{mark} {run.name} ({run.seconds:.1f}s)")
+        if run.status != PASSED or verbose:
+            lines = [l for l in run.output.splitlines() if l.strip()]
+            failing = [l for l in lines if _FAILURE_MARK in l] or lines[-5:]
+            out.extend(f"    {l}" for l in failing)
+    passed = sum(r.status == PASSED for r in runs)
+    out.append(f"{passed}/{len(runs)} passed")
+    return "\n".join(out)
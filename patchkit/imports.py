@@ -0,0 +1,219 @@
+"""
+ES import graph over src/, rooted at the app entry point.
+
+Every module reachable from the entry through static imports, `export ... from`,
+dynamic import(), require() or `new URL('./x', import.meta.url)` (how webpack 5
+bundles workers: `new Worker(new URL('./x.worker.js', import.meta.url))`) is
+live; any other JS module under the source tree is dead. Dead modules are
+never bundled, so there is no point in patching or scanning them, and the list
+of them is what to delete.
+
+Only relative specifiers are followed; bare ones ('react', 'lucide-react') are
+packages. Resolution follows CRA's webpack config: the exact path, then the
+extensions in RESOLVE_EXTENSIONS, then an index file in a directory.
+
+Parsed import lists are cached per file in .patchkit/imports.json and keyed by
+mtime and size, so rebuilding the graph only re-tokenizes files that changed
+(and everything, when find_specifiers learns a new form: PARSE_VERSION).
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from dataclasses import dataclass, field
+from pathlib import Path, PurePosixPath
+
+from . import ENGINE_VERSION
+from .jstokens import IDENT, PUNCT, STRING, string_value, tokenize
+
+DEFAULT_ENTRY = "src/index.js"
+DEFAULT_SOURCE_DIR = "src"
+RESOLVE_EXTENSIONS = (".mjs", ".js", ".ts", ".tsx", ".json", ".jsx")
+MODULE_EXTENSIONS = (".js", ".jsx", ".ts", ".tsx", ".mjs")
+# Bumped when find_specifiers finds more, to re-parse cached files
+PARSE_VERSION = 2
+# Leftovers of manual merges and edits that are never modules
+STRAY_SUFFIXES = (".backup", ".orig", ".rej", ".bak")
+
+
+def find_specifiers(text: str) -> list[str]:
+    """Module specifiers imported by a JS source text, in order."""
+    tokens = tokenize(text)
+    specifiers = []
+    n = len(tokens)
+
+    def value(i):
+        return tokens[i].value if i < n else None
+
+    def call_arg(i):
+        # name ( 'x' )
+        if value(i) == "(" and i + 1 < n and tokens[i + 1].kind == STRING:
+            return string_value(tokens[i + 1])
+        return None
+
+    for i, tok in enumerate(tokens):
+        if tok.kind != IDENT or (i and value(i - 1) in (".", "?.")):
+            continue
+        if tok.value == "import":
+            if value(i + 1) == "(":
+                spec = call_arg(i + 1)
+            elif i + 1 < n and tokens[i + 1].kind == STRING:
+                spec = string_value(tokens[i + 1])
+            else:
+                spec = _from_clause(tokens, i + 1)
+        elif tok.value == "export" and value(i + 1) in ("{", "*"):
+            spec = _from_clause(tokens, i + 1)
+        elif tok.value == "require":
+            spec = call_arg(i + 1)
+        elif tok.value == "URL" and value(i - 1) == "new":
+            # new URL ( 'x' , import . meta . url )
+            spec = call_arg(i + 1)
+            if [value(j) for j in range(i + 3, i + 10)] != [",", "import", ".", "meta", ".", "url", ")"]:
+                spec = None
+        else:
+            continue
+        if spec is not None:
+            specifiers.append(spec)
+    return specifiers
+
+
+def _from_clause(tokens, i: int) -> str | None:
+    """The 'x' of `... from 'x'`, if the import/export clause at i has one."""
+    depth = 0
+    for j in range(i, len(tokens)):
+        tok = tokens[j]
+        if tok.kind == PUNCT:
+            if tok.value == "{":
+                depth += 1
+            elif tok.value == "}":
+                depth -= 1
+            elif tok.value == ";" or (depth <= 0 and tok.value in ("(", "=")):
+                return None
+        elif tok.kind == IDENT and tok.value == "from" and depth <= 0:
+            nxt = tokens[j + 1] if j + 1 < len(tokens) else None
+            return string_value(nxt) if nxt is not None and nxt.kind == STRING else None
+        elif tok.kind == STRING and depth <= 0:
+            return None
+    return None
+
+
+def candidates(importer: str, specifier: str) -> list[str]:
+    """Repo-relative paths a relative specifier may resolve to, in lookup order."""
+    base = PurePosixPath(importer).parent / specifier
+    candidate = PurePosixPath(os.path.normpath(base.as_posix()))
+    options = [candidate.as_posix()]
+    options += [candidate.as_posix() + ext for ext in RESOLVE_EXTENSIONS]
+    options += [(candidate / "index").as_posix() + ext for ext in RESOLVE_EXTENSIONS]
+    return options
+
+
+def resolve(root: Path, importer: str, specifier: str) -> str | None:
+    """Repo-relative posix path of a relative specifier, or None if unresolved."""
+    for option in candidates(importer, specifier):
+        if (root / option).is_file():
+            return option
+    return None
+
+
+@dataclass
+class ImportGraph:
+    entry: str
+    # module -> resolved local dependencies
+    edges: dict[str, list[str]] = field(default_factory=dict)
+    # module -> relative specifiers that did not resolve
+    unresolved: dict[str, list[str]] = field(default_factory=dict)
+    # module -> bare package specifiers
+    packages: dict[str, list[str]] = field(default_factory=dict)
+
+    def reachable(self) -> set[str]:
+        return set(self.edges)
+
+    def dead(self, root: str | Path, source_dir: str = DEFAULT_SOURCE_DIR) -> list[str]:
+        live = self.reachable()
+        return [m for m in source_modules(root, source_dir) if m not in live]
+
+
+def source_modules(root: str | Path, source_dir: str = DEFAULT_SOURCE_DIR) -> list[str]:
+    root = Path(root)
+    return sorted(
+        p.relative_to(root).as_posix()
+        for p in (root / source_dir).rglob("*")
+        if p.is_file() and p.suffix in MODULE_EXTENSIONS
+    )
+
+
+def stray_files(root: str | Path, source_dir: str = DEFAULT_SOURCE_DIR) -> list[str]:
+    root = Path(root)
+    return sorted(
+        p.relative_to(root).as_posix()
+        for p in (root / source_dir).rglob("*")
+        if p.is_file() and p.suffix in STRAY_SUFFIXES
+    )
+
+
+class _ParseCache:
+    def __init__(self, path: Path | None):
+        self.path = path
+        self.entries: dict[str, dict] = {}
+        self.dirty = False
+        if path is None:
+            return
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("engine") == ENGINE_VERSION and data.get("parser") == PARSE_VERSION:
+                self.entries = data["files"]
+        except (OSError, ValueError, KeyError):
+            pass
+
+    def specifiers(self, root: Path, module: str) -> list[str]:
+        path = root / module
+        st = path.stat()
+        stamp = [st.st_mtime_ns, st.st_size]
+        entry = self.entries.get(module)
+        if entry is not None and entry["stamp"] == stamp:
+            return entry["specifiers"]
+        specs = find_specifiers(path.read_text(encoding="utf-8", errors="replace"))
+        self.entries[module] = {"stamp": stamp, "specifiers": specs}
+        self.dirty = True
+        return specs
+
+    def save(self) -> None:
+        if self.path is None or not self.dirty:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"engine": ENGINE_VERSION, "parser": PARSE_VERSION, "files": self.entries}, f)
+        os.replace(tmp, self.path)
+
+
+def build_graph(root: str | Path = ".", entry: str = DEFAULT_ENTRY,
+                cache_dir: str | Path | None = None) -> ImportGraph:
+    """Walk the import graph from `entry` (a repo-relative path)."""
+    root = Path(root)
+    cache = _ParseCache(Path(cache_dir) / "imports.json" if cache_dir is not None else None)
+    graph = ImportGraph(entry)
+    queue = [entry]
+    while queue:
+        module = queue.pop()
+        if module in graph.edges:
+            continue
+        deps: list[str] = []
+        graph.edges[module] = deps
+        if PurePosixPath(module).suffix not in MODULE_EXTENSIONS:
+            # Stylesheets, JSON and assets are leaves
+            continue
+        for specifier in cache.specifiers(root, module):
+            if not specifier.startswith("."):
+                graph.packages.setdefault(module, []).append(specifier)
+                continue
+            target = resolve(root, module, specifier)
+            if target is None:
+                graph.unresolved.setdefault(module, []).append(specifier)
+            elif target not in deps:
+                deps.append(target)
+                queue.append(target)
+    cache.save()
+    return graph
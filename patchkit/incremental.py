@@ -0,0 +1,296 @@
+"""
+Region-level incremental re-runs.
+
+After a run we keep, per target, the input text and every EditRecord (span,
+region hash and replacement lines) of every patch. On the next run the old and
+new inputs are line-diffed once - common prefix/suffix are trimmed first, so
+only the edited middle goes through SequenceMatcher - which gives a map of
+equal line blocks between the two.
+
+Patches are then replayed in order. A patch is clean when every region it
+matched maps entirely into an equal block (and still hashes the same) and none
+of its anchors occur in the changed lines; a clean patch is re-applied by
+splicing its recorded replacement lines at the mapped positions, without any
+anchor search or block matching. Anything else is re-evaluated normally. The
+block map is carried through each edit so later patches are mapped against the
+text they actually see.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from dataclasses import dataclass
+from difflib import SequenceMatcher
+from pathlib import Path
+
+from . import ENGINE_VERSION
+from .engine import APPLIED, FAILED, EditRecord, PatchResult, apply_patch, check_post, region_hash, split_lines
+from .spec import Edit, PatchSpec
+
+# (old line, new line, length) runs that are identical in both texts
+Block = tuple[int, int, int]
+# (start, end, replacement length) in one text's coordinates
+Span = tuple[int, int, int]
+
+# Extra lines searched around a change for anchors that may span lines
+_REGEX_CONTEXT = 20
+
+
+@dataclass
+class IncrementalStats:
+    reused: int = 0
+    evaluated: int = 0
+
+
+def equal_blocks(old: list[str], new: list[str]) -> list[Block]:
+    n_old, n_new = len(old), len(new)
+    limit = min(n_old, n_new)
+    pre = 0
+    while pre < limit and old[pre] == new[pre]:
+        pre += 1
+    suf = 0
+    while suf < limit - pre and old[n_old - 1 - suf] == new[n_new - 1 - suf]:
+        suf += 1
+
+    blocks: list[Block] = [(0, 0, pre)] if pre else []
+    mid_old, mid_new = old[pre:n_old - suf], new[pre:n_new - suf]
+    if mid_old and mid_new:
+        matcher = SequenceMatcher(None, mid_old, mid_new, autojunk=False)
+        blocks.extend(
+            (pre + a, pre + b, size)
+            for a, b, size in matcher.get_matching_blocks() if size
+        )
+    if suf:
+        blocks.append((n_old - suf, n_new - suf, suf))
+    return blocks
+
+
+def map_span(blocks: list[Block], start: int, end: int) -> int | None:
+    """New start line of old [start, end) if it lies in one equal block."""
+    for o, n, size in blocks:
+        if o <= start and end <= o + size:
+            return n + (start - o)
+    return None
+
+
+def changed_ranges(blocks: list[Block], total: int) -> list[tuple[int, int]]:
+    """Line ranges of the new text that are not covered by an equal block."""
+    ranges, pos = [], 0
+    for _, n, size in sorted(blocks, key=lambda b: b[1]):
+        if n > pos:
+            ranges.append((pos, n))
+        pos = max(pos, n + size)
+    if pos < total:
+        ranges.append((pos, total))
+    return ranges
+
+
+def _subtract(start: int, end: int, cuts: list[tuple[int, int]]) -> list[tuple[int, int]]:
+    pieces = [(start, end)]
+    for a, b in cuts:
+        if b <= a:
+            continue
+        next_pieces = []
+        for s, e in pieces:
+            if b <= s or a >= e:
+                next_pieces.append((s, e))
+                continue
+            if s < a:
+                next_pieces.append((s, a))
+            if b < e:
+                next_pieces.append((b, e))
+        pieces = next_pieces
+    return pieces
+
+
+def _shift(pos: int, spans: list[Span]) -> int:
+    return pos + sum(length - (end - start) for start, end, length in spans if end <= pos)
+
+
+def carry_blocks(blocks: list[Block], old_spans: list[Span], new_spans: list[Span], same: bool) -> list[Block]:
+    """Move the block map through one edit applied to both texts.
+
+    old_spans/new_spans are the edit's spans in old/new coordinates. Lines
+    touched by either side stop being equal; when `same` is set the two sides
+    inserted identical lines, which become a new equal block.
+    """
+    carried: list[Block] = []
+    for o, n, size in blocks:
+        delta = n - o
+        cuts = [(s, e) for s, e, _ in old_spans] + [(s - delta, e - delta) for s, e, _ in new_spans]
+        for s, e in _subtract(o, o + size, cuts):
+            carried.append((_shift(s, old_spans), _shift(s + delta, new_spans), e - s))
+    if same:
+        for (os_, _, length), (ns, _, _) in zip(old_spans, new_spans):
+            if length:
+                carried.append((_shift(os_, old_spans), _shift(ns, new_spans), length))
+    carried.sort()
+    # Merge runs that are contiguous on both sides so spans can cross them
+    merged: list[Block] = []
+    for o, n, size in carried:
+        if merged and merged[-1][0] + merged[-1][2] == o and merged[-1][1] + merged[-1][2] == n:
+            merged[-1] = (merged[-1][0], merged[-1][1], merged[-1][2] + size)
+        else:
+            merged.append((o, n, size))
+    return merged
+
+
+def _anchor_in_changes(edit: Edit, lines: list[str], changes: list[tuple[int, int]]) -> bool:
+    if edit.pattern is not None:
+        context = edit.pattern.pattern.count("\\n") + _REGEX_CONTEXT
+    else:
+        context = edit.anchor.count("\n") + 1
+    for start, end in changes:
+        chunk = "".join(lines[max(0, start - context):end + context])
+        if edit.pattern is not None:
+            if edit.pattern.search(chunk):
+                return True
+        elif edit.anchor in chunk:
+            return True
+    return False
+
+
+def _guard_stable(edit: Edit, blocks: list[Block]) -> bool:
+    """Whether min_line/max_line still select the same occurrences.
+
+    That holds when nothing moved up to the guard boundary.
+    """
+    boundary = max(edit.min_line or 0, edit.max_line or 0)
+    if not boundary:
+        return True
+    return bool(blocks) and blocks[0][0] == 0 and blocks[0][1] == 0 and blocks[0][2] > boundary
+
+
+def _edit_spans(records: list[EditRecord], index: int) -> list[EditRecord]:
+    return sorted((r for r in records if r.edit == index), key=lambda r: r.start)
+
+
+def _try_replay(spec: PatchSpec, old: dict, lines: list[str], blocks: list[Block]):
+    """Replay a clean patch. Returns (lines, blocks, records) or None if dirty."""
+    if spec.codemod is not None or spec.hunks:
+        # Codemods and diffs have no anchors to prove they would match the same places
+        return None
+    if old["status"] == FAILED:
+        # Only "first anchor missing" is known to hold without its regions
+        if old.get("missing_edit") != 0:
+            return None
+        if _anchor_in_changes(spec.edits[0], lines, changed_ranges(blocks, len(lines))):
+            return None
+        if not _guard_stable(spec.edits[0], blocks):
+            return None
+        return lines, blocks, []
+
+    old_records = [EditRecord(**r) for r in old["records"]]
+    records: list[EditRecord] = []
+
+    for index, edit in enumerate(spec.edits):
+        if _anchor_in_changes(edit, lines, changed_ranges(blocks, len(lines))):
+            return None
+        if not _guard_stable(edit, blocks):
+            return None
+        spans = _edit_spans(old_records, index)
+        mapped = []
+        for record in spans:
+            start = map_span(blocks, record.start, record.end)
+            if start is None or record.lines is None:
+                return None
+            end = start + (record.end - record.start)
+            if region_hash(lines[start:end]) != record.region_hash:
+                return None
+            mapped.append((start, end, record))
+
+        for start, end, record in reversed(mapped):
+            lines[start:end] = record.lines
+            records.append(EditRecord(index, start, end, record.new_lines, record.region_hash, record.lines))
+        blocks = carry_blocks(
+            blocks,
+            [(r.start, r.end, r.new_lines) for r in spans],
+            [(s, e, r.new_lines) for s, e, r in mapped],
+            same=True,
+        )
+    # Post-conditions look at the whole file, so they are always re-checked
+    if spec.post and check_post(spec, "".join(lines)):
+        return None
+    return lines, blocks, records
+
+
+def _pipeline_key(specs: list[PatchSpec]) -> str:
+    h = hashlib.sha256(f"engine {ENGINE_VERSION}".encode())
+    for spec in specs:
+        h.update(f"\n{spec.id}\0{spec.digest}".encode())
+    return h.hexdigest()
+
+
+def apply_incremental(specs: list[PatchSpec], text: str, state: dict | None, steps: list | None = None):
+    """Apply specs, reusing results from `state` where regions are unchanged.
+
+    Returns (output, results, new_state, stats). If given, steps gets
+    (spec id, text after it) for every spec that applied and changed the text.
+    """
+    stats = IncrementalStats()
+    lines = split_lines(text)
+    key = _pipeline_key(specs)
+    usable = state is not None and state.get("pipeline") == key
+    old_patches = state["patches"] if usable else []
+    blocks = equal_blocks(split_lines(state["input"]), lines) if usable else []
+
+    results: list[PatchResult] = []
+    for i, spec in enumerate(specs):
+        previous = lines
+        old = old_patches[i] if usable else None
+        replay = _try_replay(spec, old, list(lines), blocks) if old else None
+
+        if replay is not None:
+            lines, blocks, records = replay
+            result = PatchResult(spec.id, old["status"], list(old["messages"]), records,
+                                 old.get("missing_edit"))
+            stats.reused += 1
+        else:
+            before = "".join(lines)
+            after, result = apply_patch(spec, before, keep_lines=True)
+            new_lines = split_lines(after)
+            if old is not None:
+                old_records = [EditRecord(**r) for r in old["records"]]
+                # Codemod and diff specs record everything as edit 0
+                for index in range(len(spec.edits) or 1):
+                    blocks = carry_blocks(
+                        blocks,
+                        [(r.start, r.end, r.new_lines) for r in _edit_spans(old_records, index)],
+                        [(r.start, r.end, r.new_lines) for r in _edit_spans(result.records, index)],
+                        same=False,
+                    )
+            lines = new_lines
+            stats.evaluated += 1
+        results.append(result)
+        if steps is not None and result.status == APPLIED and lines != previous:
+            steps.append((spec.id, "".join(lines)))
+
+    new_state = {
+        "pipeline": key,
+        "input": text,
+        "patches": [r.to_dict() for r in results],
+    }
+    return "".join(lines), results, new_state, stats
+
+
+def state_path(state_dir: str | Path, target: str) -> Path:
+    name = hashlib.sha1(target.encode()).hexdigest()[:16]
+    return Path(state_dir) / "regions" / f"{name}.json"
+
+
+def load_state(path: Path) -> dict | None:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_state(path: Path, state: dict) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(f".{os.getpid()}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp, path)
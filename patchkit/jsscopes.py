@@ -0,0 +1,240 @@
+"""
+Function scopes over a token stream.
+
+Built on jstokens, so equally forgiving: it finds arrow functions, function
+declarations and expressions, tells which of them are React effect callbacks
+(useEffect/useLayoutEffect) and which are the cleanups those effects return,
+and which are event handlers (passed to addEventListener or a timer,
+assigned to an on* property, or passed as a JSX on* prop). Object and class method shorthand is not
+recognised; the code this is used on rarely has any.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+from .jstokens import IDENT, STRING, Token, match_brackets, string_value
+
+EFFECT_HOOKS = {"useEffect", "useLayoutEffect"}
+TIMERS = {"setInterval", "setTimeout", "requestAnimationFrame"}
+DECLARATORS = {"const", "let", "var"}
+_EXPRESSION_END = {",", ";", ")", "]", "}"}
+
+
+@dataclass
+class Function:
+    # Token indexes: where the function starts (params or `function`), its
+    # first body token and its last body token (inclusive)
+    start: int
+    body: int
+    end: int
+    name: str | None = None
+    effect: bool = False
+    cleanup: bool = False
+    # Events it handles (["mouseup"]), or the timer that calls it (["setInterval"])
+    handles: list[str] | None = None
+    parent: Function | None = None
+
+    def contains(self, index: int) -> bool:
+        return self.body <= index <= self.end
+
+
+def call_arguments(tokens: list[Token], pairs: dict[int, int], open_paren: int) -> list[tuple[int, int]]:
+    """Token ranges [start, end) of the top-level arguments of a call."""
+    close = pairs.get(open_paren)
+    if close is None or close == open_paren + 1:
+        return []
+    args, start, j = [], open_paren + 1, open_paren + 1
+    while j < close:
+        if tokens[j].value in "([{" and j in pairs:
+            j = pairs[j]
+        elif tokens[j].value == ",":
+            args.append((start, j))
+            start = j + 1
+        j += 1
+    if start < close:
+        args.append((start, close))
+    return args
+
+
+def receiver_start(tokens: list[Token], pairs_back: dict[int, int], dot: int) -> int:
+    """First token of the member chain before tokens[dot] (a '.' or '?.')."""
+    k = dot - 1
+    while k >= 0:
+        if tokens[k].value in (")", "]") and k in pairs_back:
+            k = pairs_back[k] - 1
+            continue
+        if tokens[k].kind != IDENT:
+            return k + 1
+        if k > 0 and tokens[k - 1].value in (".", "?."):
+            k -= 2
+            continue
+        return k
+    return 0
+
+
+def expression_end(tokens: list[Token], pairs: dict[int, int], start: int) -> int:
+    """Last token of the expression starting at `start` (up to , ; or a closer)."""
+    j = start
+    while j < len(tokens):
+        value = tokens[j].value
+        if value in "([{" and j in pairs:
+            j = pairs[j] + 1
+            continue
+        if value in _EXPRESSION_END:
+            return j - 1
+        j += 1
+    return len(tokens) - 1
+
+
+def _name_before(tokens: list[Token], start: int) -> str | None:
+    """Name a function expression is bound to: `const x =`, `a.b =`, `x:`."""
+    k = start - 1
+    if k >= 1 and tokens[k].value == "=" and tokens[k - 1].kind == IDENT:
+        name = tokens[k - 1].value
+        j = k - 1
+        while j >= 2 and tokens[j - 1].value == "." and tokens[j - 2].kind == IDENT:
+            name = f"{tokens[j - 2].value}.{name}"
+            j -= 2
+        return name
+    if k >= 1 and tokens[k].value == ":" and tokens[k - 1].kind in (IDENT, STRING):
+        prev = tokens[k - 1]
+        return string_value(prev) if prev.kind == STRING else prev.value
+    return None
+
+
+class Scopes:
+    """Every function in a token stream, with effect/cleanup/handler roles."""
+
+    def __init__(self, tokens: list[Token], pairs: dict[int, int] | None = None):
+        self.tokens = tokens
+        self.pairs = pairs if pairs is not None else match_brackets(tokens)
+        self.pairs_back = {close: open_ for open_, close in self.pairs.items()}
+        self.functions: list[Function] = []
+        self._find_functions()
+        self.functions.sort(key=lambda f: f.start)
+        self.by_start = {f.start: f for f in self.functions}
+        self._owner: list[Function | None] = [None] * len(tokens)
+        for function in self.functions:
+            function.parent = self._owner[function.start]
+            for i in range(function.body, function.end + 1):
+                self._owner[i] = function
+        self._mark_effects()
+        self._mark_handlers()
+
+    def _find_functions(self) -> None:
+        tokens, pairs = self.tokens, self.pairs
+        for i, tok in enumerate(tokens):
+            if tok.value == "=>":
+                if i == 0:
+                    continue
+                prev = tokens[i - 1]
+                if prev.value == ")" and i - 1 in self.pairs_back:
+                    start = self.pairs_back[i - 1]
+                elif prev.kind == IDENT:
+                    start = i - 1
+                else:
+                    continue
+                if start > 0 and tokens[start - 1].value == "async":
+                    start -= 1
+                body = i + 1
+                if body >= len(tokens):
+                    continue
+                end = pairs.get(body) if tokens[body].value == "{" else expression_end(tokens, pairs, body)
+                if end is None:
+                    continue
+                self.functions.append(Function(start, body, end, _name_before(tokens, start)))
+            elif tok.value == "function" and tok.kind == IDENT:
+                j = i + 1
+                name = None
+                if j < len(tokens) and tokens[j].value == "*":
+                    j += 1
+                if j < len(tokens) and tokens[j].kind == IDENT:
+                    name = tokens[j].value
+                    j += 1
+                if j >= len(tokens) or tokens[j].value != "(" or j not in pairs:
+                    continue
+                body = pairs[j] + 1
+                if body >= len(tokens) or tokens[body].value != "{" or body not in pairs:
+                    continue
+                start = i - 1 if i > 0 and tokens[i - 1].value == "async" else i
+                self.functions.append(Function(start, body, pairs[body], name or _name_before(tokens, start)))
+
+    def _mark_effects(self) -> None:
+        tokens = self.tokens
+        for function in self.functions:
+            s = function.start
+            if s >= 2 and tokens[s - 1].value == "(" and tokens[s - 2].value in EFFECT_HOOKS:
+                function.effect = True
+        for function in self.functions:
+            if not function.effect or tokens[function.body].value != "{":
+                continue
+            for i in range(function.body + 1, function.end):
+                if tokens[i].value != "return" or self._owner[i] is not function:
+                    continue
+                returned = self.by_start.get(i + 1)
+                if returned is not None:
+                    returned.cleanup = True
+                elif tokens[i + 1].kind == IDENT:
+                    name = tokens[i + 1].value
+                    for candidate in self.functions:
+                        if candidate.name == name and candidate.parent is function:
+                            candidate.cleanup = True
+
+    def _mark_handlers(self) -> None:
+        tokens, pairs = self.tokens, self.pairs
+        named: dict[str, list[Function]] = {}
+        for function in self.functions:
+            if function.name:
+                named.setdefault(function.name, []).append(function)
+
+        def mark(first: int, last: int, event: str) -> None:
+            target = self.by_start.get(first)
+            if target is not None:
+                target.handles = (target.handles or []) + [event]
+            elif last - first == 1 and tokens[first].kind == IDENT:
+                for function in named.get(tokens[first].value, []):
+                    function.handles = (function.handles or []) + [event]
+
+        for i, tok in enumerate(tokens[:-1]):
+            if tok.kind != IDENT or tokens[i + 1].value not in ("(", "="):
+                continue
+            if tok.value == "addEventListener" and tokens[i + 1].value == "(":
+                args = call_arguments(tokens, pairs, i + 1)
+                if len(args) >= 2:
+                    kind = tokens[args[0][0]]
+                    event = string_value(kind) if kind.kind == STRING else kind.value
+                    mark(*args[1], event)
+            elif tok.value in TIMERS and tokens[i + 1].value == "(":
+                args = call_arguments(tokens, pairs, i + 1)
+                if args:
+                    mark(*args[0], tok.value)
+            elif tok.value.startswith("on") and tokens[i + 1].value == "=" and i and tokens[i - 1].value == ".":
+                mark(i + 2, expression_end(tokens, pairs, i + 2) + 1, tok.value[2:])
+            elif tok.value[:2] == "on" and tok.value[2:3].isupper() and tokens[i + 1].value == "=" \
+                    and i + 2 < len(tokens) and tokens[i + 2].value == "{" and i + 2 in pairs:
+                # <div onMouseMove={handler}>
+                mark(i + 3, pairs[i + 2], tok.value[2:].lower())
+
+    def owner(self, index: int) -> Function | None:
+        """Innermost function whose body contains the token."""
+        return self._owner[index] if 0 <= index < len(self._owner) else None
+
+    def chain(self, index: int) -> list[Function]:
+        """Enclosing functions, innermost first."""
+        out = []
+        function = self.owner(index)
+        while function is not None:
+            out.append(function)
+            function = function.parent
+        return out
+
+    def effect(self, index: int) -> Function | None:
+        return next((f for f in self.chain(index) if f.effect), None)
+
+    def cleanup(self, index: int) -> Function | None:
+        return next((f for f in self.chain(index) if f.cleanup), None)
+
+    def handler(self, index: int) -> Function | None:
+        """Innermost enclosing event/timer handler, if any."""
+        return next((f for f in self.chain(index) if f.handles), None)
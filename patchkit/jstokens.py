@@ -0,0 +1,253 @@
+"""
+A small, forgiving JavaScript/JSX tokenizer.
+
+It is not a parser: it only needs to be good enough to find imports, compare
+patch outputs token by token and pair up brackets. Two simplifications keep
+it robust on this codebase:
+
+* JSX text is tokenized like code. An apostrophe in JSX text ("Don't") would
+  start a string, so strings never run past the end of their line.
+* Template literals are one token, including any ${...} parts, so braces in
+  them never take part in block matching.
+
+Regex literals are told apart from division by the previous token.
+"""
+
+from __future__ import annotations
+
+import re
+from bisect import bisect_right
+from dataclasses import dataclass
+from itertools import accumulate
+
+IDENT = "ident"
+NUMBER = "number"
+STRING = "string"
+TEMPLATE = "template"
+REGEX = "regex"
+PUNCT = "punct"
+COMMENT = "comment"
+
+# After these keywords a '/' starts a regex, not a division
+_REGEX_AFTER_KEYWORDS = {
+    "return", "typeof", "instanceof", "in", "of", "new", "delete", "void",
+    "throw", "case", "do", "else", "yield", "await",
+}
+
+_IDENT_RE = re.compile(r"[A-Za-z_$\u0080-￿][\w$\u0080-￿]*")
+_NUMBER_RE = re.compile(r"0[xXoObB][\da-fA-F_]+n?|(?:\d[\d_]*\.?[\d_]*|\.\d[\d_]*)(?:[eE][+-]?\d+)?n?")
+_PUNCT_RE = re.compile(
+    r">>>=|\.\.\.|===|!==|\*\*=|<<=|>>=|>>>|\?\?=|&&=|\|\|="
+    r"|=>|==|!=|<=|>=|&&|\|\||\?\?|\?\.|\+\+|--|\+=|-=|\*=|/=|%=|&=|\|=|\^=|\*\*|<<|>>"
+    r"|[{}()\[\];,<>+\-*/%&|^!~?:=.@#]"
+)
+_SPACE_RE = re.compile(r"\s+")
+
+OPENERS = {"{": "}", "(": ")", "[": "]"}
+CLOSERS = {v: k for k, v in OPENERS.items()}
+
+
+@dataclass(frozen=True)
+class Token:
+    kind: str
+    value: str
+    start: int
+    end: int
+
+
+def _scan_string(text: str, pos: int) -> int:
+    quote = text[pos]
+    i = pos + 1
+    n = len(text)
+    while i < n:
+        c = text[i]
+        if c == "\\":
+            i += 2
+            continue
+        if c == quote:
+            return i + 1
+        if c == "\n":
+            return i
+        i += 1
+    return n
+
+
+def _scan_template(text: str, pos: int) -> int:
+    i = pos + 1
+    n = len(text)
+    while i < n:
+        c = text[i]
+        if c == "\\":
+            i += 2
+            continue
+        if c == "`":
+            return i + 1
+        if c == "$" and text.startswith("${", i):
+            i = _scan_substitution(text, i + 2)
+            continue
+        i += 1
+    return n
+
+
+def _scan_substitution(text: str, pos: int) -> int:
+    """Skip a ${...} body; returns the index after its closing brace."""
+    depth = 1
+    i = pos
+    n = len(text)
+    while i < n:
+        c = text[i]
+        if c in "'\"":
+            i = _scan_string(text, i)
+            continue
+        if c == "`":
+            i = _scan_template(text, i)
+            continue
+        if c == "{":
+            depth += 1
+        elif c == "}":
+            depth -= 1
+            if depth == 0:
+                return i + 1
+        i += 1
+    return n
+
+
+def _scan_regex(text: str, pos: int) -> int | None:
+    i = pos + 1
+    n = len(text)
+    in_class = False
+    while i < n:
+        c = text[i]
+        if c == "\\":
+            i += 2
+            continue
+        if c == "\n":
+            return None
+        if c == "[":
+            in_class = True
+        elif c == "]":
+            in_class = False
+        elif c == "/" and not in_class:
+            i += 1
+            while i < n and (text[i].isalnum() or text[i] == "_"):
+                i += 1
+            return i
+        i += 1
+    return None
+
+
+def _regex_allowed(prev: Token | None) -> bool:
+    if prev is None:
+        return True
+    if prev.kind == IDENT:
+        return prev.value in _REGEX_AFTER_KEYWORDS
+    if prev.kind in (NUMBER, STRING, TEMPLATE, REGEX):
+        return False
+    # "</" closes a JSX tag
+    return prev.value not in (")", "]", "}", "<")
+
+
+def tokenize(text: str, comments: bool = False) -> list[Token]:
+    tokens: list[Token] = []
+    prev: Token | None = None
+    pos = 0
+    n = len(text)
+
+    while pos < n:
+        m = _SPACE_RE.match(text, pos)
+        if m:
+            pos = m.end()
+            continue
+        c = text[pos]
+
+        if text.startswith("//", pos):
+            end = text.find("\n", pos)
+            end = n if end == -1 else end
+            if comments:
+                tokens.append(Token(COMMENT, text[pos:end], pos, end))
+            pos = end
+            continue
+        if text.startswith("/*", pos):
+            end = text.find("*/", pos + 2)
+            end = n if end == -1 else end + 2
+            if comments:
+                tokens.append(Token(COMMENT, text[pos:end], pos, end))
+            pos = end
+            continue
+
+        if c in "'\"":
+            end = _scan_string(text, pos)
+            tok = Token(STRING, text[pos:end], pos, end)
+        elif c == "`":
+            end = _scan_template(text, pos)
+            tok = Token(TEMPLATE, text[pos:end], pos, end)
+        elif c == "/" and _regex_allowed(prev) and (end := _scan_regex(text, pos)) is not None:
+            tok = Token(REGEX, text[pos:end], pos, end)
+        elif (m := _IDENT_RE.match(text, pos)):
+            tok = Token(IDENT, m.group(), pos, m.end())
+        elif c.isdigit() or (c == "." and pos + 1 < n and text[pos + 1].isdigit()):
+            m = _NUMBER_RE.match(text, pos)
+            tok = Token(NUMBER, m.group(), pos, m.end())
+        elif (m := _PUNCT_RE.match(text, pos)):
+            tok = Token(PUNCT, m.group(), pos, m.end())
+        else:
+            tok = Token(PUNCT, c, pos, pos + 1)
+
+        tokens.append(tok)
+        prev = tok
+        pos = tok.end
+    return tokens
+
+
+def string_value(token: Token) -> str:
+    """Contents of a string token without quotes (escapes left as written)."""
+    body = token.value[1:]
+    if body.endswith(token.value[0]):
+        body = body[:-1]
+    return body
+
+
+def normalized(tokens: list[Token]) -> list[str]:
+    """Token values with quote style normalized, for layout-insensitive comparison."""
+    out = []
+    for tok in tokens:
+        if tok.kind == COMMENT:
+            continue
+        if tok.kind == STRING:
+            out.append('"' + string_value(tok) + '"')
+        else:
+            out.append(tok.value)
+    return out
+
+
+def match_brackets(tokens: list[Token]) -> dict[int, int]:
+    """Map the index of every opening bracket token to its closing token index.
+
+    Unbalanced closers are ignored; unclosed openers are left out.
+    """
+    pairs: dict[int, int] = {}
+    stack: list[int] = []
+    for i, tok in enumerate(tokens):
+        if tok.kind != PUNCT:
+            continue
+        if tok.value in OPENERS:
+            stack.append(i)
+        elif tok.value in CLOSERS:
+            # Pop to the nearest matching opener so one stray bracket
+            # does not throw off everything after it
+            for depth in range(len(stack) - 1, -1, -1):
+                if tokens[stack[depth]].value == CLOSERS[tok.value]:
+                    pairs[stack[depth]] = i
+                    del stack[depth:]
+                    break
+    return pairs
+
+
+class LineIndex:
+    """Offset <-> line number conversion for one text (lines are 1-based)."""
+
+    def __init__(self, text: str):
+        self.starts = [0, *accumulate(len(line) + 1 for line in text.split("\n"))][:-1]
+
+    def line(self, offset: int) -> int:
+        return bisect_right(self.starts, offset)
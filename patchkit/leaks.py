@@ -0,0 +1,266 @@
+"""
+Pair every listener, interval and window global with its removal.
+
+fix_useeffect_cleanup.py exists because the delegated click listener and the
+window.* helpers leaked across effect runs, and the drag code injected by
+add_drag_resize*.py adds window mousemove/mouseup listeners that are only
+removed when a mouseup arrives. This finds, in one token pass:
+
+* `x.addEventListener(type, handler)`, paired with
+  `x.removeEventListener(type, handler)` on the same target (after resolving
+  `const editor = editorRef.current` style aliases);
+* `setInterval(...)`, paired with `clearInterval(id)` on the variable or ref
+  the interval id was stored in;
+* `window.name = ...`, paired with `delete window.name` or
+  `window.name = null`.
+
+A registration in an effect must be undone by the cleanup the effect returns.
+Anywhere else, a removal in the same component (outermost function) pairs it.
+Listeners added with `{ once: true }` or an AbortSignal remove themselves, and
+listeners on objects the code creates (document.createElement, new
+XMLHttpRequest) go away with the object, so neither is reported. A removal in
+a timer callback counts: the timer always fires.
+
+Statuses:
+    unpaired      ✗ nothing removes it (in an effect: not its cleanup)
+    unremovable   ✗ an inline or bound handler no remove call can name
+    lost          ✗ an interval whose id is not kept
+    event-only    - only removed inside an event handler (e.g. on mouseup);
+                    it stays registered if that event never arrives
+    paired        ✓
+"""
+
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+
+from .jsscopes import DECLARATORS, TIMERS, Function, Scopes, call_arguments, expression_end, receiver_start
+from .jstokens import IDENT, STRING, LineIndex, match_brackets, string_value, tokenize
+
+UNPAIRED = "unpaired"
+UNREMOVABLE = "unremovable"
+LOST = "lost"
+EVENT_ONLY = "event-only"
+PAIRED = "paired"
+
+ERRORS = {UNPAIRED, UNREMOVABLE, LOST}
+
+SUFFIXES = (".js", ".jsx", ".mjs", ".ts", ".tsx")
+
+_GLOBALS = ("window", "globalThis")
+_CREATED_RE = re.compile(r"(?:document\.createElement(?:NS)?|new\s+[\w$.]+|[\w$.]+\.cloneNode)\b")
+_MEMBER_RE = re.compile(r"[\w$]+(?:\??\.[\w$]+)+")
+_ONCE_RE = re.compile(r"\bonce\s*:\s*true\b")
+_SIGNAL_RE = re.compile(r"\bsignal\b")
+
+
+@dataclass
+class Finding:
+    path: str
+    line: int
+    column: int
+    kind: str  # listener | interval | global
+    status: str
+    message: str
+    # Lines of the removals that pair it
+    removed_at: tuple[int, ...] = ()
+
+    @property
+    def error(self) -> bool:
+        return self.status in ERRORS
+
+    def __str__(self) -> str:
+        mark = "✗" if self.error else "-" if self.status == EVENT_ONLY else "✓"
+        return f"{mark} {self.path}:{self.line}:{self.column + 1}: {self.message}"
+
+
+@dataclass
+class _Site:
+    kind: str
+    key: tuple
+    token: int
+    label: str
+    anonymous: bool = False
+    self_removing: bool = False
+
+
+class _Analysis:
+    def __init__(self, path: str, text: str):
+        self.path = path
+        self.text = text
+        self.tokens = tokenize(text)
+        self.pairs = match_brackets(self.tokens)
+        self.scopes = Scopes(self.tokens, self.pairs)
+        self.aliases: dict[str, str] = {}
+        self.created: set[str] = set()
+        self.lines = LineIndex(text)
+        self.added: list[_Site] = []
+        self.removed: list[_Site] = []
+
+    def source(self, first: int, last: int) -> str:
+        """Source text of tokens [first, last)."""
+        return self.text[self.tokens[first].start:self.tokens[last - 1].end]
+
+    def resolve(self, target: str) -> str:
+        target = target.replace("?.", ".").strip()
+        for _ in range(5):
+            head, dot, rest = target.partition(".")
+            if head not in self.aliases:
+                break
+            target = self.aliases[head] + dot + rest
+        for prefix in _GLOBALS:
+            if target == prefix:
+                return "window"
+            if target.startswith(prefix + "."):
+                target = target[len(prefix) + 1:]
+        return target or "window"
+
+    def scan(self) -> None:
+        tokens, pairs = self.tokens, self.pairs
+        n = len(tokens)
+        for i, tok in enumerate(tokens):
+            if tok.kind != IDENT or i + 1 >= n:
+                continue
+            after = tokens[i + 1].value
+            before = tokens[i - 1].value if i else ""
+            if tok.value in DECLARATORS and tokens[i + 1].kind == IDENT and i + 3 < n and tokens[i + 2].value == "=":
+                value = self.source(i + 3, expression_end(tokens, pairs, i + 3) + 1)
+                if _CREATED_RE.match(value):
+                    self.created.add(tokens[i + 1].value)
+                elif _MEMBER_RE.fullmatch(value):
+                    self.aliases[tokens[i + 1].value] = value
+            elif tok.value in ("addEventListener", "removeEventListener") and after == "(":
+                self._listener(i, tok.value == "addEventListener")
+            elif tok.value == "setInterval" and after == "(" and before not in ("function", "const", "let", "var"):
+                self._interval(i)
+            elif tok.value == "clearInterval" and after == "(":
+                args = call_arguments(tokens, pairs, i + 1)
+                if args:
+                    self.removed.append(_Site("interval", (self.resolve(self.source(*args[0])),), i, ""))
+            elif tok.value in _GLOBALS and before not in (".", "?.") and after == "." and i + 3 < n \
+                    and tokens[i + 2].kind == IDENT and tokens[i + 3].value == "=":
+                self._global(i, tokens[i + 2].value)
+
+    def _listener(self, i: int, adding: bool) -> None:
+        tokens = self.tokens
+        if i and tokens[i - 1].value in (".", "?."):
+            target = self.source(receiver_start(tokens, self.scopes.pairs_back, i - 1), i - 1)
+        else:
+            target = "window"
+        args = call_arguments(tokens, self.pairs, i + 1)
+        if len(args) < 2:
+            return
+        first = tokens[args[0][0]]
+        event = string_value(first) if args[0][1] - args[0][0] == 1 and first.kind == STRING else self.source(*args[0])
+        handler = self.source(*args[1])
+        resolved = self.resolve(target)
+        site = _Site("listener", (resolved, event, handler), i, f"{target} '{event}' listener")
+        if not adding:
+            self.removed.append(site)
+            return
+        if resolved.split(".")[0] in self.created:
+            # Dies with the element it was added to
+            return
+        site.anonymous = args[1][0] in self.scopes.by_start or ".bind(" in handler
+        if site.anonymous:
+            site.label += " (inline handler)"
+        else:
+            site.label += f" {handler}"
+        options = self.source(*args[2]) if len(args) > 2 else ""
+        site.self_removing = bool(_ONCE_RE.search(options) or _SIGNAL_RE.search(options))
+        self.added.append(site)
+
+    def _interval(self, i: int) -> None:
+        tokens = self.tokens
+        call = i - 2 if i >= 2 and tokens[i - 1].value == "." and tokens[i - 2].value in _GLOBALS else i
+        target = None
+        if call >= 2 and tokens[call - 1].value == "=":
+            k = receiver_start(tokens, self.scopes.pairs_back, call - 1) if tokens[call - 2].kind == IDENT else call
+            if k < call - 1:
+                target = self.source(k, call - 1)
+        key = (self.resolve(target),) if target else ()
+        label = f"interval {target}" if target else "interval"
+        self.added.append(_Site("interval", key, i, label))
+
+    def _global(self, i: int, name: str) -> None:
+        tokens = self.tokens
+        value = tokens[i + 4].value if i + 4 < len(tokens) else ""
+        site = _Site("global", (name,), i, f"window.{name}")
+        if value in ("null", "undefined"):
+            self.removed.append(site)
+        else:
+            self.added.append(site)
+
+    def deletes(self) -> None:
+        tokens = self.tokens
+        for i, tok in enumerate(tokens[:-3]):
+            if tok.value == "delete" and tokens[i + 1].value in _GLOBALS and tokens[i + 2].value == "." \
+                    and tokens[i + 3].kind == IDENT:
+                self.removed.append(_Site("global", (tokens[i + 3].value,), i, ""))
+
+    def _events(self, index: int) -> list[str]:
+        """Events (not timers) whose handler the token is in."""
+        handler = self.scopes.handler(index)
+        return [h for h in handler.handles if h not in TIMERS] if handler is not None else []
+
+    def classify(self, site: _Site) -> tuple[str, str, tuple[int, ...]]:
+        scopes = self.scopes
+        if site.kind == "listener" and site.self_removing:
+            return PAIRED, f"{site.label} removes itself", ()
+        if site.kind == "interval" and not site.key:
+            return LOST, f"{site.label}: the id is not kept, so it can never be cleared", ()
+        if site.anonymous:
+            return UNREMOVABLE, f"{site.label} cannot be removed; name the handler or pass {{ once: true }}", ()
+
+        effect = scopes.effect(site.token)
+        chain = scopes.chain(site.token)
+        scope: Function | None = effect or (chain[-1] if chain else None)
+        matches = [r for r in self.removed
+                   if r.kind == site.kind and r.key == site.key and (scope is None or scope.contains(r.token))]
+        removed_at = tuple(self.lines.line(self.tokens[r.token].start) for r in matches)
+        where = "the effect's cleanup" if effect is not None else "its component"
+        if not matches:
+            return UNPAIRED, f"{site.label} is never removed in {where}", ()
+
+        if effect is not None:
+            good = [r for r in matches if scopes.cleanup(r.token) is not None]
+        else:
+            good = [r for r in matches if not self._events(r.token)]
+        if good:
+            return PAIRED, f"{site.label} is removed", removed_at
+        handlers = {h for r in matches for h in self._events(r.token)}
+        if handlers:
+            events = ", ".join(f"'{h}'" for h in sorted(handlers))
+            return EVENT_ONLY, f"{site.label} is only removed when {events} fires (line " \
+                               f"{', '.join(map(str, removed_at))}); it leaks if that never happens", removed_at
+        return UNPAIRED, f"{site.label} is removed outside {where} (line {', '.join(map(str, removed_at))})", \
+            removed_at
+
+
+def analyze(path: str, text: str) -> list[Finding]:
+    """One finding per listener, interval and window global registered in text."""
+    analysis = _Analysis(path, text)
+    analysis.scan()
+    analysis.deletes()
+    lines = analysis.lines
+    findings = []
+    for site in analysis.added:
+        status, message, removed_at = analysis.classify(site)
+        offset = analysis.tokens[site.token].start
+        line = lines.line(offset)
+        column = offset - lines.starts[line - 1]
+        findings.append(Finding(path, line, column, site.kind, status, message, removed_at))
+    return findings
+
+
+def format_findings(findings: list[Finding], verbose: bool = False) -> str:
+    shown = [f for f in findings if verbose or f.status != PAIRED]
+    out = [str(f) for f in shown]
+    counts = {}
+    for finding in findings:
+        counts[finding.status] = counts.get(finding.status, 0) + 1
+    summary = ", ".join(f"{counts[s]} {s}" for s in (UNPAIRED, UNREMOVABLE, LOST, EVENT_ONLY, PAIRED) if s in counts)
+    files = len({f.path for f in findings})
+    out.append(f"{len(findings)} registration(s) in {files} file(s)" + (f": {summary}" if summary else ""))
+    return "\n".join(out)
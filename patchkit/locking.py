@@ -0,0 +1,89 @@
+"""
+Advisory locks and atomic writes for patch targets.
+
+Locks live in separate files under .patchkit/locks/ rather than on the target
+itself, because the target is replaced by rename and a lock held on the old
+inode would no longer protect the new one. They are advisory: they serialize
+patchkit runs (a watcher, a manual run, parallel CI jobs on one checkout) but
+do not stop an editor from writing the file, which is why the runner also
+re-checks the input hash before replacing it.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX
+    fcntl = None
+
+_POLL_SECONDS = 0.05
+
+
+def lock_path(lock_dir: str | Path, target: str) -> Path:
+    name = hashlib.sha1(target.encode()).hexdigest()[:16]
+    return Path(lock_dir) / "locks" / f"{name}.lock"
+
+
+@contextmanager
+def file_lock(path: str | Path, timeout: float | None = None):
+    """Hold an exclusive advisory lock on `path` for the duration of the block."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    deadline = None if timeout is None else time.monotonic() + timeout
+
+    if fcntl is not None:
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            while True:
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    if deadline is not None and time.monotonic() > deadline:
+                        raise TimeoutError(f"timed out waiting for {path}") from None
+                    time.sleep(_POLL_SECONDS)
+            yield
+        finally:
+            os.close(fd)
+        return
+
+    # Fallback: an exclusively created marker file
+    while True:
+        try:
+            fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_EXCL, 0o644)
+            break
+        except FileExistsError:
+            if deadline is not None and time.monotonic() > deadline:
+                raise TimeoutError(f"timed out waiting for {path}") from None
+            time.sleep(_POLL_SECONDS)
+    try:
+        yield
+    finally:
+        os.close(fd)
+        os.unlink(path)
+
+
+def atomic_write(path: str | Path, data: bytes) -> None:
+    """Replace `path` with `data` via a same-directory temp file and rename."""
+    path = Path(path)
+    tmp = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+    try:
+        with open(tmp, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        try:
+            os.chmod(tmp, path.stat().st_mode & 0o7777)
+        except FileNotFoundError:
+            pass
+        os.replace(tmp, path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
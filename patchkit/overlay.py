@@ -0,0 +1,223 @@
+"""
+Copy-on-write overlays: patched output in a tree of its own.
+
+Trying another set of patches used to mean overwriting src/App.js in place
+(hence App_BROKEN.js and the .backup files) or copying the whole checkout.
+An overlay is a directory that mirrors the checkout - every file git tracks
+or would track, so uncommitted work is included - with only the patched
+targets written as new files. Every other file is placed without copying
+its data:
+
+    reflink   a copy-on-write clone (btrfs, XFS, APFS-style filesystems)
+    link      a hard link, where the filesystem cannot clone
+    copy      a plain copy, across filesystems
+
+node_modules is a symlink to the checkout's, so the overlay builds and tests
+as a complete tree (`npm run build` in it works as it does at the root).
+Several overlays of one checkout can be patched and built side by side; the
+space and time each takes is that of the files its patches change.
+
+A hard-linked file *is* the checkout's file: replace it (patchkit writes by
+rename) rather than editing it in place, or the edit shows up in both.
+
+Re-syncing an existing overlay only touches what changed: a manifest in the
+overlay's .patchkit/ records each placed file's stamp (mtime and size) in the
+checkout, files that were patched last time are put back to the checkout's
+version before this run's patches are written, and files the checkout no
+longer has are removed.
+"""
+
+from __future__ import annotations
+
+import errno
+import json
+import os
+import shutil
+import subprocess
+from dataclasses import dataclass
+from pathlib import Path
+
+from . import ENGINE_VERSION
+from .spec import DEFAULT_CACHE_DIR
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX
+    fcntl = None
+
+METHODS = ("auto", "reflink", "link", "copy")
+MANIFEST = "overlay.json"
+# Directories too large to mirror and not written by patches: symlinked whole
+SHARED_DIRS = ("node_modules",)
+# Never mirrored
+_SKIP_DIRS = {".git", DEFAULT_CACHE_DIR, "node_modules", "build"}
+
+# linux/fs.h: _IOW(0x94, 9, int)
+_FICLONE = 0x40049409
+# Errors that mean "this filesystem (pair) cannot do that", not "this file failed"
+_UNSUPPORTED = {errno.EOPNOTSUPP, errno.ENOTTY, errno.EXDEV, errno.EINVAL, errno.ENOSYS, errno.EPERM, errno.EMLINK}
+
+PATCHED = "patched"
+
+
+class OverlayError(Exception):
+    pass
+
+
+@dataclass
+class SyncStats:
+    reflink: int = 0
+    link: int = 0
+    copy: int = 0
+    kept: int = 0
+    removed: int = 0
+    # Bytes of file data written by copies
+    copied_bytes: int = 0
+
+
+def _stamp(path: Path) -> list[int]:
+    st = path.stat()
+    return [st.st_mtime_ns, st.st_size]
+
+
+def base_files(base: Path, exclude: Path | None = None) -> list[str]:
+    """Files of the checkout: what git tracks or would track, else a walk of the tree."""
+    try:
+        proc = subprocess.run(["git", "ls-files", "-z", "--cached", "--others", "--exclude-standard"],
+                              cwd=base, capture_output=True, check=True)
+        paths = sorted(set(filter(None, proc.stdout.decode("utf-8", "surrogateescape").split("\0"))))
+    except (OSError, subprocess.CalledProcessError):
+        paths = []
+        for directory, dirs, files in os.walk(base):
+            dirs[:] = [d for d in dirs if d not in _SKIP_DIRS]
+            rel = Path(directory).relative_to(base)
+            paths.extend((rel / name).as_posix() for name in files)
+        paths.sort()
+    inside = None
+    if exclude is not None:
+        try:
+            inside = exclude.resolve().relative_to(base.resolve()).as_posix() + "/"
+        except ValueError:
+            pass
+    # Deleted-but-tracked files are listed too; symlinks are left to the links below
+    return [p for p in paths if (inside is None or not p.startswith(inside))
+            and (base / p).is_file() and p.split("/", 1)[0] not in _SKIP_DIRS]
+
+
+class Overlay:
+    """A mirror of `base` at `path`, placed with `method` (see METHODS)."""
+
+    def __init__(self, base: str | Path, path: str | Path, method: str = "auto"):
+        if method not in METHODS:
+            raise OverlayError(f"unknown method {method!r} (expected {', '.join(METHODS)})")
+        self.base = Path(base)
+        self.path = Path(path)
+        self.method = method
+        # Methods still worth trying, best first
+        self._methods = ["reflink", "link", "copy"] if method == "auto" else [method]
+        self.manifest_path = self.path / DEFAULT_CACHE_DIR / MANIFEST
+        self.files: dict[str, dict] = {}
+
+        if self.path.resolve() == self.base.resolve():
+            raise OverlayError(f"{self.path} is the checkout itself")
+        try:
+            with open(self.manifest_path, encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("engine") == ENGINE_VERSION and data.get("base") == str(self.base.resolve()):
+                self.files = data["files"]
+            else:
+                raise OverlayError(f"{self.path} is an overlay of another tree ({data.get('base')})")
+        except (OSError, ValueError, KeyError):
+            if self.path.exists() and any(self.path.iterdir()):
+                raise OverlayError(f"{self.path} exists and is not an overlay; refusing to write into it") from None
+
+    def _place(self, source: Path, dest: Path, stats: SyncStats) -> str:
+        """Put source's contents at dest (replacing it atomically); returns the method used."""
+        tmp = dest.with_name(f".{dest.name}.overlay.tmp")
+        tmp.unlink(missing_ok=True)
+        while True:
+            method = self._methods[0]
+            try:
+                if method == "reflink":
+                    if fcntl is None:
+                        raise OSError(errno.EOPNOTSUPP, "no ioctl on this platform")
+                    try:
+                        with open(source, "rb") as src, open(tmp, "wb") as dst:
+                            fcntl.ioctl(dst.fileno(), _FICLONE, src.fileno())
+                        shutil.copystat(source, tmp)
+                    except OSError:
+                        tmp.unlink(missing_ok=True)
+                        raise
+                elif method == "link":
+                    os.link(source, tmp)
+                else:
+                    shutil.copy2(source, tmp)
+                    stats.copied_bytes += tmp.stat().st_size
+                break
+            except OSError as exc:
+                if exc.errno not in _UNSUPPORTED or len(self._methods) == 1:
+                    raise
+                # Not on this filesystem: fall back for the rest of the run
+                self._methods.pop(0)
+        os.replace(tmp, dest)
+        setattr(stats, method, getattr(stats, method) + 1)
+        return method
+
+    def sync(self) -> SyncStats:
+        """Bring the overlay in line with the checkout as it is now."""
+        stats = SyncStats()
+        self.path.mkdir(parents=True, exist_ok=True)
+        current = base_files(self.base, exclude=self.path)
+        wanted = set(current)
+
+        for rel in [p for p in self.files if p not in wanted]:
+            (self.path / rel).unlink(missing_ok=True)
+            del self.files[rel]
+            stats.removed += 1
+
+        for rel in current:
+            source, dest = self.base / rel, self.path / rel
+            stamp = _stamp(source)
+            entry = self.files.get(rel)
+            if entry is not None and entry["how"] != PATCHED and entry["stamp"] == stamp and dest.exists():
+                stats.kept += 1
+                continue
+            dest.parent.mkdir(parents=True, exist_ok=True)
+            self.files[rel] = {"stamp": stamp, "how": self._place(source, dest, stats)}
+
+        for name in SHARED_DIRS:
+            source, link = (self.base / name).resolve(), self.path / name
+            if source.is_dir() and not link.is_symlink() and not link.exists():
+                link.symlink_to(source, target_is_directory=True)
+        self.save()
+        return stats
+
+    def target(self, rel: str) -> Path:
+        """Where a patched version of the checkout's `rel` goes."""
+        return self.path / rel
+
+    def record(self, patched: list[str]) -> None:
+        """Note the files a run wrote, so the next sync restores them first."""
+        for rel in patched:
+            self.files[rel] = {"stamp": None, "how": PATCHED}
+        self.save()
+
+    def save(self) -> None:
+        self.manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.manifest_path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"engine": ENGINE_VERSION, "base": str(self.base.resolve()), "files": self.files}, f)
+        os.replace(tmp, self.manifest_path)
+
+
+def _size(n: int) -> str:
+    return f"{n / 1024:.1f} KB" if n >= 1024 else f"{n} bytes"
+
+
+def format_sync(overlay: Overlay, stats: SyncStats, patched: list[str]) -> str:
+    placed = [f"{count} {label}" for count, label in
+              ((stats.reflink, "reflinked"), (stats.link, "hard-linked"), (stats.copy, "copied"),
+               (stats.kept, "unchanged"), (stats.removed, "removed")) if count]
+    written = sum((overlay.path / rel).stat().st_size for rel in patched)
+    return (f"✓ overlay {overlay.path}: {len(overlay.files)} file(s) - {', '.join(placed) or 'nothing placed'}; "
+            f"{len(patched)} patched ({_size(written + stats.copied_bytes)} written)")
@@ -0,0 +1,166 @@
+// Syntax-checking worker for patchkit (see validate.py).
+//
+// Started once per run as `node parse_worker.js <repo root>`. Reads one JSON
+// request per line on stdin:
+//
+//   {"id": 1, "files": [{"path": "src/App.js", "source": "..."}]}
+//
+// and answers each with one line on stdout:
+//
+//   {"id": 1, "parser": "babel", "results": [{"path": ..., "ok": false,
+//    "message": ..., "line": 12, "column": 4}]}
+//
+// The parser is the first one found in the repo's node_modules: esbuild,
+// @babel/parser, acorn (+ acorn-jsx). Without any of them it falls back to
+// node's own parser, which cannot read JSX; files that fail there and look
+// like JSX are reported as skipped rather than broken.
+
+'use strict';
+
+const path = require('path');
+const readline = require('readline');
+const vm = require('vm');
+
+const root = process.argv[2] || process.cwd();
+
+const load = (name) => {
+  try {
+    return require(require.resolve(name, { paths: [root, __dirname] }));
+  } catch (err) {
+    return null;
+  }
+};
+
+const loaderFor = (file) => {
+  const ext = path.extname(file);
+  if (ext === '.ts') return 'ts';
+  if (ext === '.tsx') return 'tsx';
+  if (ext === '.json') return 'json';
+  return 'jsx';
+};
+
+const parsers = [
+  () => {
+    const esbuild = load('esbuild');
+    return esbuild && {
+      name: 'esbuild',
+      check(file, source) {
+        try {
+          esbuild.transformSync(source, { loader: loaderFor(file), sourcefile: file });
+          return null;
+        } catch (err) {
+          const first = (err.errors && err.errors[0]) || {};
+          const loc = first.location || {};
+          return { message: first.text || err.message, line: loc.line, column: loc.column };
+        }
+      },
+    };
+  },
+  () => {
+    const babel = load('@babel/parser');
+    return babel && {
+      name: 'babel',
+      check(file, source) {
+        const ext = path.extname(file);
+        if (ext === '.json') {
+          return checkJson(source);
+        }
+        const plugins = ext === '.ts' ? ['typescript'] : ext === '.tsx' ? ['typescript', 'jsx'] : ['jsx', 'flow'];
+        try {
+          babel.parse(source, { sourceType: 'unambiguous', plugins, errorRecovery: false });
+          return null;
+        } catch (err) {
+          const loc = err.loc || {};
+          return { message: err.message.replace(/ \(\d+:\d+\)$/, ''), line: loc.line, column: loc.column };
+        }
+      },
+    };
+  },
+  () => {
+    const acorn = load('acorn');
+    const jsx = load('acorn-jsx');
+    if (!acorn || !jsx) return null;
+    const Parser = acorn.Parser.extend(jsx());
+    return {
+      name: 'acorn',
+      check(file, source) {
+        if (path.extname(file) === '.json') return checkJson(source);
+        if (/\.tsx?$/.test(file)) return { skipped: 'acorn cannot read TypeScript' };
+        try {
+          Parser.parse(source, { ecmaVersion: 'latest', sourceType: 'module' });
+          return null;
+        } catch (err) {
+          const loc = err.loc || {};
+          return { message: err.message.replace(/ \(\d+:\d+\)$/, ''), line: loc.line, column: loc.column };
+        }
+      },
+    };
+  },
+];
+
+function checkJson(source) {
+  try {
+    JSON.parse(source);
+    return null;
+  } catch (err) {
+    return { message: err.message };
+  }
+}
+
+// Blank out module syntax (keeping every offset) so vm.Script can parse it
+const blank = (text) => text.replace(/[^\n]/g, ' ');
+const scriptify = (source) => source
+  .replace(/^[ \t]*import\s+(?:[\w$*{}\s,]+from\s*)?(['"])[^'"\n]*\1\s*;?/gm, blank)
+  .replace(/^[ \t]*export\s*\{[^}]*\}\s*(?:from\s*(['"])[^'"\n]*\1)?\s*;?/gm, blank)
+  .replace(/\bexport\s+default\s+/g, blank)
+  .replace(/\bexport\s+(?=(?:async\s+)?(?:const|let|var|function|class)\b)/g, blank)
+  .replace(/\bimport\.meta\b/g, '__importMeta');
+
+const looksLikeJsx = (source) => /<\/[A-Za-z][\w.]*>|\/>|(?:return|=>)\s*\(?\s*<[A-Za-z]/.test(source);
+
+const nodeParser = {
+  name: 'node',
+  check(file, source) {
+    if (path.extname(file) === '.json') return checkJson(source);
+    if (/\.tsx?$/.test(file)) return { skipped: 'no TypeScript parser installed' };
+    try {
+      new vm.Script(scriptify(source), { filename: file });
+      return null;
+    } catch (err) {
+      if (looksLikeJsx(source)) {
+        return { skipped: 'no JSX parser installed (esbuild, @babel/parser or acorn-jsx)' };
+      }
+      // The first stack line is "file:LINE", the third a caret under the column
+      const lines = String(err.stack).split('\n');
+      const line = Number((lines[0].match(/:(\d+)$/) || [])[1]) || undefined;
+      const caret = lines[2] && lines[2].indexOf('^');
+      return { message: err.message, line, column: caret >= 0 ? caret : undefined };
+    }
+  },
+};
+
+let parser = null;
+for (const make of parsers) {
+  parser = make();
+  if (parser) break;
+}
+parser = parser || nodeParser;
+
+const input = readline.createInterface({ input: process.stdin, crlfDelay: Infinity });
+input.on('line', (line) => {
+  if (!line.trim()) return;
+  let request;
+  try {
+    request = JSON.parse(line);
+  } catch (err) {
+    process.stdout.write(JSON.stringify({ id: null, error: `bad request: ${err.message}` }) + '\n');
+    return;
+  }
+  const results = (request.files || []).map(({ path: file, source }) => {
+    const problem = parser.check(file, source);
+    if (!problem) return { path: file, ok: true };
+    if (problem.skipped) return { path: file, ok: true, skipped: problem.skipped };
+    return { path: file, ok: false, ...problem };
+  });
+  process.stdout.write(JSON.stringify({ id: request.id, parser: parser.name, results }) + '\n');
+});
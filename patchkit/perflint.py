@@ -0,0 +1,396 @@
+"""
+Lint patched output for known runtime performance problems.
+
+The patches keep injecting the same few patterns into the editor and widgets.
+One pass over the token stream (with the function scopes from jsscopes.py)
+finds:
+
+    layout-thrash   a layout read (getBoundingClientRect, offsetWidth, ...)
+                    after a style or DOM write in a mousemove/scroll/resize
+                    handler - or in a loop in one - including reads in local
+                    functions it calls, like the injected updatePositions.
+                    Each such read forces a synchronous layout.
+    storage-poll    setInterval whose callback reads localStorage or
+                    sessionStorage; the 'storage' event already says when
+                    another tab writes.
+    cleanup-query   document.querySelectorAll in a cleanup path (an effect's
+                    cleanup, or a deselect/remove/cleanup helper), which walks
+                    the whole document every time.
+    render-parse    JSON.parse of storage in a component or hook body, which
+                    runs on every render.
+
+Run over the spec pipeline's in-memory output, every finding names the patch
+whose lines it falls on (None for lines that were already in the input).
+"""
+
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from pathlib import Path
+
+from .engine import APPLIED, apply_patch, split_lines
+from .jsscopes import DECLARATORS, Function, Scopes, call_arguments, receiver_start
+from .jstokens import IDENT, NUMBER, STRING, LineIndex, match_brackets, string_value, tokenize
+from .spec import PatchSpec
+
+SUFFIXES = (".js", ".jsx", ".mjs", ".ts", ".tsx")
+
+RULES = ("layout-thrash", "storage-poll", "cleanup-query", "render-parse")
+
+HOT_EVENTS = {"mousemove", "pointermove", "touchmove", "drag", "dragover", "scroll", "wheel", "resize"}
+LAYOUT_CALLS = {"getBoundingClientRect", "getClientRects", "getComputedStyle"}
+LAYOUT_PROPS = {
+    "offsetWidth", "offsetHeight", "offsetTop", "offsetLeft", "offsetParent",
+    "clientWidth", "clientHeight", "clientTop", "clientLeft",
+    "scrollWidth", "scrollHeight", "scrollTop", "scrollLeft", "innerText",
+}
+# Properties whose assignment invalidates style or layout
+WRITE_PROPS = {"className", "innerHTML", "outerHTML", "textContent", "innerText", "scrollTop", "scrollLeft"}
+WRITE_CALLS = {"appendChild", "insertBefore", "removeChild", "replaceChild", "setProperty", "removeProperty"}
+CLASSLIST_CALLS = {"add", "remove", "toggle", "replace"}
+STORAGES = {"localStorage", "sessionStorage"}
+# Array methods that call their callback synchronously, once per item
+LOOP_CALLS = {"forEach", "map", "filter", "some", "every", "reduce", "find", "findIndex", "flatMap"}
+
+_ASSIGN = {"=", "+=", "-=", "*=", "/=", "||=", "&&=", "??="}
+_CLEANUP_NAME_RE = re.compile(r"^(?:cleanup|cleanUp|teardown|destroy|dispose|deselect|remove|clear|hide|close)")
+_RENDER_NAME_RE = re.compile(r"^(?:[A-Z]|use[A-Z])")
+_MAX_DEPTH = 4
+
+
+@dataclass
+class Finding:
+    path: str
+    rule: str
+    line: int
+    column: int
+    end_line: int
+    end_column: int
+    message: str
+    # Id of the patch that wrote the line, None if it was already in the input
+    patch: str | None = None
+
+    def __str__(self) -> str:
+        origin = f" (from {self.patch})" if self.patch else ""
+        return (f"✗ {self.path}:{self.line}:{self.column + 1}-{self.end_line}:{self.end_column + 1}: "
+                f"[{self.rule}] {self.message}{origin}")
+
+
+def attribute(specs: list[PatchSpec], text: str) -> tuple[str, list[str | None]]:
+    """Apply specs in order; returns the output and, per output line, the spec that wrote it."""
+    lines = split_lines(text)
+    origins: list[str | None] = [None] * len(lines)
+    for spec in specs:
+        output, result = apply_patch(spec, text, keep_lines=True)
+        if result.status != APPLIED:
+            continue
+        # Records of one edit share its input's coordinates; later edits see
+        # earlier ones applied (diff hunks are all edit 0)
+        for index in sorted({r.edit for r in result.records}):
+            for record in sorted((r for r in result.records if r.edit == index), key=lambda r: r.start,
+                                 reverse=True):
+                old = lines[record.start:record.end]
+                new = record.lines if record.lines is not None else [None] * record.new_lines
+                # Lines the edit kept (an insert's anchor) keep their origin
+                pre = 0
+                while pre < min(len(old), len(new)) and old[pre] == new[pre]:
+                    pre += 1
+                suf = 0
+                while suf < min(len(old), len(new)) - pre and old[-1 - suf] == new[-1 - suf]:
+                    suf += 1
+                kept = origins[record.start:record.end]
+                origins[record.start:record.end] = \
+                    kept[:pre] + [spec.id] * (len(new) - pre - suf) + (kept[len(kept) - suf:] if suf else [])
+                lines[record.start:record.end] = new
+        text = output
+        lines = split_lines(text)
+    total = len(split_lines(text))
+    return text, (origins + [None] * total)[:total]
+
+
+class _Lint:
+    def __init__(self, path: str, text: str):
+        self.path = path
+        self.text = text
+        self.tokens = tokenize(text)
+        self.pairs = match_brackets(self.tokens)
+        self.scopes = Scopes(self.tokens, self.pairs)
+        self.lines = LineIndex(text)
+        self.named: dict[str, list[Function]] = {}
+        for function in self.scopes.functions:
+            if function.name:
+                self.named.setdefault(function.name.rpartition(".")[2], []).append(function)
+        # Per function start (-1 for top level): ordered (kind, token) events,
+        # kind being read, write, storage, call or fn (a synchronous callback)
+        self.events: dict[int, list[tuple[str, int]]] = {}
+        # Per function start: loop bodies as (first, last) token
+        self.loops: dict[int, list[tuple[int, int]]] = {}
+        self.storage_vars: set[str] = set()
+        # setInterval calls, checked once every function's events are known
+        self.intervals: list[int] = []
+        self.findings: list[Finding] = []
+
+    # -- reporting --------------------------------------------------------
+
+    def span(self, first: int, last: int) -> tuple[int, int]:
+        return self.tokens[first].start, self.tokens[last].end
+
+    def report(self, rule: str, span: tuple[int, int], message: str) -> None:
+        start, end = span
+        line, end_line = self.lines.line(start), self.lines.line(max(start, end - 1))
+        self.findings.append(Finding(
+            self.path, rule, line, start - self.lines.starts[line - 1],
+            end_line, end - self.lines.starts[end_line - 1], message,
+        ))
+
+    def snippet(self, first: int, last: int, limit: int = 60) -> str:
+        text = " ".join(self.text[self.tokens[first].start:self.tokens[last].end].split())
+        return text if len(text) <= limit else text[:limit - 3] + "..."
+
+    def line_of(self, index: int) -> int:
+        return self.lines.line(self.tokens[index].start)
+
+    # -- the pass ---------------------------------------------------------
+
+    def scan(self) -> None:
+        tokens, pairs = self.tokens, self.pairs
+        n = len(tokens)
+        for function in self.scopes.functions:
+            if self._loop_callback(function):
+                self._event(function.start, "fn")
+        for i, tok in enumerate(tokens):
+            if tok.kind != IDENT:
+                continue
+            prev = tokens[i - 1].value if i else ""
+            after = tokens[i + 1].value if i + 1 < n else ""
+            member = prev in (".", "?.")
+            if tok.value in ("for", "while") and after == "(" and i + 1 in pairs:
+                body = pairs[i + 1] + 1
+                if body < n and tokens[body].value == "{" and body in pairs:
+                    self.loops.setdefault(self._key(i), []).append((body, pairs[body]))
+            elif member and tok.value in LAYOUT_CALLS | LAYOUT_PROPS and after not in _ASSIGN:
+                self._event(i, "read")
+            elif tok.value == "getComputedStyle" and after == "(":
+                self._event(i, "read")
+            elif member and after in _ASSIGN and (tok.value in WRITE_PROPS or self._is_style_member(i)):
+                self._event(i, "write")
+            elif member and after == "(" and (tok.value in WRITE_CALLS or self._is_classlist_call(i)
+                                              or self._is_style_attribute(i)):
+                self._event(i, "write")
+            elif tok.value in STORAGES and after in (".", "?.", "["):
+                self._event(i, "storage")
+                if i >= 3 and prev == "=" and tokens[i - 3].value in DECLARATORS:
+                    # const saved = localStorage.getItem(...)
+                    self.storage_vars.add(tokens[i - 2].value)
+            elif not member and after == "(" and prev != "function" and tok.value in self.named:
+                self._event(i, "call")
+            global_call = not member or tokens[i - 2].value in ("window", "globalThis")
+            if tok.value == "setInterval" and after == "(" and global_call:
+                self.intervals.append(i)
+            elif tok.value == "querySelectorAll" and member and tokens[i - 2].value == "document" and after == "(":
+                self._cleanup_query(i)
+            elif tok.value == "parse" and member and tokens[i - 2].value == "JSON" and after == "(":
+                self._render_parse(i)
+
+    def _key(self, index: int) -> int:
+        owner = self.scopes.owner(index)
+        return owner.start if owner is not None else -1
+
+    def _event(self, index: int, kind: str) -> None:
+        self.events.setdefault(self._key(index), []).append((kind, index))
+
+    def _loop_callback(self, function: Function) -> bool:
+        s, tokens = function.start, self.tokens
+        return s >= 2 and tokens[s - 1].value == "(" and tokens[s - 2].value in LOOP_CALLS
+
+    def _is_style_member(self, i: int) -> bool:
+        # x.style.top = ... / x.style.cssText = ...
+        tokens = self.tokens
+        return i >= 2 and tokens[i - 2].value == "style"
+
+    def _is_classlist_call(self, i: int) -> bool:
+        tokens = self.tokens
+        return self.tokens[i].value in CLASSLIST_CALLS and i >= 2 and tokens[i - 2].value == "classList"
+
+    def _is_style_attribute(self, i: int) -> bool:
+        tokens = self.tokens
+        if tokens[i].value not in ("setAttribute", "removeAttribute") or i + 2 >= len(tokens):
+            return False
+        first = tokens[i + 2]
+        return first.kind == STRING and string_value(first) in ("style", "class")
+
+    # -- sequences --------------------------------------------------------
+
+    def sequence(self, function: Function) -> list[tuple[str, int]]:
+        """The function's events in order, loop bodies repeated twice."""
+        items = sorted(self.events.get(function.start, []), key=lambda e: e[1])
+        for first, last in sorted(self.loops.get(function.start, []), key=lambda r: r[1] - r[0]):
+            inside = [k for k, (_, i) in enumerate(items) if first <= i <= last]
+            if inside:
+                a, b = inside[0], inside[-1] + 1
+                items = items[:a] + items[a:b] * 2 + items[b:]
+        return items
+
+    def expand(self, function: Function, depth: int = 0, stack: frozenset = frozenset()):
+        """Events of a function with local calls and synchronous callbacks inlined.
+
+        Yields (kind, token) for read, write and storage events.
+        """
+        stack = stack | {function.start}
+        for kind, index in self.sequence(function):
+            if kind in ("read", "write", "storage"):
+                yield kind, index
+                continue
+            if depth >= _MAX_DEPTH:
+                continue
+            if kind == "fn":
+                callee = self.scopes.by_start[index]
+                if callee.start not in stack:
+                    inner = list(self.expand(callee, depth + 1, stack))
+                    # Called once per item
+                    yield from inner * 2
+            else:
+                callee = self._callee(self.tokens[index].value, index)
+                if callee is not None and callee.start not in stack and not callee.handles:
+                    yield from self.expand(callee, depth + 1, stack)
+
+    def _callee(self, name: str, index: int) -> Function | None:
+        """The function a local call refers to: the nearest enclosing definition."""
+        candidates = self.named.get(name, [])
+        chain = self.scopes.chain(index)
+        for scope in chain:
+            for candidate in candidates:
+                if candidate.parent is scope:
+                    return candidate
+        top = [c for c in candidates if c.parent is None]
+        return top[0] if top else (candidates[0] if len(candidates) == 1 else None)
+
+    # -- rules ------------------------------------------------------------
+
+    def layout_thrash(self) -> None:
+        reported = set()
+        for handler in self.scopes.functions:
+            events = sorted(set(handler.handles or []) & HOT_EVENTS)
+            if not events:
+                continue
+            last_write = None
+            for kind, index in self.expand(handler):
+                if kind == "write":
+                    last_write = index
+                elif kind == "read" and last_write is not None and index not in reported:
+                    reported.add(index)
+                    start = receiver_start(self.tokens, self.scopes.pairs_back, index - 1) \
+                        if self.tokens[index - 1].value in (".", "?.") else index
+                    last = self.pairs.get(index + 1, index)
+                    label = f" {handler.name}" if handler.name else ""
+                    self.report("layout-thrash", self.span(start, last),
+                                f"{self.tokens[index].value} read after a style write (line "
+                                f"{self.line_of(last_write)}) in the '{events[0]}' handler{label} forces a "
+                                f"synchronous layout; read before writing, or write in requestAnimationFrame")
+
+    def storage_poll(self) -> None:
+        for i in self.intervals:
+            self._storage_poll(i)
+
+    def _storage_poll(self, i: int) -> None:
+        args = call_arguments(self.tokens, self.pairs, i + 1)
+        if not args:
+            return
+        first, end = args[0]
+        callback = self.scopes.by_start.get(first)
+        if callback is None and end - first == 1 and self.tokens[first].kind == IDENT:
+            callback = self._callee(self.tokens[first].value, i)
+        if callback is None:
+            return
+        reads = [index for kind, index in self.expand(callback) if kind == "storage"]
+        if not reads:
+            return
+        storage = self.tokens[reads[0]].value
+        delay = args[1] if len(args) > 1 else None
+        every = f" every {self.tokens[delay[0]].value} ms" \
+            if delay and delay[1] - delay[0] == 1 and self.tokens[delay[0]].kind == NUMBER else ""
+        close = self.pairs.get(i + 1, i)
+        self.report("storage-poll", self.span(i, close),
+                    f"{self.snippet(i, close)} polls {storage}{every}; listen for the 'storage' event "
+                    f"(other tabs) or notify from the code that writes instead")
+
+    def _cleanup_query(self, i: int) -> None:
+        chain = self.scopes.chain(i)
+        path = next((f for f in chain if f.cleanup or f.name and _CLEANUP_NAME_RE.match(f.name.rpartition(".")[2])),
+                    None)
+        if path is None:
+            return
+        args = call_arguments(self.tokens, self.pairs, i + 1)
+        selector = ""
+        if args and args[0][1] - args[0][0] == 1 and self.tokens[args[0][0]].kind == STRING:
+            selector = f" '{string_value(self.tokens[args[0][0]])}'"
+        where = "the effect cleanup" if path.cleanup else path.name
+        self.report("cleanup-query", self.span(i - 2, self.pairs.get(i + 1, i)),
+                    f"document.querySelectorAll{selector} in {where} walks the whole document each time; "
+                    f"keep references to the nodes that were created, or query inside their container")
+
+    def _render_parse(self, i: int) -> None:
+        args = call_arguments(self.tokens, self.pairs, i + 1)
+        if not args:
+            return
+        first, end = args[0]
+        names = {t.value for t in self.tokens[first:end] if t.kind == IDENT}
+        storage = names & STORAGES or names & self.storage_vars
+        owner = self.scopes.owner(i)
+        if not storage or owner is None or not owner.name \
+                or not _RENDER_NAME_RE.match(owner.name.rpartition(".")[2]):
+            return
+        close = self.pairs.get(i + 1, i)
+        tokens = self.tokens
+        k = i - 2
+        in_state = k >= 2 and tokens[k - 1].value == "(" and tokens[k - 2].value == "useState"
+        hint = "pass useState a function so it only runs once" if in_state \
+            else "parse once in a useState initializer or useMemo"
+        self.report("render-parse", self.span(i - 2, close),
+                    f"{self.snippet(i - 2, close)} runs on every render of {owner.name}; {hint}")
+
+
+def lint(path: str, text: str, origins: list[str | None] | None = None,
+         rules: set[str] | None = None) -> list[Finding]:
+    """Findings for one file; origins (per line) attribute each to a patch."""
+    state = _Lint(path, text)
+    state.scan()
+    state.layout_thrash()
+    state.storage_poll()
+    findings = [f for f in state.findings if rules is None or f.rule in rules]
+    if origins:
+        for finding in findings:
+            finding.patch = next((origins[n - 1] for n in range(finding.line, finding.end_line + 1)
+                                  if n - 1 < len(origins) and origins[n - 1]), None)
+    findings.sort(key=lambda f: (f.line, f.column))
+    return findings
+
+
+def lint_tree(paths: list[str], specs: list[PatchSpec], root: str | Path = ".",
+              rules: set[str] | None = None) -> list[Finding]:
+    """Lint each file as the specs targeting it would leave it."""
+    root = Path(root)
+    groups: dict[str, list[PatchSpec]] = {}
+    for spec in specs:
+        groups.setdefault(spec.target, []).append(spec)
+    findings = []
+    for path in paths:
+        text = (root / path).read_text(encoding="utf-8", errors="replace")
+        origins = None
+        if path in groups:
+            text, origins = attribute(groups[path], text)
+        findings.extend(lint(path, text, origins, rules))
+    return findings
+
+
+def format_findings(findings: list[Finding]) -> str:
+    out = [str(f) for f in findings]
+    counts: dict[str, int] = {}
+    for finding in findings:
+        counts[finding.rule] = counts.get(finding.rule, 0) + 1
+    summary = ", ".join(f"{counts[r]} {r}" for r in RULES if r in counts)
+    patched = sum(1 for f in findings if f.patch)
+    out.append(f"{len(findings)} finding(s)" + (f": {summary}" if summary else "")
+               + (f"; {patched} introduced by patches" if patched else ""))
+    return "\n".join(out)
@@ -0,0 +1,125 @@
+"""
+Backfill responsive image attributes into saved post HTML.
+
+Images inserted before the responsive-images patch were saved without
+loading/decoding attributes or a srcset. This rewrites the <img> tags in an
+exported post store (the JSON of localStorage.socialHubPosts, or any JSON
+whose strings hold post HTML) the same way src/utils/responsiveImages.js
+does for new images:
+
+* loading="lazy" and decoding="async" where they are missing
+* a srcset of Cloudinary resized variants (plus sizes) for plain Cloudinary
+  uploads that have none; a width attribute caps the variant widths
+
+Attributes that are already present are never changed, so running it twice
+is harmless. Intrinsic width/height cannot be known without fetching the
+images, so they are only kept, not added.
+"""
+
+from __future__ import annotations
+
+import html
+import json
+import re
+from pathlib import Path
+
+# Keep in step with src/utils/responsiveImages.js
+RESPONSIVE_WIDTHS = (320, 640, 960, 1280, 1920)
+IMAGE_SIZES = "(max-width: 800px) 100vw, 800px"
+
+_IMG_RE = re.compile(r"<img\b[^>]*>", re.IGNORECASE)
+_ATTR_RE = re.compile(r"""([^\s"'<>/=]+)(?:\s*=\s*("[^"]*"|'[^']*'|[^\s"'=<>`]+))?""")
+_CLOUDINARY_RE = re.compile(r"^(https?://res\.cloudinary\.com/[^/]+/image/upload/)(.+)$")
+_TRANSFORMATION_RE = re.compile(r"^[a-z]{1,3}_[^/]*/")
+
+
+def cloudinary_url(url: str, width: int) -> str | None:
+    """URL of a Cloudinary upload resized to at most width; None for other URLs."""
+    match = _CLOUDINARY_RE.match(url)
+    if not match or _TRANSFORMATION_RE.match(match.group(2)):
+        return None
+    return f"{match.group(1)}w_{width},c_limit,f_auto,q_auto/{match.group(2)}"
+
+
+def cloudinary_srcset(url: str, max_width: int | None = None) -> str:
+    if cloudinary_url(url, RESPONSIVE_WIDTHS[0]) is None:
+        return ""
+    widths = list(RESPONSIVE_WIDTHS)
+    if max_width:
+        widths = [w for w in widths if w < max_width] + [max_width]
+    return ", ".join(f"{cloudinary_url(url, w)} {w}w" for w in widths)
+
+
+def _attributes(tag: str) -> dict[str, str]:
+    attrs = {}
+    for name, value in _ATTR_RE.findall(tag[len("<img"):].rstrip(">/")):
+        attrs.setdefault(name.lower(), html.unescape(value.strip("\"'")) if value else "")
+    return attrs
+
+
+def backfill_tag(tag: str) -> str:
+    """One <img ...> tag with the missing attributes appended."""
+    attrs = _attributes(tag)
+    added = []
+    if "loading" not in attrs:
+        added.append('loading="lazy"')
+    if "decoding" not in attrs:
+        added.append('decoding="async"')
+    if "srcset" not in attrs:
+        width = attrs.get("width", "")
+        srcset = cloudinary_srcset(attrs.get("src", ""), int(width) if width.isdigit() else None)
+        if srcset:
+            added.append(f'srcset="{html.escape(srcset)}"')
+            added.append(f'sizes="{IMAGE_SIZES}"')
+    if not added:
+        return tag
+    body, close = (tag[:-2], " />") if tag.endswith("/>") else (tag[:-1], ">")
+    return f"{body.rstrip()} {' '.join(added)}{close}"
+
+
+def backfill_html(text: str) -> tuple[str, int]:
+    """(HTML with every <img> backfilled, number of tags changed)."""
+    changed = 0
+
+    def replace(match):
+        nonlocal changed
+        new = backfill_tag(match.group())
+        changed += new != match.group()
+        return new
+
+    return _IMG_RE.sub(replace, text), changed
+
+
+def backfill_data(data):
+    """Backfill every string in a JSON value that holds an <img>; returns (data, count)."""
+    if isinstance(data, str):
+        return backfill_html(data) if "<img" in data.lower() else (data, 0)
+    if isinstance(data, list):
+        total = 0
+        items = []
+        for item in data:
+            item, count = backfill_data(item)
+            items.append(item)
+            total += count
+        return items, total
+    if isinstance(data, dict):
+        total = 0
+        out = {}
+        for key, value in data.items():
+            out[key], count = backfill_data(value)
+            total += count
+        return out, total
+    return data, 0
+
+
+def backfill_file(path: str | Path, output: str | Path | None = None, dry_run: bool = False) -> int:
+    """Backfill an exported post store; writes to output (default: in place)."""
+    path = Path(path)
+    data = json.loads(path.read_text(encoding="utf-8"))
+    # localStorage values are JSON strings; an export may be the raw value
+    nested = isinstance(data, str) and data.lstrip()[:1] in ("[", "{")
+    data, count = backfill_data(json.loads(data) if nested else data)
+    if not dry_run and (count or output):
+        text = json.dumps(data, ensure_ascii=False)
+        Path(output or path).write_text(json.dumps(text) if nested else text, encoding="utf-8")
+    return count
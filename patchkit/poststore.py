@@ -0,0 +1,272 @@
+"""
+Compact an exported socialHubPosts store.
+
+The posts store (localStorage.socialHubPosts, read by add_persistence.py)
+holds every post's full HTML, including images pasted into the editor as
+data: URIs. This rewrites an export of it:
+
+* data:image/... URIs are decoded and written once each to a
+  content-addressed file (<sha256 prefix>.<ext>) in the assets directory;
+  the HTML refers to them as <base-url><file>. Identical images in different
+  posts share one file.
+* post HTML (the content and body fields, at any depth) is minified:
+  comments dropped, runs of whitespace collapsed (except inside <pre> and
+  <textarea>), empty style/class attributes removed. Other strings are left
+  as they are, even if they contain markup.
+* the store is written back as compact JSON, with a size report.
+
+The input is read as a stream of top-level array items and the output is
+written as it goes, so only one post is held in memory at a time. An export
+of the raw localStorage value - one JSON string holding the array - has to
+be decoded whole first.
+
+Upload the assets directory wherever base-url points before loading the
+compacted store back into the browser.
+"""
+
+from __future__ import annotations
+
+import base64
+import binascii
+import hashlib
+import json
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+
+CHUNK_SIZE = 1 << 16
+
+# Fields holding a post's HTML; only these are minified
+HTML_FIELDS = {"content", "body"}
+
+# localStorage quota per origin, in UTF-16 code units, in most browsers
+STORAGE_QUOTA_CHARS = 5 * 1024 * 1024
+
+_DATA_URI_RE = re.compile(r"data:(image/[\w.+-]+);base64,([A-Za-z0-9+/=\s]+)")
+_EXTENSIONS = {
+    "image/jpeg": "jpg",
+    "image/jpg": "jpg",
+    "image/png": "png",
+    "image/gif": "gif",
+    "image/webp": "webp",
+    "image/svg+xml": "svg",
+    "image/avif": "avif",
+    "image/bmp": "bmp",
+}
+_PRESERVE_RE = re.compile(r"(<(pre|textarea)\b.*?</\2\s*>)", re.IGNORECASE | re.DOTALL)
+_COMMENT_RE = re.compile(r"<!--(?!\[if).*?-->", re.DOTALL)
+_EMPTY_ATTR_RE = re.compile(r"""\s(?:style|class)=(?:""|'')""")
+
+
+@dataclass
+class PostSize:
+    key: str
+    before: int
+    after: int
+    images: int
+
+
+@dataclass
+class CompactReport:
+    posts: int = 0
+    bytes_before: int = 0
+    bytes_after: int = 0
+    images: int = 0
+    unique_images: int = 0
+    image_bytes: int = 0
+    bad_uris: int = 0
+    sizes: list[PostSize] = field(default_factory=list)
+
+
+def iter_array(path: str | Path, chunk_size: int = CHUNK_SIZE):
+    """Yield the items of the top-level JSON array in a file, one at a time."""
+    decoder = json.JSONDecoder()
+    with open(path, encoding="utf-8") as f:
+        buf = f.read(chunk_size)
+        eof = len(buf) < chunk_size
+        pos = 0
+
+        def fill():
+            nonlocal buf, pos, eof
+            more = f.read(chunk_size)
+            eof = len(more) < chunk_size
+            buf = buf[pos:] + more
+            pos = 0
+
+        def skip_space():
+            nonlocal pos
+            while True:
+                while pos < len(buf) and buf[pos].isspace():
+                    pos += 1
+                if pos < len(buf) or eof:
+                    return
+                fill()
+
+        skip_space()
+        if buf[pos:pos + 1] != "[":
+            raise ValueError(f"{path}: not a JSON array")
+        pos += 1
+        first = True
+        while True:
+            skip_space()
+            if pos >= len(buf):
+                raise ValueError(f"{path}: unterminated array")
+            if buf[pos] == "]":
+                return
+            if not first:
+                if buf[pos] != ",":
+                    raise ValueError(f"{path}: expected ',' at offset {pos}")
+                pos += 1
+                skip_space()
+            first = False
+            while True:
+                try:
+                    item, end = decoder.raw_decode(buf, pos)
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                    fill()
+                    continue
+                # A number at the end of the buffer may continue in the next chunk
+                if end == len(buf) and not eof:
+                    fill()
+                    continue
+                break
+            pos = end
+            yield item
+
+
+def load_items(path: str | Path):
+    """Stream the store's posts; the raw localStorage string form is decoded whole."""
+    with open(path, encoding="utf-8") as f:
+        head = f.read(64).lstrip()
+    if head.startswith('"'):
+        data = json.loads(json.loads(Path(path).read_text(encoding="utf-8")))
+        if not isinstance(data, list):
+            raise ValueError(f"{path}: the store is not an array")
+        return True, iter(data)
+    return False, iter_array(path)
+
+
+def minify_html(html: str) -> str:
+    if "<" not in html:
+        return html
+    parts = _PRESERVE_RE.split(html)
+    out = []
+    # split() with two groups yields text, whole block, tag name, text, ...
+    for i in range(0, len(parts), 3):
+        text = _COMMENT_RE.sub("", parts[i])
+        text = re.sub(r"\s+", " ", text)
+        text = _EMPTY_ATTR_RE.sub("", text)
+        out.append(text)
+        if i + 1 < len(parts):
+            out.append(parts[i + 1])
+    return "".join(out).strip()
+
+
+class AssetStore:
+    """Content-addressed image files extracted from data: URIs."""
+
+    def __init__(self, directory: str | Path, base_url: str):
+        self.directory = Path(directory)
+        self.base_url = base_url
+        self.seen: dict[str, str] = {}
+        self.count = 0
+        self.bytes = 0
+        self.bad = 0
+
+    def replace(self, match: re.Match) -> str:
+        mime, payload = match.group(1).lower(), re.sub(r"\s+", "", match.group(2))
+        try:
+            data = base64.b64decode(payload, validate=True)
+        except (binascii.Error, ValueError):
+            self.bad += 1
+            return match.group()
+        self.count += 1
+        digest = hashlib.sha256(data).hexdigest()[:20]
+        name = f"{digest}.{_EXTENSIONS.get(mime, 'bin')}"
+        if digest not in self.seen:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            target = self.directory / name
+            if not target.exists():
+                target.write_bytes(data)
+            self.seen[digest] = name
+            self.bytes += len(data)
+        return self.base_url + self.seen[digest]
+
+
+def _compact_value(value, assets: AssetStore, html: bool = False):
+    if isinstance(value, str):
+        if "data:image/" in value:
+            value = _DATA_URI_RE.sub(assets.replace, value)
+        if html and "<" in value:
+            value = minify_html(value)
+        return value
+    if isinstance(value, list):
+        return [_compact_value(v, assets, html) for v in value]
+    if isinstance(value, dict):
+        return {k: _compact_value(v, assets, k in HTML_FIELDS) for k, v in value.items()}
+    return value
+
+
+def _dumps(value) -> str:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+
+def compact_store(source: str | Path, output: str | Path, assets_dir: str | Path,
+                  base_url: str) -> CompactReport:
+    """Compact the store at source into output; images go to assets_dir."""
+    report = CompactReport()
+    assets = AssetStore(assets_dir, base_url)
+    nested, items = load_items(source)
+    tmp = Path(f"{output}.tmp")
+    with open(tmp, "w", encoding="utf-8") as out:
+        out.write("[")
+        for index, item in enumerate(items):
+            before = len(_dumps(item))
+            images = assets.count
+            item = _compact_value(item, assets)
+            text = _dumps(item)
+            if index:
+                out.write(",")
+            out.write(text)
+            key = str(item.get("id") or item.get("title") or index) if isinstance(item, dict) else str(index)
+            report.sizes.append(PostSize(key[:60], before, len(text), assets.count - images))
+            report.posts += 1
+        out.write("]")
+    if nested:
+        # Keep the export in the form it came in (a JSON string)
+        tmp.write_text(json.dumps(tmp.read_text(encoding="utf-8"), ensure_ascii=False), encoding="utf-8")
+    tmp.replace(output)
+
+    report.bytes_before = Path(source).stat().st_size
+    report.bytes_after = Path(output).stat().st_size
+    report.images = assets.count
+    report.unique_images = len(assets.seen)
+    report.image_bytes = assets.bytes
+    report.bad_uris = assets.bad
+    return report
+
+
+def format_report(report: CompactReport, top: int = 10) -> str:
+    def pct(after, before):
+        return f"{(1 - after / before) * 100:.1f}% smaller" if before else "empty"
+
+    chars = report.bytes_after  # close enough for mostly-ASCII HTML
+    out = [
+        f"Posts: {report.posts}",
+        f"Store: {report.bytes_before} -> {report.bytes_after} bytes ({pct(report.bytes_after, report.bytes_before)})",
+        f"Images: {report.images} data: URI(s) extracted, {report.unique_images} unique file(s), "
+        f"{report.image_bytes} bytes",
+        f"localStorage: ~{chars / STORAGE_QUOTA_CHARS * 100:.1f}% of a {STORAGE_QUOTA_CHARS // (1024 * 1024)}M "
+        f"character quota",
+    ]
+    if report.bad_uris:
+        out.append(f"✗ {report.bad_uris} data: URI(s) were not valid base64 and were left in place")
+    largest = sorted(report.sizes, key=lambda s: s.before, reverse=True)[:top]
+    if largest:
+        out.append("Largest posts (before -> after):")
+        for size in largest:
+            note = f", {size.images} image(s)" if size.images else ""
+            out.append(f"  {size.before:>10} -> {size.after:>9}  {size.key}{note}")
+    return "\n".join(out)
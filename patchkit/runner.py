@@ -0,0 +1,304 @@
+"""
+Run a set of specs against the files they target.
+
+Specs are grouped by target and applied in the order given. A target is only
+written when every patch for it succeeded, so a failed run never leaves a
+half-patched App.js behind. A glob target applies the spec to every matching
+file; `only` limits a run to a set of targets, e.g. the modules reachable from
+the entry point (see imports.py).
+
+With an OutputCache, a target whose (content, specs) pair has been patched
+before is served from the cache: one hash of the input and one file copy.
+With a state directory, patches whose regions did not change since the last
+run are replayed instead of re-matched (see incremental.py).
+
+Writes are optimistic: the target is read and patched without a lock, then,
+under an advisory lock, its hash is checked again and the output is renamed
+into place. If another run changed the file in between, the patches are
+re-run against the new contents - replaying every patch whose regions the
+other writer did not touch - and the write is retried. The last attempt
+holds the lock for the whole read-patch-write, so it cannot lose a race to
+another patchkit run.
+
+Before anything is written, every changed output is checked for syntax errors
+in one batch (see validate.py); a target whose output does not parse is not
+written. With a byte budget (see bytecost.py), a target is not written when
+one of its patches, or all of them together, add more than the budget allows.
+
+With an output directory (an overlay, see overlay.py), outputs are written
+there under the target's path and the checkout is only read.
+"""
+
+from __future__ import annotations
+
+import hashlib
+from contextlib import nullcontext
+from dataclasses import asdict, dataclass, field, replace
+from pathlib import Path
+
+from .bytecost import Budget, Cost, Sizer, by_patch
+from .bytecost import check as check_budget
+from .cache import OutputCache, cache_key
+from .engine import FAILED, PatchResult
+from .incremental import apply_incremental, load_state, save_state, state_path
+from .locking import atomic_write, file_lock, lock_path
+from .spec import DEFAULT_CACHE_DIR, PatchSpec
+from .validate import FileCheck, Validator
+
+DEFAULT_RETRIES = 3
+
+
+@dataclass
+class TargetReport:
+    target: str
+    results: list[PatchResult] = field(default_factory=list)
+    changed: bool = False
+    written: bool = False
+    cached: bool = False
+    reused: int = 0
+    conflicts: int = 0
+    error: str | None = None
+    # Parser that checked the output (see validate.py), and why it could not
+    parser: str | None = None
+    parse_skipped: str | None = None
+    # Bytes each applied patch added (see bytecost.py), when a budget is checked
+    costs: list[Cost] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and all(r.status != FAILED for r in self.results)
+
+
+def expand_targets(specs: list[PatchSpec], root: str | Path = ".") -> list[PatchSpec]:
+    """One spec per concrete file for specs whose target is a glob."""
+    root = Path(root)
+    expanded = []
+    for spec in specs:
+        if not any(c in spec.target for c in "*?["):
+            expanded.append(spec)
+            continue
+        for path in sorted(root.glob(spec.target)):
+            if path.is_file():
+                expanded.append(replace(spec, target=path.relative_to(root).as_posix()))
+    return expanded
+
+
+def group_by_target(specs: list[PatchSpec]) -> dict[str, list[PatchSpec]]:
+    groups: dict[str, list[PatchSpec]] = {}
+    for spec in specs:
+        groups.setdefault(spec.target, []).append(spec)
+    return groups
+
+
+def _patch(report: TargetReport, group: list[PatchSpec], raw: bytes, cache: OutputCache | None,
+           state: dict | None, sizer: Sizer | None = None) -> tuple[bytes, dict | None]:
+    """Patch one input. Returns the output and its region state (None on a cache hit).
+
+    With a sizer, report.costs gets what each applied patch added.
+    """
+    report.cached, report.reused = False, 0
+    key = None
+    if cache is not None:
+        key = cache_key(raw, group)
+        hit = cache.get(key)
+        # An entry written without costs is no use to a budget check
+        if hit is not None and (sizer is None or _cached_costs(hit[1], sizer) is not None):
+            output_path, data = hit
+            report.cached = True
+            report.results = [PatchResult.from_dict(r) for r in data["results"]]
+            if sizer is not None:
+                report.costs = _cached_costs(data, sizer)
+            return output_path.read_bytes(), None
+
+    original = raw.decode("utf-8")
+    steps = [] if sizer is not None else None
+    output, report.results, new_state, stats = apply_incremental(group, original, state, steps)
+    report.reused = stats.reused
+    encoded = output.encode("utf-8")
+    data = {
+        "changed": encoded != raw,
+        "results": [r.to_dict(lines=False) for r in report.results],
+    }
+    if sizer is not None:
+        report.costs = sizer.costs([(report.target, raw, [(i, t.encode("utf-8")) for i, t in steps])])
+        data["costs"] = [asdict(c) for c in report.costs]
+    if cache is not None:
+        cache.put(key, encoded, data)
+    return encoded, new_state
+
+
+def _cached_costs(data: dict, sizer: Sizer) -> list[Cost] | None:
+    """Costs stored with a cache entry, if they have every size the sizer would measure."""
+    if "costs" not in data:
+        return None
+    costs = [Cost(**c) for c in data["costs"]]
+    if sizer.brotli and any(c.brotli is None for c in costs):
+        return None
+    return costs
+
+
+def _read_and_patch(report: TargetReport, path: Path, group: list[PatchSpec],
+                    cache: OutputCache | None, state: dict | None, sizer: Sizer | None = None):
+    """(input digest, output, region state) for the file as it is now; None if unreadable."""
+    try:
+        raw = path.read_bytes()
+    except OSError as exc:
+        report.error = f"cannot read {report.target}: {exc.strerror}"
+        return None
+    output, new_state = _patch(report, group, raw, cache, state, sizer)
+    report.changed = output != raw
+    # On a conflict the retry replays against this run's regions
+    return hashlib.sha256(raw).digest(), output, new_state if new_state is not None else state
+
+
+def _record_check(report: TargetReport, check: FileCheck | None) -> None:
+    if check is None:
+        return
+    report.parser = check.parser
+    report.parse_skipped = check.skipped
+    if check.issues:
+        report.error = "output does not parse:\n" + "\n".join(f"    {issue}" for issue in check.issues)
+
+
+def _validate(report: TargetReport, output: bytes, validator: Validator | None) -> None:
+    if validator is not None and report.ok and report.changed:
+        checks = validator.check([(report.target, output.decode("utf-8"))])
+        _record_check(report, checks.get(report.target))
+
+
+def _run_target(report: TargetReport, path: Path, group: list[PatchSpec], first, *, dest: Path | None,
+                dry_run: bool, cache: OutputCache | None, state_file: Path | None, lock_file: Path, retries: int,
+                validator: Validator | None) -> None:
+    """Write the first (already patched and validated) output, re-patching on conflicts.
+
+    With a dest, the output goes there and `path` is only read.
+    """
+    digest, output, state = first
+
+    for attempt in range(retries + 1):
+        last = attempt == retries
+        # The final attempt is pessimistic: hold the lock throughout
+        with file_lock(lock_file) if last else nullcontext():
+            if attempt:
+                patched = _read_and_patch(report, path, group, cache, state)
+                if patched is None:
+                    return
+                digest, output, state = patched
+                _validate(report, output, validator)
+
+            if dry_run or not report.ok or not report.changed:
+                break
+
+            with file_lock(lock_file) if not last else nullcontext():
+                if hashlib.sha256(path.read_bytes()).digest() == digest:
+                    if dest is not None:
+                        dest.parent.mkdir(parents=True, exist_ok=True)
+                    atomic_write(dest or path, output)
+                    report.written = True
+                    break
+        report.conflicts += 1
+    else:
+        report.error = f"{report.target} kept changing during the run; gave up after {retries + 1} attempts"
+
+    if state_file is not None and state is not None:
+        save_state(state_file, state)
+
+
+def run(
+    specs: list[PatchSpec],
+    root: str | Path = ".",
+    dry_run: bool = False,
+    cache: OutputCache | None = None,
+    state_dir: str | Path | None = None,
+    retries: int = DEFAULT_RETRIES,
+    only: set[str] | None = None,
+    validate: bool = True,
+    budget: Budget | None = None,
+    output_dir: str | Path | None = None,
+) -> list[TargetReport]:
+    root = Path(root)
+    # Sizes come from the texts the run produces; node brotli only if the budget has a brotli limit
+    sizer = Sizer(budget.wants_brotli(), root / DEFAULT_CACHE_DIR) if budget is not None else None
+    jobs = []
+    for target, group in group_by_target(expand_targets(specs, root)).items():
+        if only is not None and target not in only:
+            continue
+        report = TargetReport(target)
+        state_file = state_path(state_dir, target) if state_dir is not None else None
+        state = load_state(state_file) if state_file is not None else None
+        first = _read_and_patch(report, root / target, group, cache, state, sizer)
+        jobs.append((report, group, state_file, first))
+
+    if budget is not None:
+        sizer.save()
+        _check_budget([report for report, _, _, first in jobs if first is not None], budget)
+
+    with Validator(root) if validate else nullcontext() as validator:
+        # Every changed output goes to the parser in one batch
+        if validator is not None:
+            batch = [(report.target, first[1].decode("utf-8"))
+                     for report, _, _, first in jobs if first is not None and report.ok and report.changed]
+            checks = validator.check(batch)
+            for report, _, _, _ in jobs:
+                _record_check(report, checks.get(report.target))
+
+        for report, group, state_file, first in jobs:
+            if first is None:
+                continue
+            _run_target(
+                report, root / report.target, group, first,
+                dest=Path(output_dir) / report.target if output_dir is not None else None,
+                dry_run=dry_run,
+                cache=cache,
+                state_file=state_file,
+                lock_file=lock_path(root / DEFAULT_CACHE_DIR, report.target),
+                retries=retries,
+                validator=validator,
+            )
+    return [job[0] for job in jobs]
+
+
+def _check_budget(reports: list[TargetReport], budget: Budget) -> None:
+    changed = [report for report in reports if report.ok and report.changed]
+    costs = [c for report in changed for c in report.costs]
+    for patch_id, message in check_budget(by_patch(costs), budget):
+        for report in changed:
+            if patch_id is None or any(c.patch == patch_id for c in report.costs):
+                note = f"over byte budget ({budget.path}): {message}"
+                report.error = note if report.error is None else f"{report.error}\n  ✗ {note}"
+
+
+def format_reports(reports: list[TargetReport]) -> str:
+    out = []
+    for report in reports:
+        notes = []
+        if report.cached:
+            notes.append("cached")
+        if report.reused:
+            notes.append(f"{report.reused}/{len(report.results)} patches replayed")
+        if report.conflicts:
+            notes.append(f"{report.conflicts} write conflict(s) retried")
+        if report.parse_skipped:
+            notes.append(f"not parsed: {report.parse_skipped}")
+        elif report.parser:
+            notes.append(f"parsed with {report.parser}")
+        out.append(f"{report.target}:" + (f" ({', '.join(notes)})" if notes else ""))
+        if report.error:
+            out.append(f"  ✗ {report.error}")
+        costs = {c.patch: c for c in report.costs}
+        for result in report.results:
+            cost = costs.get(result.id)
+            size = ""
+            if cost is not None:
+                brotli = f", {cost.brotli:+d} brotli" if cost.brotli is not None else ""
+                size = f" ({cost.raw:+d} raw, {cost.gzip:+d} gzip{brotli} bytes)"
+            out.append(f"  [{result.status}] {result.id}{size}")
+            out.extend(f"      {msg}" for msg in result.messages)
+        if report.written:
+            out.append("  ✓ written")
+        elif report.changed:
+            reason = "" if report.ok else " (errors)" if report.error else " (patch failures)"
+            out.append("  - not written" + reason)
+        else:
+            out.append("  - unchanged")
+    return "\n".join(out)
@@ -0,0 +1,319 @@
+"""
+Trigram index over the repo's source, backups and snippets.
+
+Finding every copy of an anchor (`handlePositions.forEach`, `// Make
+functions globally available`) before writing a patch used to mean grepping
+src/, the App.js backups, social-engagement-hub-main/ and the .js/.html
+snippets at the repo root each time. The index keeps, for every trigram of
+lower-cased text, the set of files containing it (a bitmask over file slots),
+plus each file's `{...}` block spans. A query intersects the bitmasks of its
+trigrams and only reads the files left over.
+
+The index lives in .patchkit/search.json and is brought up to date before
+every query: files whose mtime and size are unchanged are skipped, files
+whose content hash is unchanged only get a new stamp, the rest are
+re-indexed. A query therefore costs a stat() per file plus the reads of the
+candidate files.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+from bisect import bisect_right
+from dataclasses import dataclass
+from pathlib import Path
+
+from . import ENGINE_VERSION
+from .imports import STRAY_SUFFIXES
+from .jstokens import LineIndex, match_brackets, tokenize
+
+INDEX_FILE = "search.json"
+
+# Directories indexed whole, and the suffixes indexed at the repo root
+DEFAULT_DIRS = ("src", "social-engagement-hub-main")
+SOURCE_SUFFIXES = (".js", ".jsx", ".mjs", ".ts", ".tsx", ".html", ".css")
+ROOT_SUFFIXES = (".js", ".jsx", ".html")
+SKIP_DIRS = {"node_modules", "build", "dist", ".git", ".patchkit"}
+
+_SCRIPT_RE = re.compile(r"(<script\b[^>]*>)(.*?)</script\s*>", re.IGNORECASE | re.DOTALL)
+_BLOCK_SUFFIXES = {".js", ".jsx", ".mjs", ".ts", ".tsx", ".css"}
+
+
+@dataclass
+class Hit:
+    path: str
+    line: int
+    column: int
+    text: str
+    # Innermost enclosing {...} block, as 1-based lines, and its first line
+    block: tuple[int, int] | None = None
+    block_head: str | None = None
+
+
+def corpus(root: str | Path = ".") -> list[str]:
+    """Repo-relative paths of the files the index covers."""
+    root = Path(root)
+    paths = set()
+    for name in DEFAULT_DIRS:
+        top = root / name
+        if not top.is_dir():
+            continue
+        for dirpath, dirnames, filenames in os.walk(top):
+            dirnames[:] = [d for d in dirnames if d not in SKIP_DIRS]
+            for filename in filenames:
+                if filename.endswith(SOURCE_SUFFIXES + STRAY_SUFFIXES):
+                    paths.add((Path(dirpath) / filename).relative_to(root).as_posix())
+    for entry in root.iterdir():
+        if entry.is_file() and entry.suffix in ROOT_SUFFIXES:
+            paths.add(entry.name)
+    return sorted(paths)
+
+
+def trigrams(text: str) -> set[str]:
+    text = text.lower()
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def block_spans(path: str, text: str) -> list[int]:
+    """Start/end offsets of every {...} block, flattened and ordered by start."""
+    suffix = Path(path).suffix
+    if suffix in STRAY_SUFFIXES:
+        suffix = Path(path[: -len(suffix)]).suffix
+    if suffix in _BLOCK_SUFFIXES:
+        regions = [(0, text)]
+    elif suffix == ".html":
+        regions = [(m.start(2), m.group(2)) for m in _SCRIPT_RE.finditer(text)]
+    else:
+        return []
+    spans = []
+    for base, source in regions:
+        tokens = tokenize(source)
+        for i, j in match_brackets(tokens).items():
+            if tokens[i].value == "{":
+                spans.append((base + tokens[i].start, base + tokens[j].end))
+    spans.sort()
+    return [offset for span in spans for offset in span]
+
+
+def enclosing_block(spans: list[int], start: int, end: int) -> tuple[int, int] | None:
+    """Innermost block (start, end) containing [start, end)."""
+    starts = spans[0::2]
+    k = bisect_right(starts, start) - 1
+    while k >= 0:
+        # Blocks nest, so the nearest one that reaches past `end` is innermost
+        if spans[2 * k + 1] >= end:
+            return spans[2 * k], spans[2 * k + 1]
+        k -= 1
+    return None
+
+
+def _literal_runs(pattern: str) -> list[str]:
+    """Literal substrings every match of a regex must contain (may be empty)."""
+    try:
+        from re import _parser as sre_parse  # Python 3.11+
+    except ImportError:  # pragma: no cover
+        import sre_parse
+    try:
+        parsed = sre_parse.parse(pattern)
+    except re.error:
+        return []
+    runs, current = [], []
+    for op, arg in parsed:
+        if str(op) == "LITERAL":
+            current.append(chr(arg))
+            continue
+        if str(op) == "BRANCH":
+            return []
+        runs.append("".join(current))
+        current = []
+    runs.append("".join(current))
+    return [r for r in runs if len(r) >= 3]
+
+
+class SearchIndex:
+    """Trigram -> file bitmask postings, kept up to date by stamp and hash."""
+
+    def __init__(self, root: str | Path = ".", cache_dir: str | Path | None = None):
+        self.root = Path(root)
+        self.path = Path(cache_dir) / INDEX_FILE if cache_dir is not None else None
+        # Slot i of `files` is bit i of every posting; removed files leave None
+        self.files: list[dict | None] = []
+        # Postings stay hex strings in _raw until used; most queries touch a handful
+        self.postings: dict[str, int] = {}
+        self._raw: dict[str, str] = {}
+        self.dirty = False
+        self._load()
+
+    def _load(self) -> None:
+        if self.path is None:
+            return
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("engine") == ENGINE_VERSION:
+                self.files, self._raw = data["files"], data["postings"]
+        except (OSError, ValueError, KeyError):
+            pass
+
+    def _posting(self, gram: str) -> int:
+        mask = self.postings.get(gram)
+        if mask is None:
+            raw = self._raw.get(gram)
+            mask = int(raw, 16) if raw else 0
+            self.postings[gram] = mask
+        return mask
+
+    def _decode_all(self) -> None:
+        for gram, value in self._raw.items():
+            self.postings.setdefault(gram, int(value, 16))
+        self._raw = {}
+
+    def slot(self, path: str) -> int | None:
+        for i, entry in enumerate(self.files):
+            if entry is not None and entry["path"] == path:
+                return i
+        return None
+
+    def update(self, paths: list[str] | None = None) -> tuple[int, int]:
+        """Bring the index up to date with the files on disk.
+
+        Returns (re-indexed, removed) file counts.
+        """
+        paths = corpus(self.root) if paths is None else paths
+        wanted = set(paths)
+        slots = {entry["path"]: i for i, entry in enumerate(self.files) if entry is not None}
+        changed: list[tuple[int, str]] = []
+        removed: list[int] = []
+
+        for path in paths:
+            full = self.root / path
+            try:
+                st = full.stat()
+            except OSError:
+                wanted.discard(path)
+                continue
+            stamp = [st.st_mtime_ns, st.st_size]
+            i = slots.get(path)
+            entry = self.files[i] if i is not None else None
+            if entry is not None and entry["stamp"] == stamp:
+                continue
+            data = full.read_bytes()
+            digest = hashlib.sha256(data).hexdigest()
+            if entry is not None and entry["sha256"] == digest:
+                entry["stamp"] = stamp
+                self.dirty = True
+                continue
+            text = data.decode("utf-8", errors="replace")
+            if i is None:
+                i = self._free_slot()
+                self.files[i] = {"path": path}
+            self.files[i].update(stamp=stamp, sha256=digest, blocks=block_spans(path, text))
+            changed.append((i, text))
+        for path, i in slots.items():
+            if path not in wanted:
+                self.files[i] = None
+                removed.append(i)
+
+        if not changed and not removed:
+            return 0, 0
+        self._decode_all()
+        keep = ~sum(1 << i for i, _ in changed) & ~sum(1 << i for i in removed)
+        for gram in list(self.postings):
+            mask = self.postings[gram] & keep
+            if mask:
+                self.postings[gram] = mask
+            else:
+                del self.postings[gram]
+        for i, text in changed:
+            bit = 1 << i
+            for gram in trigrams(text):
+                self.postings[gram] = self.postings.get(gram, 0) | bit
+        self.dirty = True
+        return len(changed), len(removed)
+
+    def _free_slot(self) -> int:
+        for i, entry in enumerate(self.files):
+            if entry is None:
+                return i
+        self.files.append(None)
+        return len(self.files) - 1
+
+    def save(self) -> None:
+        if self.path is None or not self.dirty:
+            return
+        self._decode_all()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({
+                "engine": ENGINE_VERSION,
+                "files": self.files,
+                "postings": {gram: format(mask, "x") for gram, mask in self.postings.items()},
+            }, f, separators=(",", ":"))
+        os.replace(tmp, self.path)
+        self.dirty = False
+
+    def candidates(self, needles: list[str]) -> list[str]:
+        """Files that contain every trigram of every needle."""
+        mask = -1
+        for needle in needles:
+            for gram in trigrams(needle):
+                mask &= self._posting(gram)
+                if not mask:
+                    return []
+        return [entry["path"] for i, entry in enumerate(self.files)
+                if entry is not None and (mask == -1 or mask >> i & 1)]
+
+    def search(self, pattern: str, regex: bool = False, ignore_case: bool = False,
+               blocks: bool = True) -> list[Hit]:
+        """Every match of a literal (or regex) pattern, with its enclosing block."""
+        flags = re.IGNORECASE if ignore_case else 0
+        if regex:
+            compiled = re.compile(pattern, flags | re.MULTILINE)
+            needles = _literal_runs(pattern)
+        else:
+            compiled = re.compile(re.escape(pattern), flags)
+            needles = [pattern] if len(pattern) >= 3 else []
+        hits = []
+        for path in self.candidates(needles):
+            text = (self.root / path).read_text(encoding="utf-8", errors="replace")
+            matches = list(compiled.finditer(text))
+            if not matches:
+                continue
+            index = LineIndex(text)
+            spans = self.files[self.slot(path)]["blocks"] if blocks else []
+            for match in matches:
+                line = index.line(match.start())
+                line_start = text.rfind("\n", 0, match.start()) + 1
+                line_end = text.find("\n", match.start())
+                hit = Hit(path, line, match.start() - line_start,
+                          text[line_start:line_end if line_end >= 0 else len(text)].strip())
+                block = enclosing_block(spans, match.start(), match.end()) if spans else None
+                if block is not None:
+                    hit.block = (index.line(block[0]), index.line(block[1] - 1))
+                    head_start = text.rfind("\n", 0, block[0]) + 1
+                    hit.block_head = text[head_start:block[0] + 1].strip()
+                hits.append(hit)
+        return hits
+
+
+def open_index(root: str | Path = ".", cache_dir: str | Path | None = None) -> SearchIndex:
+    """The on-disk index, brought up to date and saved."""
+    index = SearchIndex(root, cache_dir)
+    index.update()
+    index.save()
+    return index
+
+
+def format_hits(hits: list[Hit]) -> str:
+    out = []
+    for hit in hits:
+        out.append(f"{hit.path}:{hit.line}:{hit.column + 1}: {hit.text}")
+        if hit.block is not None:
+            out.append(f"    in {hit.block[0]}-{hit.block[1]}: {hit.block_head}")
+    files = len({hit.path for hit in hits})
+    out.append(f"{len(hits)} match(es) in {files} file(s)")
+    return "\n".join(out)
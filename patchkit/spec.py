@@ -0,0 +1,301 @@
+"""
+Patch spec format and compiler.
+
+A spec is one TOML file describing the edits one script used to make:
+
+    id = "fix-image-wrap"
+    target = "src/App.js"                      # or a glob: "src/**/*.js"
+    description = "Let floated images wrap text."
+
+    [[edit]]
+    anchor = '''if (position === 'left') {'''   # or: regex = '''...'''
+    block = "braces"                           # anchor | line | lines | braces | until
+    replace = '''...'''
+
+    [[post]]
+    contains = "img.style.clear = 'left';"
+
+Edit keys:
+    anchor / regex   what to look for (exactly one of them)
+    block            region the edit covers, starting at the anchor:
+                       anchor  - just the matched text
+                       line    - the whole line(s) the match is on (default)
+                       lines   - `count` lines starting at the anchor line
+                       braces  - up to the line that closes the first brace
+                       until   - up to the first line containing `until`
+    mode             replace (default) | insert_before | insert_after | delete
+    occurrence       first (default) | all
+    min_line, max_line, next_line
+                     guards on the anchor line (1-based line numbers; the line
+                     after the anchor must contain `next_line`)
+    reindent         re-indent `replace` to the anchor line's indentation
+    optional         a missing anchor is reported but does not fail the patch
+
+Instead of edits, a spec can name a token-aware codemod and pass it a
+[params] table (see codemods/).
+
+A .diff, .patch or .rej file in the spec list is read as a unified diff (see
+diffs.py): it becomes one spec per file it updates, named after the diff
+(`name` or, for a diff that updates several files, `name:path`).
+
+Compiled specs are pickled under .patchkit/ keyed by the spec files' stat
+data and the codemod versions, so a run only re-parses TOML when a spec (or
+a codemod it names) changes.
+"""
+
+from __future__ import annotations
+
+import glob
+import hashlib
+import os
+import pickle
+import re
+import tomllib
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from . import ENGINE_VERSION
+from .codemods import CODEMODS
+from .diffs import DIFF_SUFFIXES, DiffError, Hunk, parse_diff
+
+BLOCKS = ("anchor", "line", "lines", "braces", "until")
+MODES = ("replace", "insert_before", "insert_after", "delete")
+OCCURRENCES = ("first", "all")
+
+DEFAULT_SPECS = ("patches/*",)
+SPEC_SUFFIXES = (".toml", ".diff", ".patch")
+DEFAULT_CACHE_DIR = ".patchkit"
+
+_SPEC_KEYS = {"id", "target", "description", "edit", "post", "codemod", "params"}
+_EDIT_KEYS = {
+    "anchor", "regex", "block", "count", "until", "replace", "mode",
+    "occurrence", "min_line", "max_line", "next_line", "reindent", "optional",
+}
+_POST_KEYS = {"contains", "absent"}
+
+
+class SpecError(ValueError):
+    """Raised when a spec file is malformed."""
+
+
+@dataclass
+class Edit:
+    anchor: str | None = None
+    pattern: re.Pattern | None = None
+    block: str = "line"
+    count: int = 1
+    until: str | None = None
+    replace: str = ""
+    mode: str = "replace"
+    occurrence: str = "first"
+    min_line: int | None = None
+    max_line: int | None = None
+    next_line: str | None = None
+    reindent: bool = False
+    optional: bool = False
+
+    def label(self) -> str:
+        """Short, single-line description of the anchor for reports."""
+        source = self.anchor if self.anchor is not None else self.pattern.pattern
+        first = source.strip().splitlines()[0] if source.strip() else source
+        return first if len(first) <= 60 else first[:57] + "..."
+
+
+@dataclass
+class PostCondition:
+    contains: str | None = None
+    absent: str | None = None
+
+
+@dataclass
+class PatchSpec:
+    id: str
+    target: str
+    description: str = ""
+    edits: list[Edit] = field(default_factory=list)
+    post: list[PostCondition] = field(default_factory=list)
+    path: str = ""
+    digest: str = ""
+    codemod: str | None = None
+    params: dict = field(default_factory=dict)
+    hunks: list[Hunk] = field(default_factory=list)
+
+
+def _check_keys(data: dict, allowed: set, where: str) -> None:
+    unknown = set(data) - allowed
+    if unknown:
+        raise SpecError(f"{where}: unknown key(s) {', '.join(sorted(unknown))}")
+
+
+def _compile_edit(data: dict, where: str) -> Edit:
+    _check_keys(data, _EDIT_KEYS, where)
+    if ("anchor" in data) == ("regex" in data):
+        raise SpecError(f"{where}: exactly one of 'anchor' or 'regex' is required")
+
+    edit = Edit(
+        anchor=data.get("anchor"),
+        block=data.get("block", "line"),
+        count=data.get("count", 1),
+        until=data.get("until"),
+        replace=data.get("replace", ""),
+        mode=data.get("mode", "replace"),
+        occurrence=data.get("occurrence", "first"),
+        min_line=data.get("min_line"),
+        max_line=data.get("max_line"),
+        next_line=data.get("next_line"),
+        reindent=data.get("reindent", False),
+        optional=data.get("optional", False),
+    )
+    if "regex" in data:
+        try:
+            edit.pattern = re.compile(data["regex"], re.MULTILINE)
+        except re.error as exc:
+            raise SpecError(f"{where}: bad regex: {exc}") from None
+
+    if edit.block not in BLOCKS:
+        raise SpecError(f"{where}: block must be one of {', '.join(BLOCKS)}")
+    if edit.mode not in MODES:
+        raise SpecError(f"{where}: mode must be one of {', '.join(MODES)}")
+    if edit.occurrence not in OCCURRENCES:
+        raise SpecError(f"{where}: occurrence must be one of {', '.join(OCCURRENCES)}")
+    if edit.block == "until" and not edit.until:
+        raise SpecError(f"{where}: block 'until' needs an 'until' string")
+    if edit.block == "lines" and edit.count < 1:
+        raise SpecError(f"{where}: block 'lines' needs count >= 1")
+    if edit.block == "anchor" and edit.mode != "replace":
+        raise SpecError(f"{where}: block 'anchor' only supports mode 'replace'")
+    if edit.anchor == "":
+        raise SpecError(f"{where}: anchor must not be empty")
+    return edit
+
+
+def compile_spec(data: dict, path: str = "<memory>", digest: str = "") -> PatchSpec:
+    """Validate parsed TOML and turn it into a PatchSpec."""
+    _check_keys(data, _SPEC_KEYS, path)
+    for key in ("id", "target"):
+        if not isinstance(data.get(key), str) or not data[key]:
+            raise SpecError(f"{path}: '{key}' is required")
+
+    edits = [
+        _compile_edit(item, f"{path}: edit {i + 1}")
+        for i, item in enumerate(data.get("edit", []))
+    ]
+    post = []
+    for i, item in enumerate(data.get("post", [])):
+        _check_keys(item, _POST_KEYS, f"{path}: post {i + 1}")
+        post.append(PostCondition(contains=item.get("contains"), absent=item.get("absent")))
+
+    codemod = data.get("codemod")
+    params = data.get("params", {})
+    if codemod is not None:
+        if codemod not in CODEMODS:
+            raise SpecError(f"{path}: unknown codemod {codemod!r} (have: {', '.join(sorted(CODEMODS))})")
+        if edits:
+            raise SpecError(f"{path}: a spec has either [[edit]]s or a codemod, not both")
+        _check_keys(params, CODEMODS[codemod].params, f"{path}: params")
+        # A new codemod version must not reuse outputs of the old one
+        digest = hashlib.sha256(f"{digest}\0{codemod}\0{CODEMODS[codemod].version}".encode()).hexdigest()
+    elif params:
+        raise SpecError(f"{path}: [params] needs a codemod")
+    elif not edits:
+        raise SpecError(f"{path}: a spec needs at least one [[edit]] or a codemod")
+
+    return PatchSpec(
+        id=data["id"],
+        target=data["target"],
+        description=data.get("description", ""),
+        edits=edits,
+        post=post,
+        path=path,
+        digest=digest,
+        codemod=codemod,
+        params=params,
+    )
+
+
+def parse_spec_file(path: str | Path) -> PatchSpec:
+    raw = Path(path).read_bytes()
+    try:
+        data = tomllib.loads(raw.decode("utf-8"))
+    except tomllib.TOMLDecodeError as exc:
+        raise SpecError(f"{path}: {exc}") from None
+    return compile_spec(data, str(path), hashlib.sha256(raw).hexdigest())
+
+
+def parse_diff_spec_file(path: str | Path) -> list[PatchSpec]:
+    """One spec per file a unified diff updates."""
+    raw = Path(path).read_bytes()
+    try:
+        files = parse_diff(raw.decode("utf-8"), str(path))
+    except (DiffError, UnicodeDecodeError) as exc:
+        raise SpecError(str(exc)) from None
+    name = Path(path).stem
+    targets = [f.target for f in files]
+    specs = []
+    for i, diff in enumerate(files):
+        spec_id = name if len(set(targets)) == 1 else f"{name}:{diff.target}"
+        if targets.count(diff.target) > 1:
+            spec_id += f"#{targets[:i + 1].count(diff.target)}"
+        digest = hashlib.sha256(raw + f"\0{i}".encode()).hexdigest()
+        specs.append(PatchSpec(id=spec_id, target=diff.target, description=f"{diff.target} from {path}",
+                               path=str(path), digest=digest, hunks=diff.hunks))
+    return specs
+
+
+def discover(patterns=DEFAULT_SPECS, root: str | Path = ".") -> list[Path]:
+    """Expand spec paths/globs relative to root, keeping the given order."""
+    found: list[Path] = []
+    for pattern in patterns:
+        full = os.path.join(root, pattern)
+        if glob.has_magic(full):
+            matches = sorted(m for m in glob.glob(full) if m.endswith(SPEC_SUFFIXES) and os.path.isfile(m))
+        else:
+            matches = [full]
+        for match in matches:
+            path = Path(match)
+            if path not in found:
+                found.append(path)
+    return found
+
+
+def _cache_key(paths: list[Path]) -> str:
+    h = hashlib.sha256(ENGINE_VERSION.encode())
+    # Codemod versions are folded into compiled digests
+    h.update("".join(f"{c.name}\0{c.version}\n" for c in CODEMODS.values()).encode())
+    for path in paths:
+        st = path.stat()
+        h.update(f"{path}\0{st.st_mtime_ns}\0{st.st_size}\n".encode())
+    return h.hexdigest()[:24]
+
+
+def load_specs(paths, cache_dir: str | Path | None = DEFAULT_CACHE_DIR) -> list[PatchSpec]:
+    """Load specs, using the on-disk compiled cache when it is still valid."""
+    paths = [Path(p) for p in paths]
+    for path in paths:
+        if not path.is_file():
+            raise SpecError(f"{path}: no such spec file")
+
+    cache_file = None
+    if cache_dir is not None:
+        cache_file = Path(cache_dir) / "specs" / f"{_cache_key(paths)}.pickle"
+        try:
+            with open(cache_file, "rb") as f:
+                return pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+            pass
+
+    specs = []
+    for path in paths:
+        if path.suffix in DIFF_SUFFIXES:
+            specs.extend(parse_diff_spec_file(path))
+        else:
+            specs.append(parse_spec_file(path))
+
+    if cache_file is not None:
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp = cache_file.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp, "wb") as f:
+            pickle.dump(specs, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, cache_file)
+
+    return specs
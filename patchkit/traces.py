@@ -0,0 +1,130 @@
+"""
+Aggregate performance measures exported from editor sessions.
+
+Reads any mix of:
+
+* perf-marks exports (window.__perfMarks.export(), see codemods/perfmarks.py):
+  {"session": ..., "measures": [{"name", "start", "duration"}, ...]}
+* Chrome DevTools performance traces ({"traceEvents": [...]} or a bare event
+  list), from which the "perf:<name>" user-timing measures are taken
+
+and reports count, sessions, p50/p95/p99 and max latency per path.
+Percentiles are linearly interpolated between the closest ranks.
+"""
+
+from __future__ import annotations
+
+import json
+from dataclasses import dataclass
+from pathlib import Path
+
+PREFIX = "perf:"
+
+
+@dataclass
+class PathStats:
+    name: str
+    count: int
+    sessions: int
+    p50: float
+    p95: float
+    p99: float
+    max: float
+    mean: float
+
+
+def percentile(values: list[float], q: float) -> float:
+    """q-th percentile (0-100) of already sorted values."""
+    if not values:
+        raise ValueError("no values")
+    rank = (len(values) - 1) * q / 100
+    low = int(rank)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (rank - low)
+
+
+def _from_trace_events(events: list) -> list[tuple[str, float]]:
+    measures = []
+    open_spans: dict[tuple, float] = {}
+    for event in events:
+        if not isinstance(event, dict):
+            continue
+        name = event.get("name", "")
+        if not name.startswith(PREFIX) or "user_timing" not in event.get("cat", ""):
+            continue
+        phase = event.get("ph")
+        if phase == "X":
+            measures.append((name[len(PREFIX):], event.get("dur", 0) / 1000))
+            continue
+        # Async begin/end pairs (microsecond timestamps)
+        span_id = event.get("id") or (event.get("id2") or {}).get("local")
+        key = (name, span_id)
+        if phase == "b":
+            open_spans[key] = event["ts"]
+        elif phase == "e" and key in open_spans:
+            measures.append((name[len(PREFIX):], (event["ts"] - open_spans.pop(key)) / 1000))
+    return measures
+
+
+def load_measures(path: str | Path) -> tuple[str, list[tuple[str, float]]]:
+    """(session id, [(path name, duration ms)]) from one exported file."""
+    path = Path(path)
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    if isinstance(data, dict) and "measures" in data:
+        session = str(data.get("session") or path.stem)
+        return session, [(m["name"], float(m["duration"])) for m in data["measures"]]
+    events = data.get("traceEvents", []) if isinstance(data, dict) else data
+    if not isinstance(events, list):
+        raise ValueError(f"{path}: neither a perf-marks export nor a trace")
+    return path.stem, _from_trace_events(events)
+
+
+def expand(paths) -> list[Path]:
+    """Files as given; directories contribute their *.json files."""
+    found = []
+    for item in map(Path, paths):
+        found.extend(sorted(item.glob("*.json")) if item.is_dir() else [item])
+    return found
+
+
+def aggregate(paths) -> tuple[list[PathStats], list[str]]:
+    """Stats per path over all files, plus messages for unreadable files."""
+    durations: dict[str, list[float]] = {}
+    sessions: dict[str, set[str]] = {}
+    errors = []
+    for path in expand(paths):
+        try:
+            session, measures = load_measures(path)
+        except (OSError, ValueError, KeyError, TypeError) as exc:
+            errors.append(f"✗ {path}: {exc}")
+            continue
+        for name, duration in measures:
+            durations.setdefault(name, []).append(duration)
+            sessions.setdefault(name, set()).add(session)
+
+    stats = []
+    for name, values in sorted(durations.items()):
+        values.sort()
+        stats.append(PathStats(
+            name=name,
+            count=len(values),
+            sessions=len(sessions[name]),
+            p50=percentile(values, 50),
+            p95=percentile(values, 95),
+            p99=percentile(values, 99),
+            max=values[-1],
+            mean=sum(values) / len(values),
+        ))
+    return stats, errors
+
+
+def format_stats(stats: list[PathStats]) -> str:
+    width = max([len(s.name) for s in stats] + [4])
+    out = [f"{'path':<{width}}  {'count':>7}  {'sessions':>8}  {'p50':>9}  {'p95':>9}  {'p99':>9}  {'max':>9}"]
+    for s in stats:
+        out.append(
+            f"{s.name:<{width}}  {s.count:>7}  {s.sessions:>8}  "
+            f"{s.p50:>7.2f}ms  {s.p95:>7.2f}ms  {s.p99:>7.2f}ms  {s.max:>7.2f}ms"
+        )
+    return "\n".join(out)
@@ -0,0 +1,174 @@
+"""
+Check that patched files still parse.
+
+Every output is checked twice:
+
+* escaped operators: `&amp;&amp;`, `=&gt;` and friends in code (not in
+  strings or comments) - the HTML-escaped snippets that fix_image_click_v2.py
+  and add_persistence.py inject. This is plain Python and always runs.
+* a real parse by parse_worker.js under node, using esbuild, @babel/parser or
+  acorn-jsx from the repo's node_modules (node's own parser for plain JS when
+  none is installed; JSX files are then reported as skipped).
+
+The node worker is started once and kept warm: files are sent to it in
+batches over stdin, so checking twenty files costs one node start-up. It is
+started lazily, so runs that change nothing never start it. Without node on
+the PATH only the escaped-operator check runs.
+"""
+
+from __future__ import annotations
+
+import json
+import re
+import shutil
+import subprocess
+from bisect import bisect_right
+from dataclasses import dataclass
+from pathlib import Path
+
+from .jstokens import COMMENT, STRING, TEMPLATE, LineIndex, tokenize
+
+WORKER = Path(__file__).with_name("parse_worker.js")
+
+# HTML-escaped JS operators; a lone &amp; can be legitimate JSX text
+_ESCAPED_RE = re.compile(r"&amp;&amp;|\|\|&amp;|=&gt;|&lt;=|&gt;=|&lt;&lt;|&gt;&gt;|&amp;=")
+
+CHECKED_SUFFIXES = {".js", ".jsx", ".mjs", ".ts", ".tsx", ".json"}
+
+
+@dataclass
+class SyntaxIssue:
+    path: str
+    message: str
+    line: int | None = None
+    column: int | None = None
+
+    def __str__(self) -> str:
+        where = self.path
+        if self.line:
+            where += f":{self.line}"
+            if self.column is not None:
+                where += f":{self.column + 1}"
+        return f"{where}: {self.message}"
+
+
+@dataclass
+class FileCheck:
+    path: str
+    issues: list[SyntaxIssue]
+    parser: str
+    skipped: str | None = None
+
+    @property
+    def ok(self) -> bool:
+        return not self.issues
+
+
+def escaped_operators(path: str, text: str) -> list[SyntaxIssue]:
+    """HTML-escaped operators outside strings and comments."""
+    matches = list(_ESCAPED_RE.finditer(text))
+    if not matches:
+        return []
+    literals = [t for t in tokenize(text, comments=True) if t.kind in (STRING, TEMPLATE, COMMENT)]
+    starts = [t.start for t in literals]
+    index = LineIndex(text)
+    issues = []
+    for match in matches:
+        k = bisect_right(starts, match.start()) - 1
+        if k >= 0 and literals[k].start <= match.start() < literals[k].end:
+            continue
+        line = index.line(match.start())
+        column = match.start() - (text.rfind("\n", 0, match.start()) + 1)
+        issues.append(SyntaxIssue(path, f"HTML-escaped operator {match.group()!r} in code", line, column))
+    return issues
+
+
+class ParserWorker:
+    """A warm `node parse_worker.js` process that checks files in batches."""
+
+    def __init__(self, root: str | Path = ".", node: str | None = None):
+        self.root = str(Path(root).resolve())
+        self.node = node or shutil.which("node")
+        self.process: subprocess.Popen | None = None
+        self.parser: str | None = None
+        self._next_id = 0
+
+    @property
+    def available(self) -> bool:
+        return self.node is not None
+
+    def _start(self) -> None:
+        self.process = subprocess.Popen(
+            [self.node, "--no-warnings", str(WORKER), self.root],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+            encoding="utf-8",
+        )
+
+    def check(self, files: list[tuple[str, str]]) -> list[dict]:
+        """Parse (path, source) pairs in one round trip; one result dict per file."""
+        if not files:
+            return []
+        if self.process is None or self.process.poll() is not None:
+            self._start()
+        self._next_id += 1
+        request = {"id": self._next_id, "files": [{"path": p, "source": s} for p, s in files]}
+        try:
+            self.process.stdin.write(json.dumps(request) + "\n")
+            self.process.stdin.flush()
+            line = self.process.stdout.readline()
+        except (BrokenPipeError, OSError) as exc:
+            raise RuntimeError(f"parser worker failed: {exc}") from None
+        if not line:
+            raise RuntimeError("parser worker exited")
+        response = json.loads(line)
+        if response.get("id") != self._next_id:
+            raise RuntimeError(f"parser worker: {response.get('error', 'out-of-order response')}")
+        self.parser = response["parser"]
+        return response["results"]
+
+    def close(self) -> None:
+        if self.process is not None:
+            self.process.stdin.close()
+            self.process.wait(timeout=10)
+            self.process = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class Validator:
+    """Checks batches of outputs; the node worker is shared by all batches."""
+
+    def __init__(self, root: str | Path = ".", node: str | None = None):
+        self.worker = ParserWorker(root, node)
+
+    def check(self, files: list[tuple[str, str]]) -> dict[str, FileCheck]:
+        files = [(p, s) for p, s in files if Path(p).suffix in CHECKED_SUFFIXES]
+        checks = {p: FileCheck(p, escaped_operators(p, s), "escapes") for p, s in files}
+        if not self.worker.available or not files:
+            return checks
+        for result in self.worker.check(files):
+            check = checks[result["path"]]
+            check.parser = self.worker.parser
+            check.skipped = result.get("skipped")
+            if not result["ok"]:
+                issue = SyntaxIssue(result["path"], result.get("message", "syntax error"),
+                                    result.get("line"), result.get("column"))
+                # A parse error on the escaped operator already reported adds nothing
+                if not any(i.line == issue.line for i in check.issues):
+                    check.issues.append(issue)
+        return checks
+
+    def close(self) -> None:
+        self.worker.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,159 @@
+
+/**
+ * Client-side image downscaling before upload.
+ *
+ * Phone photos are 5-10 MB at 4000px+ wide, far more than a post ever shows.
+ * downscaleImage() resizes an image to a maximum width and re-encodes it as
+ * WebP (JPEG where the browser cannot encode WebP) before it is uploaded and
+ * inserted into the editor. The work runs in a worker when the browser has
+ * OffscreenCanvas, otherwise on a canvas on the main thread.
+ */
+
+export const DOWNSCALE_DEFAULTS = {
+  maxWidth: 1920,
+  quality: 0.82,
+  type: 'image/webp',
+  // Files smaller than this are uploaded as they are
+  minBytes: 300 * 1024
+};
+
+// Animated GIFs and vector images would lose what makes them what they are
+const SKIP_TYPES = ['image/gif', 'image/svg+xml'];
+
+let worker = null;
+let workerUnavailable = false;
+let nextJobId = 0;
+const pendingJobs = new Map();
+
+const failPendingJobs = (message) => {
+  pendingJobs.forEach(({ reject }) => reject(new Error(message)));
+  pendingJobs.clear();
+};
+
+const getWorker = () => {
+  if (worker || workerUnavailable) return worker;
+  if (typeof Worker === 'undefined' || typeof OffscreenCanvas === 'undefined' ||
+      typeof createImageBitmap === 'undefined') {
+    workerUnavailable = true;
+    return null;
+  }
+  try {
+    worker = new Worker(new URL('./imageDownscale.worker.js', import.meta.url));
+    worker.onmessage = ({ data }) => {
+      const job = pendingJobs.get(data.id);
+      if (!job) return;
+      pendingJobs.delete(data.id);
+      if (data.error) {
+        job.reject(new Error(data.error));
+      } else {
+        job.resolve(data);
+      }
+    };
+    worker.onerror = (event) => {
+      // A worker that cannot start (CSP, old browser) is not tried again
+      event.preventDefault();
+      worker.terminate();
+      worker = null;
+      workerUnavailable = true;
+      failPendingJobs(event.message || 'Image worker failed');
+    };
+  } catch (error) {
+    workerUnavailable = true;
+    worker = null;
+  }
+  return worker;
+};
+
+const resizeInWorker = (file, options) => new Promise((resolve, reject) => {
+  const id = ++nextJobId;
+  pendingJobs.set(id, { resolve, reject });
+  getWorker().postMessage({ id, file, ...options });
+});
+
+const loadImage = (file) => new Promise((resolve, reject) => {
+  const url = URL.createObjectURL(file);
+  const img = new Image();
+  img.onload = () => {
+    URL.revokeObjectURL(url);
+    resolve(img);
+  };
+  img.onerror = () => {
+    URL.revokeObjectURL(url);
+    reject(new Error(`Could not decode ${file.name}`));
+  };
+  img.src = url;
+});
+
+const canvasToBlob = (canvas, type, quality) =>
+  new Promise(resolve => canvas.toBlob(resolve, type, quality));
+
+const resizeOnMainThread = async (file, { maxWidth, type, quality }) => {
+  const img = await loadImage(file);
+  const scale = Math.min(1, maxWidth / img.naturalWidth);
+  const width = Math.round(img.naturalWidth * scale);
+  const height = Math.round(img.naturalHeight * scale);
+  const canvas = document.createElement('canvas');
+  canvas.width = width;
+  canvas.height = height;
+  const context = canvas.getContext('2d');
+  if (type === 'image/jpeg') {
+    context.fillStyle = '#fff';
+    context.fillRect(0, 0, width, height);
+  }
+  context.drawImage(img, 0, 0, width, height);
+  let blob = await canvasToBlob(canvas, type, quality);
+  if (blob && blob.type !== type && type !== 'image/jpeg') {
+    blob = await canvasToBlob(canvas, 'image/jpeg', quality);
+  }
+  if (!blob) throw new Error(`Could not encode ${file.name}`);
+  return { blob, width, height };
+};
+
+const extensionFor = (type) => (type === 'image/webp' ? 'webp' : 'jpg');
+
+/**
+ * Downscale and re-encode an image file before upload.
+ *
+ * Resolves to a new File, or to the original file when it is not a raster
+ * image, is smaller than minBytes, or would not get any smaller. Never rejects:
+ * on any failure the original file is uploaded as before.
+ *
+ * @param {File} file - Image picked by the user
+ * @param {{maxWidth?: number, quality?: number, type?: string, minBytes?: number}} [options]
+ * @returns {Promise<File>}
+ */
+export const downscaleImage = async (file, options = {}) => {
+  const settings = { ...DOWNSCALE_DEFAULTS, ...options };
+  if (!file || !file.type || !file.type.startsWith('image/') || SKIP_TYPES.includes(file.type) ||
+      file.size < settings.minBytes) {
+    return file;
+  }
+
+  try {
+    const { maxWidth, quality, type } = settings;
+    let result;
+    if (getWorker()) {
+      try {
+        result = await resizeInWorker(file, { maxWidth, quality, type });
+      } catch (error) {
+        console.warn('Image worker failed, resizing on the main thread:', error);
+      }
+    }
+    if (!result) {
+      result = await resizeOnMainThread(file, { maxWidth, quality, type });
+    }
+
+    const { blob, width } = result;
+    if (blob.size >= file.size) {
+      return file;
+    }
+    const name = file.name.replace(/\.[^.]+$/, '') + '.' + extensionFor(blob.type);
+    console.log(`Downscaled ${file.name}: ${file.size} -> ${blob.size} bytes (${width}px wide)`);
+    return new File([blob], name, { type: blob.type, lastModified: file.lastModified });
+  } catch (error) {
+    console.warn(`Could not downscale ${file.name}, uploading the original:`, error);
+    return file;
+  }
+};
+
+export default downscaleImage;
@@ -0,0 +1,34 @@
+/* eslint-disable no-restricted-globals */
+// Downscales and re-encodes one image off the main thread (see imageDownscale.js)
+
+const encode = async (canvas, type, quality) => {
+  let blob = await canvas.convertToBlob({ type, quality });
+  // Browsers without an encoder for `type` silently return PNG
+  if (blob.type !== type && type !== 'image/jpeg') {
+    blob = await canvas.convertToBlob({ type: 'image/jpeg', quality });
+  }
+  return blob;
+};
+
+self.onmessage = async (event) => {
+  const { id, file, maxWidth, type, quality } = event.data;
+  try {
+    const bitmap = await createImageBitmap(file, { imageOrientation: 'from-image' });
+    const scale = Math.min(1, maxWidth / bitmap.width);
+    const width = Math.round(bitmap.width * scale);
+    const height = Math.round(bitmap.height * scale);
+    const canvas = new OffscreenCanvas(width, height);
+    const context = canvas.getContext('2d');
+    if (type === 'image/jpeg') {
+      // JPEG has no alpha; keep transparent areas white instead of black
+      context.fillStyle = '#fff';
+      context.fillRect(0, 0, width, height);
+    }
+    context.drawImage(bitmap, 0, 0, width, height);
+    bitmap.close();
+    const blob = await encode(canvas, type, quality);
+    self.postMessage({ id, blob, width, height });
+  } catch (error) {
+    self.postMessage({ id, error: error.message || String(error) });
+  }
+};
@@ -0,0 +1,76 @@
+
+/**
+ * Responsive image attributes for post content.
+ *
+ * Images in posts are lazy-loaded, decoded off the main thread and, when they
+ * are hosted on Cloudinary, get a srcset of resized variants so a phone does
+ * not download the original upload.
+ */
+
+// Widths (px) of the Cloudinary variants offered in srcset
+export const RESPONSIVE_WIDTHS = [320, 640, 960, 1280, 1920];
+
+// Post content is at most ~800px wide (see .post-content)
+export const IMAGE_SIZES = '(max-width: 800px) 100vw, 800px';
+
+const CLOUDINARY_UPLOAD = /^(https?:\/\/res\.cloudinary\.com\/[^/]+\/image\/upload\/)(.+)$/;
+// A first path segment like "w_300,c_fill" is an existing transformation
+const TRANSFORMATION = /^[a-z]{1,3}_[^/]*\//;
+
+/**
+ * Cloudinary URL of an image resized to (at most) the given width.
+ * Returns null for URLs that are not plain Cloudinary uploads.
+ *
+ * @example
+ * cloudinaryUrl('https://res.cloudinary.com/demo/image/upload/v1/blog/a.jpg', 640)
+ * // "https://res.cloudinary.com/demo/image/upload/w_640,c_limit,f_auto,q_auto/v1/blog/a.jpg"
+ */
+export const cloudinaryUrl = (url, width) => {
+  const match = CLOUDINARY_UPLOAD.exec(url || '');
+  if (!match || TRANSFORMATION.test(match[2])) return null;
+  return `${match[1]}w_${width},c_limit,f_auto,q_auto/${match[2]}`;
+};
+
+/**
+ * srcset for a Cloudinary image, or '' for other URLs.
+ *
+ * @param {string} url - Original image URL
+ * @param {number} [maxWidth] - Intrinsic width, when known; no variant is wider
+ */
+export const cloudinarySrcset = (url, maxWidth) => {
+  if (!cloudinaryUrl(url, RESPONSIVE_WIDTHS[0])) return '';
+  let widths = RESPONSIVE_WIDTHS;
+  if (maxWidth > 0) {
+    widths = widths.filter(w => w < maxWidth);
+    widths.push(Math.round(maxWidth));
+  }
+  return widths.map(w => `${cloudinaryUrl(url, w)} ${w}w`).join(', ');
+};
+
+/**
+ * Add loading, decoding, dimensions and srcset to an <img> element.
+ * Attributes that are already set are left alone.
+ *
+ * @param {HTMLImageElement} img
+ * @param {{width?: number, height?: number}} [dimensions] - Intrinsic size, e.g. from the upload
+ */
+export const makeImageResponsive = (img, dimensions = {}) => {
+  if (!img.hasAttribute('loading')) img.setAttribute('loading', 'lazy');
+  if (!img.hasAttribute('decoding')) img.setAttribute('decoding', 'async');
+
+  const { width, height } = dimensions;
+  if (width > 0 && height > 0 && !img.hasAttribute('width') && !img.hasAttribute('height')) {
+    img.setAttribute('width', Math.round(width));
+    img.setAttribute('height', Math.round(height));
+  }
+
+  if (!img.hasAttribute('srcset')) {
+    const intrinsic = width > 0 ? width : Number(img.getAttribute('width')) || undefined;
+    const srcset = cloudinarySrcset(img.getAttribute('src'), intrinsic);
+    if (srcset) {
+      img.setAttribute('srcset', srcset);
+      img.setAttribute('sizes', IMAGE_SIZES);
+    }
+  }
+  return img;
+};
@@ -1,4 +1,5 @@
 import createDOMPurify from 'dompurify';
+import { makeImageResponsive } from './responsiveImages';
 
 const DOMPurify = createDOMPurify(window);
 
@@ -11,9 +12,17 @@ DOMPurify.addHook('uponSanitizeAttribute', (node, data) => {
   }
 });
 
+// Posts saved before inserted images were made responsive get the same
+// attributes when they are rendered
+DOMPurify.addHook('afterSanitizeAttributes', (node) => {
+  if (node.nodeName?.toLowerCase() === 'img') {
+    makeImageResponsive(node);
+  }
+});
+
 const config = {
   ADD_TAGS: ['iframe'],
-  ADD_ATTR: ['src', 'allow', 'allowfullscreen', 'frameborder', 'class', 'data-position', 'data-size', 'data-media-type', 'width', 'height', 'loading'],
+  ADD_ATTR: ['src', 'allow', 'allowfullscreen', 'frameborder', 'class', 'data-position', 'data-size', 'data-media-type', 'width', 'height', 'loading', 'decoding', 'srcset', 'sizes'],
   FORBID_TAGS: ['script']
 };
 
@@ -0,0 +1,16 @@
+import shutil
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+
+@pytest.fixture
+def node():
+    path = shutil.which("node")
+    if path is None:
+        pytest.skip("node is not on the PATH")
+    return path
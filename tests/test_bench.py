@@ -0,0 +1,61 @@
+import subprocess
+from pathlib import Path
+
+import pytest
+
+from patchkit.bench import FIXTURES, Locate, extract, fixture_code
+from test_spec_stack import FAKE_DOM, stack_output
+
+APP = """\
+import { sanitize } from './utils';
+
+const LIMIT = 3;
+
+function clamp(value) {
+  return Math.min(value, LIMIT);
+}
+
+const App = () => {
+  const [content, setContent] = useState('');
+  const size = (n) => clamp(n) * 2;
+  const render = (n) => {
+    setContent(String(size(n)));
+    return { size: size(n) };
+  };
+  const save = () => sanitize(content);
+  const preview = () => content.length;
+  return null;
+};
+"""
+
+
+def test_extract_brings_helpers_from_enclosing_scopes():
+    functions = extract(APP, [Locate("render", name="render")])
+    assert list(functions) == ["LIMIT", "clamp", "size", "render"]
+    assert functions["LIMIT"] == "3"
+    assert functions["clamp"].startswith("function clamp(value)")
+    assert functions["size"] == "(n) => clamp(n) * 2"
+
+
+@pytest.mark.parametrize("name, unresolved", [("save", "sanitize (in save), content (in save)"),
+                                              ("preview", "content (in preview)")])
+def test_extract_names_what_it_cannot_bring(name, unresolved):
+    with pytest.raises(ValueError) as error:
+        extract(APP, [Locate(name, name=name)])
+    assert str(error.value) == f"unresolved identifier(s): {unresolved}"
+    assert extract(APP, [Locate(name, name=name)], provided={"content", "sanitize"}) is not None
+
+
+def test_select_image_fixture_runs_against_the_pooled_overlay(node, tmp_path: Path):
+    # Not jsdom (the worker's DOM is not installed here): the same fake DOM as
+    # the spec stack test, enough to catch a snippet that cannot run at all
+    fixture = FIXTURES["select-image"]
+    functions = extract(stack_output(), fixture.functions, set(fixture.stubs))
+    script = tmp_path / "fixture.js"
+    script.write_text(FAKE_DOM + f"const fixture = {fixture_code(fixture, functions)};\n"
+                      "fixture.op(); fixture.op(); fixture.teardown();\n"
+                      "process.stdout.write(String(images['img-1'].classList.contains('selected-image')));\n",
+                      encoding="utf-8")
+    proc = subprocess.run([node, str(script)], capture_output=True, text=True)
+    assert proc.returncode == 0, proc.stderr
+    assert proc.stdout == "true"
@@ -0,0 +1,87 @@
+from pathlib import Path
+
+from patchkit import bytecost, incremental
+from patchkit.bytecost import MIN_LIMIT, Budget, PatchCost, Sizer, check, load_budget, write_budget
+from patchkit.cache import OutputCache
+from patchkit.runner import run
+from patchkit.spec import compile_spec
+
+TEXT = "const a = 1;\nconst b = 2;\n"
+
+
+def grow(spec_id: str, lines: int):
+    return compile_spec({"id": spec_id, "target": "src/App.js", "edit": [{
+        "anchor": "const b = 2;", "mode": "insert_after",
+        "replace": "\n".join(f"const x{i} = {i * 7919};" for i in range(lines)),
+    }]})
+
+
+def make_target(root: Path) -> None:
+    (root / "src").mkdir()
+    (root / "src/App.js").write_text(TEXT, encoding="utf-8")
+
+
+def test_budget_check_reports_each_patch_and_the_total():
+    costs = [PatchCost("a", ["src/App.js"], 300, 100), PatchCost("b", ["src/App.js"], 50, 20, None)]
+    budget = Budget("b.toml", {"gzip": 110}, {"a": {"raw": 200, "brotli": 10}, "b": {"raw": 60}})
+    assert check(costs, budget) == [
+        ("a", "a adds 300 raw bytes, budget 200"),
+        (None, "all patches add 120 gzip bytes, budget 110"),
+    ]
+
+
+def test_written_budget_floors_shrinking_patches_and_keeps_the_header(tmp_path: Path):
+    path = tmp_path / "patch-budget.toml"
+    path.write_text("# Ours\n\n[patch.kept]\nraw = 5\n", encoding="utf-8")
+    costs = [PatchCost("kept", [], 900, 900), PatchCost("grows", [], 1000, 300, 250),
+             PatchCost("shrinks", [], -400, -90, None), PatchCost("same", [], 0, 0, None)]
+
+    assert write_budget(path, costs, 0.1) == ["grows", "shrinks", "same"]
+    budget = load_budget(path)
+    assert budget.patches["kept"] == {"raw": 5}
+    assert budget.patches["grows"] == {"raw": 1100, "gzip": 330, "brotli": 275}
+    assert budget.patches["shrinks"] == budget.patches["same"] == {"raw": MIN_LIMIT, "gzip": MIN_LIMIT}
+    # Shrinking patches add nothing to the total
+    assert budget.total == {"raw": 2090, "gzip": 1320}
+    assert path.read_text(encoding="utf-8").startswith("# Ours\n\n[total]\n")
+
+
+def test_node_brotli_is_asked_for_and_cached_by_content(tmp_path: Path, monkeypatch):
+    monkeypatch.setattr(bytecost, "_brotli", None)
+    calls = []
+
+    def node_brotli(blobs):
+        calls.append(len(blobs))
+        return [len(blob) // 2 for blob in blobs]
+
+    monkeypatch.setattr(bytecost, "_node_brotli", node_brotli)
+    assert Sizer(brotli=False, cache_dir=tmp_path).measure([b"abcd"])[0][2] is None
+    assert calls == []
+
+    sizer = Sizer(cache_dir=tmp_path)
+    assert [size[2] for size in sizer.measure([b"abcd", b"abcdef", b"abcd"])] == [2, 3, 2]
+    sizer.save()
+    assert Sizer(cache_dir=tmp_path).measure([b"abcdef"])[0][2] == 3
+    assert calls == [2]
+
+
+def test_run_measures_the_texts_it_produced(tmp_path: Path, monkeypatch):
+    make_target(tmp_path)
+    monkeypatch.setattr(bytecost, "_brotli", None)
+    specs = [grow("small", 2), grow("big", 40)]
+    budget = Budget("b.toml", patches={"big": {"raw": 200}})
+    cache = OutputCache(tmp_path / "outputs")
+
+    report, = run(specs, tmp_path, dry_run=True, cache=cache, validate=False, budget=budget)
+    assert [(c.patch, c.brotli) for c in report.costs] == [("small", None), ("big", None)]
+    assert report.costs[0].raw == len("const x0 = 0;\nconst x1 = 7919;\n")
+    assert report.error == f"over byte budget (b.toml): big adds {report.costs[1].raw} raw bytes, budget 200"
+
+    # A cached output carries its costs: nothing is applied again
+    def unexpected(*args, **kwargs):
+        raise AssertionError("re-applied")
+
+    monkeypatch.setattr(incremental, "apply_patch", unexpected)
+    monkeypatch.setattr(bytecost, "apply_patch", unexpected)
+    again, = run(specs, tmp_path, dry_run=True, cache=cache, validate=False, budget=budget)
+    assert again.cached and again.costs == report.costs
@@ -0,0 +1,55 @@
+import os
+from pathlib import Path
+
+from patchkit.cache import OutputCache, cache_key
+from patchkit.spec import compile_spec
+
+
+def spec(spec_id: str, digest: str = "1"):
+    # The digest is the spec file's hash
+    return compile_spec({"id": spec_id, "target": "src/App.js", "edit": [{"anchor": "return img;"}]},
+                        digest=digest)
+
+
+def test_key_covers_the_input_and_the_specs_in_order():
+    a, b = spec("a"), spec("b")
+    key = cache_key(b"text", [a, b])
+    assert key == cache_key(b"text", [spec("a"), spec("b")])
+    assert len({key, cache_key(b"other", [a, b]), cache_key(b"text", [b, a]),
+                cache_key(b"text", [a, spec("b", "2")])}) == 4
+
+
+def test_hit_returns_the_output_and_report(tmp_path: Path):
+    cache = OutputCache(tmp_path)
+    assert cache.get("ab" * 32) is None
+    cache.put("ab" * 32, b"patched", {"changed": True})
+    path, report = cache.get("ab" * 32)
+    assert path.read_bytes() == b"patched" and report == {"changed": True}
+    # Entries are immutable: a second put does not replace the first
+    cache.put("ab" * 32, b"other", {})
+    assert cache.get("ab" * 32)[0].read_bytes() == b"patched"
+
+
+def test_eviction_drops_the_least_recently_used(tmp_path: Path):
+    cache = OutputCache(tmp_path, max_bytes=10 ** 9)
+    keys = [f"{i:02d}" * 32 for i in range(3)]
+    for age, key in enumerate(keys):
+        cache.put(key, b"x" * 100, {})
+        os.utime(cache._entry(key), (1000 + age, 1000 + age))
+    # A hit makes the oldest entry the most recent
+    cache.get(keys[0])
+    _, size = cache.stats()
+
+    freed = cache.evict(max_bytes=size - 1)
+    assert freed == size // 3
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) is not None and cache.get(keys[2]) is not None
+
+
+def test_put_evicts_past_the_cap(tmp_path: Path):
+    cache = OutputCache(tmp_path, max_bytes=250)
+    for i in range(4):
+        cache.put(f"{i:02d}" * 32, b"x" * 100, {})
+    count, size = cache.stats()
+    assert size <= 250 and count == 2
+    assert cache.get("03" * 32) is not None
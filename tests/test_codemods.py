@@ -0,0 +1,246 @@
+import pytest
+
+from patchkit.codemods import CODEMODS, CodemodError
+
+
+def run(name: str, text: str, params: dict) -> str:
+    output, _ = CODEMODS[name].func(text, params)
+    # Codemods leave their own output alone
+    assert CODEMODS[name].func(output, params)[0] == output
+    return output
+
+
+# -- inline-styles ------------------------------------------------------------
+
+SELECTED = {"class": "editor-image-selected",
+            "declarations": "border: 2px solid #4285f4; box-shadow: 0 0 0 2px rgba(66, 133, 244, 0.25);"}
+POSITIONS = [
+    {"class": "position-left", "declarations": "float: left; margin: 0 15px 15px 0;", "group": "position"},
+    {"class": "position-right", "declarations": "float: right; margin: 0 0 15px 15px;", "group": "position"},
+]
+
+
+def test_inline_styles_property_run_becomes_class_add():
+    text = ("img.style.border = '2px solid #4285f4';\n"
+            "img.style.boxShadow = '0 0 0 2px rgba(66, 133, 244, 0.25)';\n")
+    assert run("inline-styles", text, {"rule": [SELECTED]}) == "img.classList.add('editor-image-selected');\n"
+
+
+def test_inline_styles_member_receiver():
+    text = ("overlay.img.style.border = '2px solid #4285f4';\n"
+            "overlay.img.style.boxShadow = '0 0 0 2px rgba(66, 133, 244, 0.25)';\n")
+    assert run("inline-styles", text, {"rule": [SELECTED]}) == "overlay.img.classList.add('editor-image-selected');\n"
+
+
+def test_inline_styles_reset_values_remove_the_class_they_undo():
+    text = ("if (overlay.img) {\n"
+            "  overlay.img.style.border = '2px solid transparent';\n"
+            "  overlay.img.style.boxShadow = 'none';\n"
+            "}\n")
+    assert run("inline-styles", text, {"rule": [SELECTED]}) == (
+        "if (overlay.img) {\n"
+        "  overlay.img.classList.remove('editor-image-selected');\n"
+        "}\n"
+    )
+
+
+def test_inline_styles_explicit_reset_rule():
+    reset = {"class": "editor-image-selected", "declarations": "border: 2px solid transparent; box-shadow: none;",
+             "reset": True}
+    text = "el.style.border = '2px solid transparent';\nel.style.boxShadow = 'none';\n"
+    assert run("inline-styles", text, {"rule": [SELECTED, reset]}) == (
+        "el.classList.remove('editor-image-selected');\n"
+    )
+
+
+def test_inline_styles_ambiguous_reset_is_left_alone():
+    # float: none undoes both position classes; neither can be picked
+    text = "img.style.float = 'none';\n"
+    assert run("inline-styles", text, {"rule": POSITIONS}) == text
+
+
+def test_inline_styles_group_removes_the_other_classes():
+    text = "img.style.float = 'left';\nimg.style.margin = '0 15px 15px 0';\n"
+    assert run("inline-styles", text, {"rule": POSITIONS}) == (
+        "img.classList.remove('position-right');\nimg.classList.add('position-left');\n"
+    )
+
+
+def test_inline_styles_unmatched_and_dynamic_writes_stay():
+    text = ("img.style.border = '1px dashed red';\n"
+            "img.style.width = `${width}px`;\n"
+            "e.currentTarget.style.boxShadow = '0 4px 12px rgba(0, 0, 0, 0.15)';\n")
+    assert run("inline-styles", text, {"rule": [SELECTED]}) == text
+
+
+def test_inline_styles_css_text_keeps_dynamic_declarations():
+    rule = {"class": "image-handle", "declarations": "position: fixed; width: 12px;"}
+    text = "handle.style.cssText = `position: fixed; width: 12px; top: ${y}px;`;\n"
+    assert run("inline-styles", text, {"rule": [rule]}) == (
+        "handle.classList.add('image-handle');\nhandle.style.cssText = `top: ${y}px;`;\n"
+    )
+
+
+def test_inline_styles_style_attribute_in_html_string():
+    rule = {"class": "image-toolbar-sep", "declarations": "color: #666; margin: 0 8px;"}
+    text = "toolbar.innerHTML = `<span style=\"color: #666; margin: 0 8px;\">|</span>`;\n"
+    assert run("inline-styles", text, {"rule": [rule]}) == (
+        "toolbar.innerHTML = `<span class=\"image-toolbar-sep\">|</span>`;\n"
+    )
+
+
+def test_inline_styles_needs_rules():
+    with pytest.raises(CodemodError):
+        CODEMODS["inline-styles"].func("x = 1;\n", {"rule": []})
+
+
+# -- downscale-uploads --------------------------------------------------------
+
+UPLOAD = """\
+import React from 'react';
+
+const upload = async (file) => {
+  const result = await uploadImageToCloudinary(file, 'posts');
+  uploadImageToCloudinary(file);
+  return result;
+};
+"""
+
+
+def test_downscale_wraps_awaited_uploads_only():
+    output = run("downscale-uploads", UPLOAD, {"calls": ["uploadImageToCloudinary"], "max_width": 800,
+                                               "quality": 0.7, "module": "./utils/imageDownscale"})
+    assert output == UPLOAD.replace(
+        "import React from 'react';\n",
+        "import React from 'react';\nimport { downscaleImage } from './utils/imageDownscale';\n",
+    ).replace("await uploadImageToCloudinary(file, 'posts')",
+              "await uploadImageToCloudinary(await downscaleImage(file, { maxWidth: 800, quality: 0.7 }), 'posts')")
+
+
+def test_downscale_without_uploads_is_a_no_op():
+    text = "const x = 1;\n"
+    assert run("downscale-uploads", text, {"calls": ["uploadImageToCloudinary"]}) == text
+
+
+@pytest.mark.parametrize("params", [{"calls": "upload"}, {"max_width": 0}, {"quality": 2}])
+def test_downscale_rejects_bad_params(params):
+    with pytest.raises(CodemodError):
+        CODEMODS["downscale-uploads"].func(UPLOAD, params)
+
+
+# -- responsive-images --------------------------------------------------------
+
+INSERT = """\
+import React from 'react';
+
+const insertImage = (image) => {
+  const img = document.createElement('img');
+  img.src = image.src;
+  editor.appendChild(img);
+};
+"""
+
+
+def test_responsive_images_after_src_is_set():
+    output = run("responsive-images", INSERT, {"functions": ["insertImage"], "module": "./utils/responsiveImages"})
+    assert output == INSERT.replace(
+        "import React from 'react';\n",
+        "import React from 'react';\nimport { makeImageResponsive } from './utils/responsiveImages';\n",
+    ).replace("  img.src = image.src;\n", "  img.src = image.src;\n  makeImageResponsive(img, image);\n")
+
+
+def test_responsive_images_without_the_function_is_a_no_op():
+    text = "const other = () => {};\n"
+    output, messages = CODEMODS["responsive-images"].func(text, {"functions": ["insertImage"]})
+    assert output == text and messages == ["- insertImage: not defined"]
+
+
+# -- perf-marks ---------------------------------------------------------------
+
+HOT = """\
+import React from 'react';
+
+const selectImage = (id) => {
+  setContent(editor.innerHTML);
+};
+function loadPosts() {
+  return 1;
+}
+"""
+
+
+def test_perf_marks_wraps_definitions_and_calls():
+    output = run("perf-marks", HOT, {"functions": ["selectImage", "loadPosts"], "calls": ["setContent"],
+                                     "flag": "perfMarks"})
+    assert output.count("const __perfWrap = ") == 1
+    assert "localStorage.getItem('perfMarks')" in output
+    assert output.endswith(
+        "const selectImage = __perfWrap('selectImage', (id) => {\n"
+        "  __perfCall('setContent', () => setContent(editor.innerHTML));\n"
+        "});\n"
+        "function loadPosts() {\n  return 1;\n}\n"
+        "loadPosts = __perfWrap('loadPosts', loadPosts);\n"
+    )
+
+
+def test_perf_marks_without_targets_is_a_no_op():
+    text = "const x = 1;\n"
+    assert run("perf-marks", text, {"functions": ["notHere"]}) == text
+    with pytest.raises(CodemodError):
+        CODEMODS["perf-marks"].func(text, {})
+
+
+# -- lazy-sections ------------------------------------------------------------
+
+SECTIONS = """\
+import React, { useState } from 'react';
+import BlogSection from './components/BlogSection';
+import EmailSection from './components/EmailSection';
+import Header from './components/Header';
+
+const App = () => {
+  const [activeSection, setActiveSection] = useState('blog');
+  const renderContent = () => {
+    switch (activeSection) {
+      case 'blog':
+        return <BlogSection />;
+      case 'email':
+        return <EmailSection />;
+      default:
+        return <Header />;
+    }
+  };
+  return (
+    <div>
+      <Header />
+      <button onClick={() => setActiveSection('blog')}>Blog</button>
+      <main>{renderContent()}</main>
+    </div>
+  );
+};
+"""
+
+
+def test_lazy_sections_splits_section_only_components():
+    output = run("lazy-sections", SECTIONS, {"state": "activeSection", "prefetch": True})
+    assert output.startswith("import React, { useState, lazy, Suspense } from 'react';\n"
+                             "import Header from './components/Header';\n")
+    assert "  BlogSection: () => import('./components/BlogSection'),\n" in output
+    assert "const EmailSection = lazy(sectionLoaders.EmailSection);\n" in output
+    # Header is also rendered outside the switch, so it stays static
+    assert "lazy(sectionLoaders.Header)" not in output
+    assert ("<Suspense key={activeSection} fallback={<SectionFallback />}>{renderContent()}</Suspense>"
+            in output)
+    assert "onMouseEnter={() => prefetchSection('blog')}" in output
+
+
+def test_lazy_sections_restricted_to_components_and_without_prefetch():
+    output = run("lazy-sections", SECTIONS, {"components": ["EmailSection"], "prefetch": False})
+    assert "import BlogSection from './components/BlogSection';\n" in output
+    assert "const EmailSection = lazy(sectionLoaders.EmailSection);\n" in output
+    assert "prefetchSection" not in output
+
+
+def test_lazy_sections_needs_the_switch():
+    with pytest.raises(CodemodError, match="no `switch \\(tab\\)` found"):
+        CODEMODS["lazy-sections"].func(SECTIONS, {"state": "tab"})
@@ -0,0 +1,43 @@
+from patchkit.differential import ERROR, OK, RevisionReport, VariantRun, first_difference, format_comparison
+
+VARIANTS = ["a.py", "b.py"]
+
+
+def report(revision: str, *runs: VariantRun) -> RevisionReport:
+    result = RevisionReport(revision, list(runs))
+    diff = first_difference(runs[0], runs[1])
+    if diff is not None:
+        result.differences.append(diff)
+    return result
+
+
+def test_every_variant_failing_is_not_agreement():
+    failed = report("old.js", VariantRun("a.py", "old.js", ERROR, "x;", 0.0, exit_code=1, stdout="boom"),
+                    VariantRun("b.py", "old.js", OK, "x;", 0.0, exit_code=1))
+    same = report("new.js", VariantRun("a.py", "new.js", OK, "y = 1;", 0.0, True),
+                  VariantRun("b.py", "new.js", OK, "y = 1 ;", 0.0, True))
+    assert failed.failed and not failed.agree
+    assert same.agree
+
+    text = format_comparison("group", VARIANTS, [failed, same])
+    assert "  old.js: BOTH FAILED" in text
+    assert "  new.js: equivalent" in text
+    assert "totals: (1 revision(s) failed by every variant)" in text
+    assert "b.py (matches on 1/1)" in text
+
+
+def test_one_variant_failing_is_a_difference():
+    one = report("old.js", VariantRun("a.py", "old.js", OK, "x = 2;", 0.0, True),
+                 VariantRun("b.py", "old.js", OK, "x;", 0.0, exit_code=1))
+    assert not one.failed and not one.agree
+    assert "  old.js: DIFFERENT" in format_comparison("group", VARIANTS, [one])
+
+
+def test_one_variant_failing_with_the_same_output_is_a_difference():
+    one = report("old.js", VariantRun("a.py", "old.js", OK, "x;", 0.0),
+                 VariantRun("b.py", "old.js", ERROR, "x;", 0.0, exit_code=1, stdout="boom"))
+    assert one.differences == [] and not one.failed and not one.agree
+
+    text = format_comparison("group", VARIANTS, [one])
+    assert "  old.js: DIFFERENT (variant b.py failed)" in text
+    assert "b.py (matches on 0/1)" in text
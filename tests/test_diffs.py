@@ -0,0 +1,93 @@
+import difflib
+
+from patchkit.diffs import parse_diff
+from patchkit.engine import APPLIED, FAILED, SKIPPED, apply_patch
+from patchkit.spec import PatchSpec
+
+
+def diff_spec(before: str, after: str, target: str = "src/App.js") -> PatchSpec:
+    text = "".join(difflib.unified_diff(before.splitlines(keepends=True), after.splitlines(keepends=True),
+                                        f"a/{target}", f"b/{target}"))
+    return PatchSpec(id="diff", target=target, hunks=parse_diff(text)[0].hunks)
+
+
+def drift(text: str, shift: int = 0, every: int = 0) -> str:
+    """Lines shifted down by `shift`, with trailing whitespace on every `every`th line."""
+    lines = text.splitlines(keepends=True)
+    if every:
+        lines = [line[:-1] + "  \n" if i % every == 0 else line for i, line in enumerate(lines)]
+    return "// moved\n" * shift + "".join(lines)
+
+
+# Two components; in the second an extra </div> closes the wrapper early.
+# Without it the second one's lines around the </div> are the first one's.
+BEFORE = """\
+function Card() {
+  return (
+    <div>
+      <p>x</p>
+    </div>
+  );
+}
+
+function Panel() {
+  return (
+    <div>
+      <p>x</p>
+      </div>
+    </div>
+  );
+}
+"""
+AFTER = BEFORE.replace("      </div>\n", "")
+
+
+def test_diff_applies_exactly_and_is_idempotent():
+    spec = diff_spec(BEFORE, AFTER)
+    output, result = apply_patch(spec, BEFORE)
+    assert result.status == APPLIED and output == AFTER
+    again, result = apply_patch(spec, output)
+    assert result.status == SKIPPED and again == AFTER
+    assert result.messages[0].startswith("- hunk 1: already applied")
+
+
+def test_diff_offset_is_followed():
+    spec = diff_spec(BEFORE, AFTER)
+    output, result = apply_patch(spec, drift(BEFORE, shift=50))
+    assert result.status == APPLIED and output == drift(AFTER, shift=50)
+    assert "offset +50" in result.messages[0]
+
+
+def test_deletion_on_whitespace_drifted_input_is_applied_not_skipped():
+    # Trailing whitespace on the second component's <p> line: the hunk's old
+    # lines only match with whitespace ignored, while its new lines match the
+    # first component exactly. That must not count as "already applied".
+    drifted = BEFORE.replace("      <p>x</p>\n      </div>", "      <p>x</p>  \n      </div>")
+    spec = diff_spec(BEFORE, AFTER)
+    output, result = apply_patch(spec, drift(drifted, shift=50))
+    assert result.status == APPLIED, result.messages
+    assert "ignoring whitespace" in result.messages[0]
+    expected = drifted.replace("      <p>x</p>  \n      </div>\n", "      <p>x</p>  \n")
+    assert output == drift(expected, shift=50)
+
+
+def test_new_lines_inside_old_lines_do_not_prove_applied():
+    # Deleting the last line of the file leaves new lines (b c d) that are a
+    # run of the old ones (b c d x), and they also occur earlier in the file
+    before = "b()\nc()\nd()\n" + "y()\n" * 5 + "b()\nc()\nd()\nx()\n"
+    after = before[:-len("x()\n")]
+    spec = diff_spec(before, after)
+    # The hunk's first context line changed: only fuzzy placement finds it
+    text = before[::-1].replace("\n)(b", "\n)1(b", 1)[::-1]
+    output, result = apply_patch(spec, text)
+    assert result.status == APPLIED, result.messages
+    assert "fuzz 1" in result.messages[0]
+    assert output == text[:-len("x()\n")]
+
+
+def test_missing_context_fails_and_leaves_text_alone():
+    spec = diff_spec(BEFORE, AFTER)
+    text = "function Card() {\n  return null;\n}\n"
+    output, result = apply_patch(spec, text)
+    assert result.status == FAILED and output == text
+    assert "context not found" in result.messages[0]
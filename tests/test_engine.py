@@ -0,0 +1,86 @@
+from patchkit.engine import APPLIED, FAILED, SKIPPED, apply_patch, apply_patches
+from patchkit.spec import compile_spec
+
+TEXT = """\
+const selectImage = (id) => {
+  const img = document.getElementById(id);
+  if (position === 'left') {
+    img.style.float = 'left';
+  }
+  return img;
+};
+"""
+
+
+def spec(*edits: dict, post: list[dict] | None = None, spec_id: str = "s"):
+    return compile_spec({"id": spec_id, "target": "src/App.js", "edit": list(edits), "post": post or []})
+
+
+def test_missing_anchor_fails_and_rolls_back_earlier_edits():
+    patch = spec({"anchor": "return img;", "replace": "  return null;"},
+                 {"anchor": "img.style.clear", "replace": "  // gone"})
+    output, result = apply_patch(patch, TEXT)
+    assert result.status == FAILED and output == TEXT
+    assert result.missing_edit == 1 and result.records == []
+    assert result.messages[-1] == "✗ edit 2: anchor not found: img.style.clear"
+
+
+def test_missing_optional_anchor_is_reported_but_not_fatal():
+    patch = spec({"anchor": "img.style.clear", "replace": "", "optional": True},
+                 {"anchor": "return img;", "replace": "  return null;"})
+    output, result = apply_patch(patch, TEXT)
+    assert result.status == APPLIED
+    assert result.messages[0].startswith("✗ edit 1: anchor not found")
+    assert "  return null;\n" in output
+
+
+def test_guards_turn_a_match_into_a_miss():
+    assert apply_patch(spec({"anchor": "return img;", "min_line": 7}), TEXT)[1].status == FAILED
+    assert apply_patch(spec({"anchor": "return img;", "max_line": 5}), TEXT)[1].status == FAILED
+    assert apply_patch(spec({"anchor": "return img;", "next_line": "};"}), TEXT)[1].status == APPLIED
+    assert apply_patch(spec({"anchor": "return img;", "next_line": "nope"}), TEXT)[1].status == FAILED
+
+
+def test_unclosed_block_is_a_miss():
+    output, result = apply_patch(spec({"anchor": "if (position", "block": "until", "until": "never"}), TEXT)
+    assert result.status == FAILED and output == TEXT
+
+
+def test_blocks_and_modes():
+    braces = spec({"anchor": "if (position === 'left') {", "block": "braces",
+                   "replace": "if (left) {\n  wrap(img);\n}", "reindent": True})
+    output, result = apply_patch(braces, TEXT)
+    assert result.status == APPLIED
+    assert "  if (left) {\n    wrap(img);\n  }\n  return img;" in output
+
+    every = spec({"regex": r"\bimg\b", "mode": "insert_before", "replace": "  // img", "occurrence": "all"})
+    output, result = apply_patch(every, TEXT)
+    assert output.count("  // img\n") == 3
+    assert result.messages == [r"✓ edit 1: 3 region(s): \bimg\b"]
+
+    anchor = spec({"anchor": "'left'", "block": "anchor", "replace": "side", "occurrence": "all"})
+    output, _ = apply_patch(anchor, TEXT)
+    assert "if (position === side) {" in output and "img.style.float = side;" in output
+
+
+def test_post_condition_failure_leaves_text_alone():
+    patch = spec({"anchor": "return img;", "replace": "  return null;"}, post=[{"absent": "getElementById"}])
+    output, result = apply_patch(patch, TEXT)
+    assert result.status == FAILED and output == TEXT
+    assert result.messages[-1] == "✗ post-condition: still contains 'getElementById'"
+
+
+def test_codemod_that_changes_nothing_is_skipped():
+    patch = compile_spec({"id": "m", "target": "src/App.js", "codemod": "perf-marks",
+                          "params": {"functions": ["notHere"]}})
+    output, result = apply_patch(patch, TEXT)
+    assert result.status == SKIPPED and output == TEXT
+
+
+def test_later_specs_see_earlier_output_and_run_after_a_failure():
+    first = spec({"anchor": "return img;", "replace": "  return img || null;"}, spec_id="a")
+    broken = spec({"anchor": "not in the file"}, spec_id="b")
+    last = spec({"anchor": "return img || null;", "replace": "  return img ?? null;"}, spec_id="c")
+    output, results = apply_patches([first, broken, last], TEXT)
+    assert [r.status for r in results] == [APPLIED, FAILED, APPLIED]
+    assert "  return img ?? null;\n" in output
@@ -0,0 +1,115 @@
+import subprocess
+from pathlib import Path
+
+from patchkit.impact import SHELL, Change, find_sections, git_changes, impact_of, pending_changes
+from patchkit.imports import build_graph
+from patchkit.spec import compile_spec
+
+FILES = {
+    "src/index.js": "import './index.css';\nimport App from './App';\n",
+    "src/index.css": "body { margin: 0; }\n",
+    "src/App.js": """\
+import { useEffect } from 'react';
+import { getPosts } from './services/api';
+import BlogSection from './components/BlogSection';
+import EmailSection from './components/EmailSection';
+
+const App = () => {
+  useEffect(() => { getPosts(); }, []);
+  const renderContent = () => {
+    switch (activeSection) {
+      case 'blog':
+        return <BlogSection />;
+      case 'email':
+        return <EmailSection />;
+      default:
+        return null;
+    }
+  };
+  return <main>{renderContent()}</main>;
+};
+
+export default App;
+""",
+    "src/components/BlogSection.js": "import { getPosts } from '../services/api';\nimport Share from './Share';\n",
+    "src/components/EmailSection.js": "import { send } from '../services/mail';\n",
+    "src/components/Share.js": "export default () => null;\n",
+    "src/services/api.js": "export const getPosts = () => [];\n",
+    "src/services/mail.js": "export const send = () => {};\n",
+}
+
+
+def make_app(root: Path) -> None:
+    for name, text in FILES.items():
+        (root / name).parent.mkdir(parents=True, exist_ok=True)
+        (root / name).write_text(text, encoding="utf-8")
+
+
+def sections_hit(root: Path, *changes: Change) -> set[str]:
+    graph = build_graph(root, "src/index.js")
+    return impact_of(list(changes), find_sections(root, graph), graph).sections
+
+
+def test_module_only_a_section_reaches(tmp_path: Path):
+    make_app(tmp_path)
+    assert sections_hit(tmp_path, Change("src/services/mail.js", 1, 1)) == {"email"}
+    assert sections_hit(tmp_path, Change("src/components/Share.js", 1, 1)) == {"blog"}
+
+
+def test_module_the_shell_reaches_hits_every_section(tmp_path: Path):
+    make_app(tmp_path)
+    # api.js is imported by the blog section and by the shell's effect
+    assert sections_hit(tmp_path, Change("src/services/api.js", 1, 1)) == {"blog", "email", SHELL}
+    assert sections_hit(tmp_path, Change("src/index.css", 1, 1)) == {"blog", "email", SHELL}
+
+
+def test_deleted_module_hits_what_imported_it(tmp_path: Path):
+    make_app(tmp_path)
+    (tmp_path / "src/components/Share.js").unlink()
+    assert sections_hit(tmp_path, Change("src/components/Share.js", 1, 1, deleted=True)) == {"blog"}
+
+
+def test_git_changes_reports_deleted_files(tmp_path: Path):
+    make_app(tmp_path)
+    git = ["git", "-c", "user.name=t", "-c", "user.email=t@t", "-c", "commit.gpgsign=false"]
+    subprocess.run(["git", "init", "-q"], cwd=tmp_path, check=True)
+    subprocess.run(["git", "add", "."], cwd=tmp_path, check=True)
+    subprocess.run(git + ["commit", "-qm", "app"], cwd=tmp_path, check=True)
+    (tmp_path / "src/services/mail.js").unlink()
+    (tmp_path / "src/components/Share.js").write_text("export default () => 1;\n", encoding="utf-8")
+
+    changes = git_changes(tmp_path)
+    assert Change("src/services/mail.js", 1, 1, deleted=True) in changes
+    assert Change("src/components/Share.js", 1, 1, old=["export default () => null;\n"],
+                  new=["export default () => 1;\n"]) in changes
+    assert sections_hit(tmp_path, *changes) == {"blog", "email"}
+
+
+def test_codemod_import_edit_hits_only_what_uses_the_import(tmp_path: Path):
+    make_app(tmp_path)
+    app = tmp_path / "src/App.js"
+    app.write_text(app.read_text(encoding="utf-8").replace("""\
+const App = () => {""", """\
+const BlogEditor = () => {
+  const attach = async (file) => {
+    const result = await uploadImageToCloudinary(file);
+  };
+  return <BlogSection onAttach={attach} />;
+};
+
+const App = () => {""").replace("return <BlogSection />;", "return <BlogEditor />;"), encoding="utf-8")
+    spec = compile_spec({"id": "d", "target": "src/App.js", "codemod": "downscale-uploads"})
+
+    outputs = {}
+    changes = pending_changes([spec], tmp_path, outputs)
+    # The new import line and the wrapped call, both in output coordinates
+    assert [(c.start, c.end) for c in changes] == [(5, 5), (9, 9)]
+    assert "import { downscaleImage }" in outputs["src/App.js"].splitlines()[4]
+
+    graph = build_graph(tmp_path, "src/index.js")
+    sections = find_sections(tmp_path, graph, outputs)
+    assert impact_of(changes[:1], sections, graph).sections == {"blog"}
+    assert impact_of(changes, sections, graph).sections == {"blog"}
+    # An import the shell uses still hits everything
+    react = Change("src/App.js", 1, 1, old=[], new=["import { useEffect } from 'react';\n"])
+    assert impact_of([react], sections, graph).sections == {"blog", "email", SHELL}
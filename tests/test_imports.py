@@ -0,0 +1,29 @@
+from pathlib import Path
+
+from patchkit.imports import build_graph, find_specifiers
+
+
+def test_specifiers_of_every_import_form():
+    text = """\
+import React, { useState } from 'react';
+import './index.css';
+export { a } from './a';
+const b = require('./b');
+const C = lazy(() => import('./C'));
+const worker = new Worker(new URL('./x.worker.js', import.meta.url));
+const link = new URL('./not-a-module', window.location.href);
+"""
+    assert find_specifiers(text) == ["react", "./index.css", "./a", "./b", "./C", "./x.worker.js"]
+
+
+def test_worker_module_is_live(tmp_path: Path):
+    (tmp_path / "src/utils").mkdir(parents=True)
+    (tmp_path / "src/index.js").write_text("import { shrink } from './utils/shrink';\n", encoding="utf-8")
+    (tmp_path / "src/utils/shrink.js").write_text(
+        "export const shrink = () => new Worker(new URL('./shrink.worker.js', import.meta.url));\n",
+        encoding="utf-8")
+    (tmp_path / "src/utils/shrink.worker.js").write_text("self.onmessage = () => {};\n", encoding="utf-8")
+
+    graph = build_graph(tmp_path, "src/index.js")
+    assert graph.edges["src/utils/shrink.js"] == ["src/utils/shrink.worker.js"]
+    assert "src/utils/shrink.worker.js" in graph.reachable()
@@ -0,0 +1,64 @@
+from pathlib import Path
+
+import pytest
+
+from conftest import ROOT
+from patchkit.engine import FAILED, apply_patches, split_lines
+from patchkit.incremental import apply_incremental, load_state, save_state, state_path
+from patchkit.spec import load_specs
+
+BASE = (ROOT / "src" / "App_backup_pre_visitor.js").read_text(encoding="utf-8")
+SPECS = load_specs(sorted((ROOT / "patches").glob("*.toml")), None)
+
+
+def _edits(text: str) -> dict[str, str]:
+    lines = split_lines(text)
+    return {
+        "line added at the top": "// edited\n" + text,
+        "line changed inside a patched function": text.replace(
+            "console.log('=== SELECT IMAGE CALLED ===');", "console.log('select');", 1),
+        "tail deleted": "".join(lines[:-3]),
+        "anchor renamed": text.replace("const selectImage = (imageId) => {", "const pickImage = (imageId) => {", 1),
+        "unchanged": text,
+    }
+
+
+def assert_same_as_full_run(text: str, state: dict | None):
+    output, results, new_state, stats = apply_incremental(SPECS, text, state)
+    full, full_results = apply_patches(SPECS, text)
+    assert output == full
+    assert [(r.id, r.status) for r in results] == [(r.id, r.status) for r in full_results]
+    return new_state, stats
+
+
+@pytest.fixture(scope="module")
+def base_state() -> dict:
+    state, stats = assert_same_as_full_run(BASE, None)
+    assert stats.reused == 0
+    return state
+
+
+@pytest.mark.parametrize("name", list(_edits(BASE)))
+def test_incremental_run_matches_a_full_run(name, base_state):
+    _, stats = assert_same_as_full_run(_edits(BASE)[name], base_state)
+    assert stats.reused > 0
+    if name == "unchanged":
+        # Only what replay cannot prove is re-run: codemods, and patches that
+        # failed past their first edit
+        unprovable = [s for s, p in zip(SPECS, base_state["patches"])
+                      if s.codemod is not None or p["status"] == FAILED and p["missing_edit"] != 0]
+        assert stats.evaluated == len(unprovable)
+
+
+def test_state_carries_across_successive_edits(tmp_path: Path, base_state):
+    path = state_path(tmp_path, "src/App.js")
+    state = base_state
+    for edited in _edits(BASE).values():
+        save_state(path, state)
+        state, _ = assert_same_as_full_run(edited, load_state(path))
+
+
+def test_changed_specs_discard_the_state(base_state):
+    output, _, _, stats = apply_incremental(SPECS[1:], BASE, base_state)
+    assert stats.reused == 0
+    assert output == apply_patches(SPECS[1:], BASE)[0]
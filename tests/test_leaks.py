@@ -0,0 +1,79 @@
+from patchkit.leaks import EVENT_ONLY, LOST, PAIRED, UNPAIRED, UNREMOVABLE, analyze, format_findings
+
+
+def statuses(text: str) -> list[tuple[int, str, str]]:
+    return [(f.line, f.kind, f.status) for f in analyze("src/App.js", text)]
+
+
+def test_effect_listener_needs_the_cleanup_to_remove_it():
+    text = """\
+const Editor = () => {
+  useEffect(() => {
+    const editor = editorRef.current;
+    editor.addEventListener('click', onClick);
+    document.addEventListener('keydown', onKey);
+    return () => {
+      editorRef.current.removeEventListener('click', onClick);
+    };
+  }, []);
+  const later = () => document.removeEventListener('keydown', onKey);
+};
+"""
+    # The alias resolves to the same target; a removal outside the cleanup does not count
+    assert statuses(text) == [(4, "listener", PAIRED), (5, "listener", UNPAIRED)]
+    assert analyze("src/App.js", text)[0].removed_at == (7,)
+
+
+def test_handlers_no_removal_can_name():
+    text = """\
+const Panel = () => {
+  window.addEventListener('resize', () => layout());
+  window.addEventListener('scroll', onScroll.bind(this));
+  window.addEventListener('blur', () => save(), { once: true });
+  const img = document.createElement('img');
+  img.addEventListener('load', () => show(img));
+};
+"""
+    # A self-removing listener is fine; one on a created element is not even reported
+    assert statuses(text) == [(2, "listener", UNREMOVABLE), (3, "listener", UNREMOVABLE), (4, "listener", PAIRED)]
+
+
+def test_drag_listeners_removed_only_on_mouseup():
+    text = """\
+const startDrag = () => {
+  const onMove = (e) => move(e);
+  const onUp = () => {
+    document.removeEventListener('mousemove', onMove);
+    document.removeEventListener('mouseup', onUp);
+  };
+  document.addEventListener('mousemove', onMove);
+  document.addEventListener('mouseup', onUp);
+};
+"""
+    assert statuses(text) == [(7, "listener", EVENT_ONLY), (8, "listener", EVENT_ONLY)]
+
+
+def test_intervals_and_window_globals():
+    text = """\
+const App = () => {
+  useEffect(() => {
+    const id = setInterval(loadPosts, 5000);
+    setInterval(tick, 1000);
+    window.selectImage = selectImage;
+    window.helper = helper;
+    return () => {
+      clearInterval(id);
+      delete window.selectImage;
+    };
+  }, []);
+};
+"""
+    assert statuses(text) == [(3, "interval", PAIRED), (4, "interval", LOST),
+                              (5, "global", PAIRED), (6, "global", UNPAIRED)]
+
+
+def test_summary_counts_every_status():
+    findings = analyze("src/App.js", "setInterval(tick, 1000);\nwindow.a = 1;\ndelete window.a;\n")
+    text = format_findings(findings)
+    assert text.splitlines()[-1] == "2 registration(s) in 1 file(s): 1 lost, 1 paired"
+    assert "window.a" not in text and "window.a" in format_findings(findings, verbose=True)
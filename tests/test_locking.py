@@ -0,0 +1,96 @@
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+import pytest
+
+from patchkit import runner
+from patchkit.locking import atomic_write, file_lock, lock_path
+from patchkit.spec import compile_spec
+
+
+def test_second_holder_waits_for_the_first(tmp_path: Path):
+    path = lock_path(tmp_path, "src/App.js")
+    order = []
+    held = threading.Event()
+
+    def first():
+        with file_lock(path):
+            held.set()
+            time.sleep(0.2)
+            order.append("first done")
+
+    thread = threading.Thread(target=first)
+    thread.start()
+    held.wait()
+    with file_lock(path):
+        order.append("second in")
+    thread.join()
+    assert order == ["first done", "second in"]
+
+
+def test_contended_lock_times_out(tmp_path: Path):
+    path = lock_path(tmp_path, "src/App.js")
+    with file_lock(path):
+        with pytest.raises(TimeoutError, match="timed out waiting"):
+            with file_lock(path, timeout=0.1):
+                pass
+    # Released: free again
+    with file_lock(path, timeout=0.1):
+        pass
+
+
+def test_locks_are_per_target(tmp_path: Path):
+    assert lock_path(tmp_path, "src/App.js") != lock_path(tmp_path, "src/index.js")
+    with file_lock(lock_path(tmp_path, "src/App.js")):
+        with file_lock(lock_path(tmp_path, "src/index.js"), timeout=0.1):
+            pass
+
+
+def test_atomic_write_replaces_in_one_step(tmp_path: Path):
+    target = tmp_path / "App.js"
+    target.write_bytes(b"old")
+    target.chmod(0o640)
+    atomic_write(target, b"new")
+    assert target.read_bytes() == b"new"
+    assert target.stat().st_mode & 0o777 == 0o640
+    assert [p.name for p in tmp_path.iterdir()] == ["App.js"]
+
+
+def test_failed_write_leaves_the_target_and_no_temp_file(tmp_path: Path, monkeypatch):
+    target = tmp_path / "App.js"
+    target.write_bytes(b"old")
+
+    def fail(src, dst):
+        raise OSError("disk full")
+
+    monkeypatch.setattr("patchkit.locking.os.replace", fail)
+    with pytest.raises(OSError, match="disk full"):
+        atomic_write(target, b"new")
+    assert target.read_bytes() == b"old"
+    assert [p.name for p in tmp_path.iterdir()] == ["App.js"]
+
+
+def test_run_repatches_a_target_changed_before_the_write(tmp_path: Path, monkeypatch):
+    target = tmp_path / "src/App.js"
+    target.parent.mkdir()
+    target.write_text("const a = 1;\nreturn img;\n", encoding="utf-8")
+    spec = compile_spec({"id": "s", "target": "src/App.js",
+                         "edit": [{"anchor": "return img;", "replace": "return null;"}]})
+    real_lock = runner.file_lock
+    edits = []
+
+    @contextmanager
+    def racing_lock(path, timeout=None):
+        # Another writer gets in just before the first write
+        if not edits:
+            edits.append(path)
+            target.write_text("const a = 2;\nreturn img;\n", encoding="utf-8")
+        with real_lock(path, timeout):
+            yield
+
+    monkeypatch.setattr(runner, "file_lock", racing_lock)
+    report, = runner.run([spec], tmp_path, validate=False)
+    assert report.written and report.conflicts == 1
+    assert target.read_text(encoding="utf-8") == "const a = 2;\nreturn null;\n"
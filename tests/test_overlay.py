@@ -0,0 +1,82 @@
+from pathlib import Path
+
+import pytest
+
+from patchkit.overlay import Overlay, OverlayError
+from patchkit.runner import run
+from patchkit.spec import compile_spec
+
+FILES = {
+    "src/App.js": "const a = 1;\nreturn img;\n",
+    "src/index.js": "import App from './App';\n",
+    "package.json": "{}\n",
+    "node_modules/react/index.js": "module.exports = {};\n",
+    "build/main.js": "bundled;\n",
+}
+
+
+def make_checkout(root: Path) -> Path:
+    base = root / "checkout"
+    for name, text in FILES.items():
+        (base / name).parent.mkdir(parents=True, exist_ok=True)
+        (base / name).write_text(text, encoding="utf-8")
+    return base
+
+
+def test_sync_mirrors_the_checkout_without_copying(tmp_path: Path):
+    base = make_checkout(tmp_path)
+    tree = Overlay(base, tmp_path / "overlay", "link")
+    stats = tree.sync()
+
+    assert (stats.link, stats.copy, stats.copied_bytes) == (3, 0, 0)
+    assert sorted(tree.files) == ["package.json", "src/App.js", "src/index.js"]
+    # Hard links share the checkout's data
+    assert (tree.path / "src/App.js").stat().st_ino == (base / "src/App.js").stat().st_ino
+    assert (tree.path / "node_modules").resolve() == (base / "node_modules").resolve()
+    assert not (tree.path / "build").exists()
+
+
+def test_patched_output_goes_to_the_overlay_only(tmp_path: Path):
+    base = make_checkout(tmp_path)
+    tree = Overlay(base, tmp_path / "overlay", "link")
+    tree.sync()
+    spec = compile_spec({"id": "s", "target": "src/App.js",
+                         "edit": [{"anchor": "return img;", "replace": "return null;"}]})
+
+    report, = run([spec], base, validate=False, output_dir=tree.path)
+    assert report.written
+    tree.record(["src/App.js"])
+    assert (tree.path / "src/App.js").read_text(encoding="utf-8") == "const a = 1;\nreturn null;\n"
+    assert (base / "src/App.js").read_text(encoding="utf-8") == FILES["src/App.js"]
+    assert (tree.path / "src/App.js").stat().st_ino != (base / "src/App.js").stat().st_ino
+
+    # A re-sync puts the patched file back and drops what the checkout lost
+    (base / "package.json").unlink()
+    stats = Overlay(base, tree.path, "link").sync()
+    assert (stats.link, stats.kept, stats.removed) == (1, 1, 1)
+    assert (tree.path / "src/App.js").read_text(encoding="utf-8") == FILES["src/App.js"]
+    assert not (tree.path / "package.json").exists()
+
+
+def test_copy_method_counts_the_bytes_it_writes(tmp_path: Path):
+    base = make_checkout(tmp_path)
+    stats = Overlay(base, tmp_path / "overlay", "copy").sync()
+    assert stats.copy == 3
+    assert stats.copied_bytes == sum(len(FILES[name]) for name in ("src/App.js", "src/index.js", "package.json"))
+
+
+def test_refuses_to_write_into_other_trees(tmp_path: Path):
+    base = make_checkout(tmp_path)
+    (tmp_path / "busy").mkdir()
+    (tmp_path / "busy/notes.txt").write_text("mine\n", encoding="utf-8")
+    with pytest.raises(OverlayError, match="is not an overlay"):
+        Overlay(base, tmp_path / "busy")
+    with pytest.raises(OverlayError, match="the checkout itself"):
+        Overlay(base, base)
+    with pytest.raises(OverlayError, match="unknown method"):
+        Overlay(base, tmp_path / "overlay", "rsync")
+
+    Overlay(base, tmp_path / "overlay").sync()
+    other = make_checkout(tmp_path / "elsewhere")
+    with pytest.raises(OverlayError, match="an overlay of another tree"):
+        Overlay(other, tmp_path / "overlay")
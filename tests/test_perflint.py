@@ -0,0 +1,99 @@
+from patchkit.perflint import attribute, lint
+from patchkit.spec import compile_spec
+
+
+def rules(text: str) -> list[tuple[str, int]]:
+    return [(f.rule, f.line) for f in lint("src/App.js", text)]
+
+
+def test_layout_read_after_write_in_a_hot_handler():
+    text = """\
+const onMouseMove = (e) => {
+  img.style.width = `${e.clientX}px`;
+  const rect = img.getBoundingClientRect();
+};
+window.addEventListener('mousemove', onMouseMove);
+"""
+    assert rules(text) == [("layout-thrash", 3)]
+    # Reading first is fine
+    assert rules(text.replace("  img.style.width = `${e.clientX}px`;\n", "")
+                 + "const later = () => { img.style.width = '1px'; };\n") == []
+
+
+def test_layout_read_through_a_local_helper():
+    text = """\
+const updatePositions = () => {
+  const rect = img.getBoundingClientRect();
+};
+window.addEventListener('scroll', () => {
+  toolbar.classList.add('moving');
+  updatePositions();
+});
+"""
+    assert rules(text) == [("layout-thrash", 2)]
+
+
+def test_interval_reading_storage():
+    text = """\
+const loadPosts = () => {
+  const posts = JSON.parse(localStorage.getItem('socialHubPosts') || '[]');
+};
+setInterval(loadPosts, 5000);
+setInterval(() => tick(), 1000);
+"""
+    findings = lint("src/App.js", text)
+    assert [(f.rule, f.line) for f in findings] == [("storage-poll", 4)]
+    assert "polls localStorage every 5000 ms" in findings[0].message
+
+
+def test_query_in_cleanup_paths():
+    text = """\
+useEffect(() => {
+  return () => {
+    document.querySelectorAll('.image-handle').forEach((h) => h.remove());
+  };
+}, []);
+const deselectImage = () => document.querySelectorAll('.selected-image');
+const render = () => document.querySelectorAll('.post');
+"""
+    assert rules(text) == [("cleanup-query", 3), ("cleanup-query", 6)]
+
+
+def test_storage_parse_in_a_render_body():
+    text = """\
+const Widget = () => {
+  const [posts] = useState(JSON.parse(localStorage.getItem('posts')));
+  const saved = JSON.parse(localStorage.getItem('saved'));
+  const [lazy] = useState(() => JSON.parse(localStorage.getItem('posts')));
+  return null;
+};
+"""
+    findings = lint("src/App.js", text)
+    assert [(f.rule, f.line) for f in findings] == [("render-parse", 2), ("render-parse", 3)]
+    assert "pass useState a function" in findings[0].message
+
+
+def test_codemod_owns_only_the_lines_it_wrote():
+    # perf-marks adds helpers after the imports and wraps a definition near
+    # the end; the poller between the two is input, not the codemod's
+    text = """\
+import React from 'react';
+
+const loadPosts = () => JSON.parse(localStorage.getItem('socialHubPosts') || '[]');
+setInterval(loadPosts, 5000);
+
+const selectImage = (id) => {
+  return id;
+};
+"""
+    spec = compile_spec({"id": "perf-marks", "target": "src/App.js", "codemod": "perf-marks",
+                         "params": {"functions": ["selectImage"]}})
+    output, origins = attribute([spec], text)
+    findings = lint("src/App.js", output, origins, {"storage-poll"})
+    assert len(findings) == 1 and findings[0].patch is None
+
+    owned = {line for line, origin in zip(output.splitlines(), origins) if origin}
+    assert "const __perfWrap = (name, fn) =>" in owned
+    assert "const selectImage = __perfWrap('selectImage', (id) => {" in owned
+    assert "});" in owned
+    assert not any("setInterval" in line or "  return id;" == line for line in owned)
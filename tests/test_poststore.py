@@ -0,0 +1,28 @@
+import json
+from pathlib import Path
+
+from patchkit.poststore import compact_store
+
+PIXEL = "R0lGODlhAQABAAAAACH5BAEKAAEALAAAAAABAAEAAAICTAEAOw=="
+
+
+def test_only_html_fields_are_minified(tmp_path: Path):
+    posts = [{
+        "id": 1,
+        "title": "a < b and c > d,   spaced",
+        "excerpt": "<b>keep</b>   as   is",
+        "content": f"<p>Hello   <!-- note -->\n  world</p><img src=\"data:image/gif;base64,{PIXEL}\" style=\"\">",
+        "comments": [{"author": "x", "body": "<p>nice</p>\n\n<p>post</p>"}],
+    }]
+    source, output = tmp_path / "posts.json", tmp_path / "out.json"
+    source.write_text(json.dumps(posts), encoding="utf-8")
+
+    report = compact_store(source, output, tmp_path / "assets", "/assets/")
+    post = json.loads(output.read_text(encoding="utf-8"))[0]
+
+    assert post["title"] == posts[0]["title"]
+    assert post["excerpt"] == posts[0]["excerpt"]
+    assert post["content"].startswith("<p>Hello world</p><img src=\"/assets/")
+    assert "style" not in post["content"]
+    assert post["comments"][0]["body"] == "<p>nice</p> <p>post</p>"
+    assert report.images == 1
@@ -0,0 +1,65 @@
+import os
+from pathlib import Path
+
+from patchkit.search import SearchIndex, corpus, open_index
+
+FILES = {
+    "src/App.js": "const App = () => {\n  handlePositions.forEach((h) => h.remove());\n};\n",
+    "src/App.js.backup": "function old() {\n  handlePositions.forEach(drop);\n}\n",
+    "src/styles.css": ".handle { color: red; }\n",
+    "fix_snippet.js": "// Make functions globally available\nwindow.fix = fix;\n",
+    "notes.md": "handlePositions.forEach\n",
+    "src/node_modules/x/index.js": "handlePositions.forEach\n",
+}
+
+
+def make_repo(root: Path) -> None:
+    for name, text in FILES.items():
+        (root / name).parent.mkdir(parents=True, exist_ok=True)
+        (root / name).write_text(text, encoding="utf-8")
+
+
+def test_corpus_covers_sources_backups_and_root_snippets(tmp_path: Path):
+    make_repo(tmp_path)
+    assert corpus(tmp_path) == ["fix_snippet.js", "src/App.js", "src/App.js.backup", "src/styles.css"]
+
+
+def test_search_finds_every_copy_with_its_block(tmp_path: Path):
+    make_repo(tmp_path)
+    index = open_index(tmp_path, tmp_path / ".patchkit")
+    hits = index.search("handlePositions.forEach")
+    assert [(h.path, h.line, h.column) for h in hits] == [("src/App.js", 2, 2), ("src/App.js.backup", 2, 2)]
+    assert hits[0].block == (1, 3) and hits[0].block_head == "const App = () => {"
+    assert hits[1].block_head == "function old() {"
+    assert [h.path for h in index.search("globally AVAILABLE", ignore_case=True)] == ["fix_snippet.js"]
+    assert [h.line for h in index.search(r"handlePositions\.forEach\(\(", regex=True)] == [2]
+
+
+def test_candidates_come_from_the_trigram_postings(tmp_path: Path):
+    make_repo(tmp_path)
+    index = open_index(tmp_path)
+    assert index.candidates(["handlepositions"]) == ["src/App.js", "src/App.js.backup"]
+    assert index.candidates(["color: red"]) == ["src/styles.css"]
+    assert index.candidates(["not in any file"]) == []
+
+
+def test_update_reindexes_only_what_changed(tmp_path: Path):
+    make_repo(tmp_path)
+    cache = tmp_path / ".patchkit"
+    open_index(tmp_path, cache)
+
+    index = SearchIndex(tmp_path, cache)
+    assert index.update() == (0, 0)
+    # Touched but identical: a new stamp, no re-index
+    app = tmp_path / "src/App.js"
+    stat = app.stat()
+    os.utime(app, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert index.update() == (0, 0)
+
+    app.write_text("const App = () => null;\n", encoding="utf-8")
+    (tmp_path / "fix_snippet.js").unlink()
+    assert index.update() == (1, 1)
+    assert [h.path for h in index.search("handlePositions")] == ["src/App.js.backup"]
+    assert index.search("globally") == []
+    index.save()
+    assert [h.path for h in SearchIndex(tmp_path, cache).search("App = () => null")] == ["src/App.js"]
@@ -0,0 +1,115 @@
+import dataclasses
+import os
+import re
+from pathlib import Path
+
+import pytest
+
+from patchkit import spec as spec_module
+from patchkit.codemods import CODEMODS
+from patchkit.spec import SpecError, compile_spec, load_specs, parse_spec_file
+
+SPEC = """\
+id = "fix-wrap"
+target = "src/App.js"
+
+[[edit]]
+anchor = "if (position === 'left') {"
+block = "braces"
+replace = "if (left) {}"
+
+[[edit]]
+regex = 'img\\.style\\.float = .*;'
+mode = "delete"
+occurrence = "all"
+
+[[post]]
+contains = "if (left)"
+"""
+
+
+def write(path: Path, text: str) -> Path:
+    path.write_text(text, encoding="utf-8")
+    return path
+
+
+def test_spec_file_compiles_with_defaults(tmp_path: Path):
+    spec = parse_spec_file(write(tmp_path / "fix.toml", SPEC))
+    assert (spec.id, spec.target, len(spec.edits)) == ("fix-wrap", "src/App.js", 2)
+    anchored, pattern = spec.edits
+    assert (anchored.block, anchored.mode, anchored.occurrence) == ("braces", "replace", "first")
+    assert anchored.pattern is None and pattern.anchor is None
+    assert pattern.pattern.search("img.style.float = 'left';")
+    assert (pattern.block, pattern.mode, pattern.occurrence) == ("line", "delete", "all")
+    assert spec.post[0].contains == "if (left)"
+    assert len(spec.digest) == 64
+
+
+@pytest.mark.parametrize("data, message", [
+    ({"id": "x", "target": "a.js", "edit": [{"anchor": "a"}], "colour": 1}, "unknown key(s) colour"),
+    ({"target": "a.js", "edit": [{"anchor": "a"}]}, "'id' is required"),
+    ({"id": "x", "target": "a.js", "edit": [{"anchor": "a", "regex": "b"}]}, "exactly one of 'anchor' or 'regex'"),
+    ({"id": "x", "target": "a.js", "edit": [{"regex": "("}]}, "bad regex"),
+    ({"id": "x", "target": "a.js", "edit": [{"anchor": "a", "block": "para"}]}, "block must be one of"),
+    ({"id": "x", "target": "a.js", "edit": [{"anchor": "a", "block": "until"}]}, "needs an 'until' string"),
+    ({"id": "x", "target": "a.js", "edit": [{"anchor": "a", "block": "anchor", "mode": "delete"}]},
+     "only supports mode 'replace'"),
+    ({"id": "x", "target": "a.js", "edit": [{"anchor": ""}]}, "anchor must not be empty"),
+    ({"id": "x", "target": "a.js"}, "at least one [[edit]] or a codemod"),
+    ({"id": "x", "target": "a.js", "codemod": "nope"}, "unknown codemod 'nope'"),
+    ({"id": "x", "target": "a.js", "codemod": "perf-marks", "params": {"colour": 1}}, "params: unknown key(s)"),
+    ({"id": "x", "target": "a.js", "codemod": "perf-marks", "edit": [{"anchor": "a"}]}, "not both"),
+    ({"id": "x", "target": "a.js", "edit": [{"anchor": "a"}], "params": {"a": 1}}, "[params] needs a codemod"),
+])
+def test_malformed_specs_are_rejected(data, message):
+    with pytest.raises(SpecError, match=re.escape(message)):
+        compile_spec(data, "x.toml")
+
+
+def test_toml_errors_name_the_file(tmp_path: Path):
+    with pytest.raises(SpecError, match="bad.toml"):
+        parse_spec_file(write(tmp_path / "bad.toml", "id = \n"))
+
+
+def test_diff_updating_several_files_becomes_one_spec_per_file(tmp_path: Path):
+    diff = write(tmp_path / "fix.diff", "".join(
+        f"--- a/{name}\n+++ b/{name}\n@@ -1 +1 @@\n-old\n+new\n" for name in ("src/a.js", "src/b.js")))
+    specs = load_specs([diff], None)
+    assert [(s.id, s.target) for s in specs] == [("fix:src/a.js", "src/a.js"), ("fix:src/b.js", "src/b.js")]
+    assert specs[0].digest != specs[1].digest
+
+
+def test_compiled_specs_are_cached_until_the_file_changes(tmp_path: Path, monkeypatch):
+    path = write(tmp_path / "fix.toml", SPEC)
+    cache = tmp_path / "cache"
+    first = load_specs([path], cache)
+    assert list((cache / "specs").glob("*.pickle"))
+
+    def unexpected(path):
+        raise AssertionError(f"{path} re-parsed")
+
+    # A second load comes from the cache
+    monkeypatch.setattr(spec_module, "parse_spec_file", unexpected)
+    assert load_specs([path], cache)[0].digest == first[0].digest
+    monkeypatch.undo()
+
+    # Same size, new mtime: re-parsed
+    write(path, SPEC.replace("fix-wrap", "fix-wrop"))
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    changed = load_specs([path], cache)
+    assert changed[0].id == "fix-wrop" and changed[0].digest != first[0].digest
+
+
+def test_codemod_version_bump_invalidates_cached_specs(tmp_path: Path, monkeypatch):
+    path = write(tmp_path / "marks.toml", 'id = "m"\ntarget = "a.js"\ncodemod = "perf-marks"\n'
+                                          '[params]\nfunctions = ["f"]\n')
+    cache = tmp_path / "cache"
+    before = load_specs([path], cache)[0].digest
+    monkeypatch.setitem(CODEMODS, "perf-marks", dataclasses.replace(CODEMODS["perf-marks"], version="next"))
+    assert load_specs([path], cache)[0].digest != before
+
+
+def test_missing_spec_file(tmp_path: Path):
+    with pytest.raises(SpecError, match="no such spec file"):
+        load_specs([tmp_path / "gone.toml"], None)
@@ -0,0 +1,109 @@
+"""The patches/ stack applied together, end to end."""
+
+import json
+import subprocess
+from pathlib import Path
+
+from conftest import ROOT
+from patchkit.bench import Locate, extract
+from patchkit.engine import APPLIED, apply_patches
+from patchkit.spec import load_specs
+
+# The saved App.js the image patches were written against
+BASE = ROOT / "src" / "App_backup_pre_visitor.js"
+SELECTED = ("selected-image", "editor-image-selected")
+
+# Just enough DOM for the selection overlay: elements with classes, styles,
+# listeners and children. Animation frames are queued and never run.
+FAKE_DOM = r"""
+class ClassList {
+  constructor() { this.set = new Set(); }
+  add(...names) { names.forEach((n) => this.set.add(n)); }
+  remove(...names) { names.forEach((n) => this.set.delete(n)); }
+  contains(name) { return this.set.has(name); }
+}
+class Element {
+  constructor(tag) {
+    this.tagName = tag.toUpperCase();
+    this.classList = new ClassList();
+    this.style = {};
+    this.children = [];
+    this.dataset = {};
+    this.isConnected = true;
+    this.offsetWidth = 400;
+    this.offsetHeight = 300;
+  }
+  set className(value) { this.classList = new ClassList(); this.classList.add(...value.split(/\s+/).filter(Boolean)); }
+  get className() { return [...this.classList.set].join(' '); }
+  set innerHTML(value) { this.html = value; }
+  appendChild(child) { this.children.push(child); return child; }
+  remove() { this.isConnected = false; }
+  addEventListener() {}
+  removeEventListener() {}
+  getBoundingClientRect() { return { left: 10, top: 20, width: 400, height: 300 }; }
+}
+const images = {};
+globalThis.window = globalThis;
+globalThis.document = {
+  body: new Element('body'),
+  createElement: (tag) => new Element(tag),
+  getElementById: (id) => images[id] || null,
+  querySelectorAll: () => [],
+};
+globalThis.addEventListener = () => {};
+globalThis.removeEventListener = () => {};
+globalThis.requestAnimationFrame = () => 1;
+globalThis.cancelAnimationFrame = () => {};
+console.log = () => {};
+const setSelectedImageId = () => {};
+const setContent = () => {};
+const contentRef = { current: null };
+for (const id of [1, 2]) images[`img-${id}`] = new Element('img');
+const selection = (id) => {
+  const img = images[`img-${id}`];
+  return { classes: [...img.classList.set], border: img.style.border || null };
+};
+"""
+
+SCENARIO = r"""
+const result = {};
+selectImage(1);
+result.selected = selection(1);
+selectImage(2);
+result.switched = [selection(1), selection(2)];
+window.__imageOverlay.hide();
+result.deselected = [selection(1), selection(2)];
+process.stdout.write(JSON.stringify(result));
+"""
+
+
+def stack_output() -> str:
+    specs = load_specs(sorted((ROOT / "patches").glob("*.toml")), None)
+    output, results = apply_patches(specs, BASE.read_text(encoding="utf-8"))
+    status = {r.id: r.status for r in results}
+    assert status["pool-image-overlay"] == APPLIED
+    assert status["inline-styles"] == APPLIED
+    return output
+
+
+def _selection_classes(state: dict) -> list[str]:
+    return [c for c in state["classes"] if c in SELECTED]
+
+
+def test_select_then_deselect_leaves_no_selection_class(node, tmp_path: Path):
+    # getImageOverlay comes along as a helper of selectImage
+    functions = extract(stack_output(), [Locate("selectImage", name="selectImage")])
+    assert functions is not None
+    script = tmp_path / "selection.js"
+    script.write_text(FAKE_DOM + "".join(f"const {name} = {source};\n" for name, source in functions.items())
+                      + SCENARIO, encoding="utf-8")
+    proc = subprocess.run([node, str(script)], capture_output=True, text=True, check=True)
+    result = json.loads(proc.stdout)
+
+    assert _selection_classes(result["selected"])
+    first, second = result["switched"]
+    assert _selection_classes(first) == [] and first["border"] is None
+    assert _selection_classes(second)
+    for state in result["deselected"]:
+        assert _selection_classes(state) == []
+        assert state["border"] is None
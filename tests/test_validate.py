@@ -0,0 +1,49 @@
+from pathlib import Path
+
+from patchkit.validate import ParserWorker, Validator, escaped_operators
+
+
+def test_escaped_operators_in_code_but_not_in_strings():
+    text = "const ok = a &amp;&amp; b;\nconst s = '&amp;&amp;';\n// x =&gt; y\n"
+    issues = escaped_operators("src/App.js", text)
+    assert [(i.line, i.column, i.message) for i in issues] == [
+        (1, 13, "HTML-escaped operator '&amp;&amp;' in code")]
+
+
+def test_validator_without_node_still_checks_escapes(tmp_path: Path):
+    with Validator(tmp_path) as validator:
+        # As if node were not on the PATH
+        validator.worker.node = None
+        checks = validator.check([("a.js", "x =&gt; 1;\n"), ("b.js", "ok();\n"), ("notes.md", "=&gt;")])
+    assert set(checks) == {"a.js", "b.js"}
+    assert not checks["a.js"].ok and checks["b.js"].ok
+    assert checks["b.js"].parser == "escapes"
+
+
+def test_worker_stays_warm_across_batches(node, tmp_path: Path):
+    with ParserWorker(tmp_path, node) as worker:
+        first = worker.check([("a.js", "const a = 1;\n"), ("b.js", "const = ;\n")])
+        process = worker.process
+        second = worker.check([("c.js", "function f() { return 1; }\n")])
+        # One node process served both batches
+        assert worker.process is process and process.poll() is None
+        assert worker.parser
+    assert [r["ok"] for r in first] == [True, False]
+    assert first[1]["line"] == 1
+    assert second[0]["ok"]
+    assert process.poll() is not None
+
+
+def test_worker_restarts_after_it_exits(node, tmp_path: Path):
+    worker = ParserWorker(tmp_path, node)
+    worker.check([("a.js", "1;\n")])
+    worker.process.kill()
+    worker.process.wait()
+    assert worker.check([("b.js", "2;\n")])[0]["ok"]
+    worker.close()
+
+
+def test_parse_error_on_a_reported_escape_is_not_repeated(node, tmp_path: Path):
+    with Validator(tmp_path, node) as validator:
+        check = validator.check([("a.js", "const f = x =&gt; 1;\n")])["a.js"]
+    assert len(check.issues) == 1 and "HTML-escaped" in check.issues[0].message